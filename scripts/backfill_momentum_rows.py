@@ -4,16 +4,33 @@
 Usage
 -----
 python scripts/backfill_momentum_rows.py --days 30 [--dry-run] [--endpoint https://XYZ.supabase.co]
+python scripts/backfill_momentum_rows.py --days 90 --set-based [--chunks 16]
 
 Key Features
 ------------
 1. Connects to Supabase using the SERVICE_ROLE_KEY (full DB access).
 2. Iterates backwards N days from today, inserting a default momentum row for
-   every *active* user that lacks a row for that date.
+   every user that lacks a row for that date.  ``--active-within-days`` limits
+   this to *active* users (recent engagement events or non-zero scores); the
+   cohort is materialized once per run and reused for every day and dry-run
+   count.
 3. Uses batched INSERT … ON CONFLICT DO NOTHING queries to avoid locking –
-   configurable via --batch-size (default 500).
+   configurable via --batch-size (default 500).  Batches page over
+   ``auth.users.id`` with a keyset cursor, never OFFSET.
 4. "Dry-run" mode prints how many rows *would* be inserted without mutating the
    database.
+5. ``--set-based`` mode fills the whole ``--days`` window with one
+   ``generate_series`` × users statement per user-id range (``--chunks``),
+   instead of one anti-join per day.  Rows inserted are still reported per day.
+   It has no per-day cursor, so ``--workers``, ``--checkpoint`` and
+   ``--max-rows-per-second`` are rejected with it.
+6. Progress (finished days plus the last user id of the current day) is saved
+   to ``--checkpoint`` after every batch, so a killed or timed-out run resumes
+   where it stopped.  The file records the run's date window and cohort, and
+   a run with different arguments refuses to resume from it.  The file is
+   removed once the run completes.
+7. ``--workers N`` fills N days concurrently, each worker with its own client;
+   ``--max-rows-per-second`` throttles the combined write rate.
 
 Environment Variables
 ---------------------
@@ -24,9 +41,15 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
+import json
 import os
 import sys
-from typing import Optional
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 try:
     # supabase-py ≥2
@@ -41,41 +64,197 @@ except ModuleNotFoundError:  # pragma: no cover – handled in unit tests via mo
 
 
 BATCH_SIZE_DEFAULT = 500
+CHUNKS_DEFAULT = 16
+CHECKPOINT_PATH_DEFAULT = ".backfill_momentum_rows.checkpoint.json"
+USERS_TABLE_DEFAULT = "auth.users"
+COHORT_TABLE_PREFIX = "backfill_momentum_cohort_"
 
 
-def _sql_insert_statement(date_iso: str, batch_size: int, offset: int) -> str:
-    """Generate SQL that inserts up to *batch_size* rows for *date_iso*.
+def _sql_insert_statement(
+    date_iso: str,
+    batch_size: int,
+    after_user_id: Optional[str] = None,
+    users_table: str = USERS_TABLE_DEFAULT,
+) -> str:
+    """Generate SQL that fills *date_iso* for the next *batch_size* users.
 
-    The query works in two steps via a CTE:
-    1. Identify *missing* user/date pairs.
-    2. Insert default rows using INSERT … ON CONFLICT DO NOTHING.
+    Pages over *users_table* ids (``auth.users`` or an active-user cohort table)
+    with a keyset cursor (``id > after_user_id``)
+    rather than OFFSET, so rows inserted by earlier pages cannot shift later
+    pages and no gap is skipped.  The query works in three steps via CTEs:
+    1. Select the next page of user ids after the cursor.
+    2. Insert default rows for the *missing* user/date pairs in that page using
+       INSERT … ON CONFLICT DO NOTHING.
+    3. Return the new cursor (``last_id``), users ``scanned`` and rows
+       ``inserted`` as a single row.
     """
+    cursor = f"WHERE u.id > '{after_user_id}'::UUID" if after_user_id else ""
     return f"""
-WITH missing AS (
-    SELECT u.id AS user_id
-    FROM auth.users u
+WITH page AS (
+    SELECT u.id
+    FROM {users_table} u
+    {cursor}
+    ORDER BY u.id
+    LIMIT {batch_size}
+),
+ins AS (
+    INSERT INTO public.daily_engagement_scores (user_id, score_date, final_score, momentum_state)
+    SELECT p.id, '{date_iso}'::DATE, 0.0, 'NeedsCare'
+    FROM page p
     LEFT JOIN public.daily_engagement_scores d
-        ON d.user_id = u.id AND d.score_date = '{date_iso}'::DATE
+        ON d.user_id = p.id AND d.score_date = '{date_iso}'::DATE
     WHERE d.user_id IS NULL
-    LIMIT {batch_size} OFFSET {offset}
+    ON CONFLICT (user_id, score_date) DO NOTHING
+    RETURNING 1
 )
-INSERT INTO public.daily_engagement_scores (user_id, score_date, final_score, momentum_state)
-SELECT user_id, '{date_iso}'::DATE, 0.0, 'NeedsCare'
-FROM missing
-ON CONFLICT (user_id, score_date) DO NOTHING
-RETURNING 1;"""
+SELECT
+    (SELECT MAX(id::TEXT) FROM page) AS last_id,
+    (SELECT COUNT(*) FROM page) AS scanned,
+    (SELECT COUNT(*) FROM ins) AS inserted;"""
 
 
-def _sql_count_missing(date_iso: str) -> str:
+def _sql_count_missing(date_iso: str, users_table: str = USERS_TABLE_DEFAULT) -> str:
     """SQL that counts how many rows are missing for *date_iso*."""
     return f"""
 SELECT COUNT(*) AS missing
-FROM auth.users u
+FROM {users_table} u
 LEFT JOIN public.daily_engagement_scores d
     ON d.user_id = u.id AND d.score_date = '{date_iso}'::DATE
 WHERE d.user_id IS NULL;"""
 
 
+def _uuid_ranges(chunks: int) -> List[Tuple[str, Optional[str]]]:
+    """Split the UUID keyspace into *chunks* contiguous ``[lo, hi)`` ranges.
+
+    Bounds are derived from the leading 32 bits so they are stable between runs
+    and need no query against ``auth.users``; the last range is open-ended
+    (``hi`` is ``None``) so every id is covered exactly once.
+    """
+    if chunks < 1:
+        raise ValueError("chunks must be >= 1")
+    step = (1 << 32) // chunks
+    bounds = [f"{i * step:08x}-0000-0000-0000-000000000000" for i in range(chunks)]
+    return [
+        (lo, bounds[i + 1] if i + 1 < chunks else None) for i, lo in enumerate(bounds)
+    ]
+
+
+def _sql_user_range(lo: str, hi: Optional[str], alias: str = "u") -> str:
+    cond = f"{alias}.id >= '{lo}'::UUID"
+    if hi is not None:
+        cond += f" AND {alias}.id < '{hi}'::UUID"
+    return cond
+
+
+def _sql_missing_window(
+    start_iso: str,
+    end_iso: str,
+    lo: str,
+    hi: Optional[str],
+    users_table: str = USERS_TABLE_DEFAULT,
+) -> str:
+    """FROM/WHERE clause yielding every missing (user, day) pair in the window."""
+    return f"""
+    FROM {users_table} u
+    CROSS JOIN generate_series('{start_iso}'::DATE, '{end_iso}'::DATE, INTERVAL '1 day') AS g(day)
+    LEFT JOIN public.daily_engagement_scores d
+        ON d.user_id = u.id AND d.score_date = g.day::DATE
+    WHERE d.user_id IS NULL
+      AND {_sql_user_range(lo, hi)}"""
+
+
+def _sql_set_based_insert(
+    start_iso: str,
+    end_iso: str,
+    lo: str,
+    hi: Optional[str],
+    users_table: str = USERS_TABLE_DEFAULT,
+) -> str:
+    """Insert default rows for every missing day in ``[start_iso, end_iso]``.
+
+    Covers all users whose id falls in ``[lo, hi)`` in a single statement and
+    returns one ``(score_date, inserted)`` row per day that received inserts.
+    """
+    return f"""
+WITH ins AS (
+    INSERT INTO public.daily_engagement_scores (user_id, score_date, final_score, momentum_state)
+    SELECT u.id, g.day::DATE, 0.0, 'NeedsCare'{_sql_missing_window(start_iso, end_iso, lo, hi, users_table)}
+    ON CONFLICT (user_id, score_date) DO NOTHING
+    RETURNING score_date
+)
+SELECT score_date, COUNT(*) AS inserted
+FROM ins
+GROUP BY score_date
+ORDER BY score_date;"""
+
+
+def _sql_set_based_count(
+    start_iso: str,
+    end_iso: str,
+    lo: str,
+    hi: Optional[str],
+    users_table: str = USERS_TABLE_DEFAULT,
+) -> str:
+    """Count missing rows per day in ``[start_iso, end_iso]`` for ids in ``[lo, hi)``."""
+    return f"""
+SELECT g.day::DATE AS score_date, COUNT(*) AS missing{_sql_missing_window(start_iso, end_iso, lo, hi, users_table)}
+GROUP BY g.day
+ORDER BY g.day;"""
+
+
+def _sql_create_cohort(table: str, active_within_days: int) -> str:
+    """Materialize the ids of users active in the last *active_within_days*.
+
+    Activity means a non-deleted ``engagement_events`` row or a real (non-zero)
+    ``daily_engagement_scores`` row; the default rows this script writes do not
+    count, so dormant accounts drop out of the cohort instead of being kept
+    alive by their own backfill.  The primary key doubles as the cohort index
+    used by keyset pages and user-id ranges.
+    """
+    return f"""
+CREATE UNLOGGED TABLE {table} AS
+SELECT DISTINCT active.user_id AS id
+FROM (
+    SELECT e.user_id
+    FROM public.engagement_events e
+    WHERE e.timestamp >= NOW() - INTERVAL '{active_within_days} days'
+      AND NOT e.is_deleted
+    UNION
+    SELECT s.user_id
+    FROM public.daily_engagement_scores s
+    WHERE s.score_date >= CURRENT_DATE - {active_within_days}
+      AND s.final_score > 0
+) active;
+ALTER TABLE {table} ADD PRIMARY KEY (id);
+ANALYZE {table};
+SELECT COUNT(*) AS cohort_size FROM {table};"""
+
+
+def _sql_drop_cohort(table: str) -> str:
+    return f"DROP TABLE IF EXISTS {table};"
+
+
+def _sql_drop_stale_cohorts() -> str:
+    """Drop cohort tables left behind by killed runs.
+
+    The cohort must outlive a single ``client.sql`` call, so it cannot be a
+    TEMP table; instead every cohort run clears old ones before creating its
+    own.  Do not run two cohort backfills against the same database at once.
+    """
+    pattern = COHORT_TABLE_PREFIX.replace("_", "\\_") + "%"
+    return f"""
+DO $$
+DECLARE t TEXT;
+BEGIN
+    FOR t IN
+        SELECT tablename FROM pg_tables
+        WHERE schemaname = 'public' AND tablename LIKE '{pattern}'
+    LOOP
+        EXECUTE format('DROP TABLE IF EXISTS public.%I', t);
+    END LOOP;
+END $$;"""
+
+
 def _ensure_env(var_name: str) -> str:
     value = os.getenv(var_name)
     if not value:
@@ -83,39 +262,152 @@ def _ensure_env(var_name: str) -> str:
     return value
 
 
+def _load_checkpoint(
+    path: Optional[str], run_key: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Return the saved progress at *path* (empty state if absent).
+
+    *run_key* identifies the run (date window, cohort); a checkpoint written
+    by a run with a different key is refused rather than silently resumed.
+    """
+    state: Dict[str, Any] = {"run": run_key, "completed": [], "in_progress": {}}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as fh:
+            saved = json.load(fh)
+        if saved.get("run") != run_key:
+            sys.exit(
+                f"Checkpoint {path} was written by a different run "
+                f"({saved.get('run')} vs {run_key}); delete it or pass --no-checkpoint"
+            )
+        state.update(saved)
+    return state
+
+
+def _save_checkpoint(path: Optional[str], state: Dict[str, Any]) -> None:
+    """Atomically persist *state* so a killed run never leaves a torn file."""
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(state, fh)
+    os.replace(tmp_path, path)
+
+
+class _RowRateLimiter:
+    """Token bucket shared by all workers that caps rows written per second.
+
+    Callers report rows *after* writing them and sleep until the cumulative
+    rate is back under *rows_per_second*.  A rate of ``0`` disables throttling.
+    """
+
+    def __init__(self, rows_per_second: float):
+        self._rate = rows_per_second
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def __call__(self, rows: int) -> None:
+        if self._rate <= 0 or rows <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next_slot = max(self._next_slot, now) + rows / self._rate
+            delay = self._next_slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
 def process_day(
-    client: Client, target_date: dt.date, dry_run: bool, batch_size: int
+    client: Client,
+    target_date: dt.date,
+    dry_run: bool,
+    batch_size: int,
+    start_after: Optional[str] = None,
+    on_page: Optional[Callable[[str], None]] = None,
+    throttle: Optional[Callable[[int], None]] = None,
+    users_table: str = USERS_TABLE_DEFAULT,
 ) -> int:
-    """Insert default rows for *target_date*; returns number of rows inserted (or counted in dry-run)."""
+    """Insert default rows for *target_date*; returns number of rows inserted (or counted in dry-run).
+
+    *start_after* resumes the keyset cursor from a previous run and *on_page* is
+    invoked with the new cursor after every committed page.  *throttle* is
+    charged with the rows each page inserted and may block to cap write rate.
+    """
     date_iso = target_date.isoformat()
 
     if dry_run:
-        sql = _sql_count_missing(date_iso)
+        sql = _sql_count_missing(date_iso, users_table)
         res = client.sql(sql)
         count = int(res[0]["missing"]) if res else 0  # type: ignore[index]
         print(f"[{date_iso}] would insert {count} rows")
         return count
 
-    # perform batched inserts until < batch_size returned
+    # walk users_table by id until a short page signals the end
     total_inserted = 0
-    offset = 0
+    cursor = start_after
     while True:
-        sql = _sql_insert_statement(date_iso, batch_size, offset)
+        sql = _sql_insert_statement(date_iso, batch_size, cursor, users_table)
         res = client.sql(sql)
-        inserted = len(res) if res else 0  # type: ignore[arg-type]
+        row = res[0] if res else {}  # type: ignore[index]
+        inserted = int(row.get("inserted") or 0)
         total_inserted += inserted
-        if inserted < batch_size:
+        if throttle:
+            throttle(inserted)
+        scanned = int(row.get("scanned") or 0)
+        if scanned and row.get("last_id"):
+            cursor = str(row["last_id"])
+            if on_page:
+                on_page(cursor)
+        if scanned < batch_size:
             break
-        offset += batch_size
     print(f"[{date_iso}] inserted {total_inserted} rows")
     return total_inserted
 
 
+def process_window_set_based(
+    client: Client,
+    start_date: dt.date,
+    end_date: dt.date,
+    dry_run: bool,
+    chunks: int = CHUNKS_DEFAULT,
+    users_table: str = USERS_TABLE_DEFAULT,
+) -> Dict[str, int]:
+    """Fill ``[start_date, end_date]`` in one statement per user-id range.
+
+    Returns a mapping of ISO date → rows inserted (or counted in dry-run).
+    Unlike :func:`process_day` there is no LIMIT/OFFSET paging: each range is
+    filled completely by its statement, so no gap can be skipped.
+    """
+    start_iso, end_iso = start_date.isoformat(), end_date.isoformat()
+    column = "missing" if dry_run else "inserted"
+    per_day: Dict[str, int] = defaultdict(int)
+
+    for lo, hi in _uuid_ranges(chunks):
+        if dry_run:
+            sql = _sql_set_based_count(start_iso, end_iso, lo, hi, users_table)
+        else:
+            sql = _sql_set_based_insert(start_iso, end_iso, lo, hi, users_table)
+        for row in client.sql(sql) or []:  # type: ignore[union-attr]
+            per_day[str(row["score_date"])[:10]] += int(row[column])
+
+    verb = "would insert" if dry_run else "inserted"
+    day = start_date
+    while day <= end_date:
+        print(f"[{day.isoformat()}] {verb} {per_day.get(day.isoformat(), 0)} rows")
+        day += dt.timedelta(days=1)
+    return dict(per_day)
+
+
 def run(
     days: int,
     endpoint: Optional[str] = None,
     dry_run: bool = False,
     batch_size: int = BATCH_SIZE_DEFAULT,
+    set_based: bool = False,
+    chunks: int = CHUNKS_DEFAULT,
+    checkpoint_path: Optional[str] = None,
+    workers: int = 1,
+    max_rows_per_second: float = 0,
+    active_within_days: int = 0,
 ):
     base_url = endpoint or os.getenv("SUPABASE_URL")
     if not base_url:
@@ -128,16 +420,118 @@ def run(
     client: Client = create_client(base_url, key)
 
     today = dt.date.today()
+    started = time.monotonic()
     overall_inserted = 0
-    for i in range(1, days + 1):
-        target_date = today - dt.timedelta(days=i)
-        overall_inserted += process_day(client, target_date, dry_run, batch_size)
+
+    # restrict every statement to recently active users when requested
+    users_table = USERS_TABLE_DEFAULT
+    if active_within_days > 0:
+        users_table = f"public.{COHORT_TABLE_PREFIX}{uuid.uuid4().hex[:8]}"
+        client.sql(_sql_drop_stale_cohorts())
+        res = client.sql(_sql_create_cohort(users_table, active_within_days))
+        size = int(res[0]["cohort_size"]) if res else 0  # type: ignore[index]
+        print(f"Active cohort ({active_within_days}d): {size} users → {users_table}")
+
+    try:
+        if set_based:
+            per_day = process_window_set_based(
+                client,
+                today - dt.timedelta(days=days),
+                today - dt.timedelta(days=1),
+                dry_run,
+                chunks,
+                users_table,
+            )
+            overall_inserted = sum(per_day.values())
+        else:
+            # dry-run never mutates, so there is nothing to resume
+            ckpt_path = None if dry_run else checkpoint_path
+            run_key = {
+                "start": (today - dt.timedelta(days=days)).isoformat(),
+                "end": (today - dt.timedelta(days=1)).isoformat(),
+                "active_within_days": active_within_days,
+            }
+            state = _load_checkpoint(ckpt_path, run_key)
+            state_lock = threading.Lock()
+            throttle = _RowRateLimiter(max_rows_per_second)
+            local = threading.local()
+
+            def _worker_client() -> Client:
+                # supabase clients are not thread-safe – one per worker thread
+                if workers <= 1:
+                    return client
+                if not hasattr(local, "client"):
+                    local.client = create_client(base_url, key)
+                return local.client
+
+            def _fill_day(target_date: dt.date) -> int:
+                date_iso = target_date.isoformat()
+
+                def _record_page(last_id: str) -> None:
+                    with state_lock:
+                        state["in_progress"][date_iso] = last_id
+                        _save_checkpoint(ckpt_path, state)
+
+                with state_lock:
+                    start_after = state["in_progress"].get(date_iso)
+                inserted = process_day(
+                    _worker_client(),
+                    target_date,
+                    dry_run,
+                    batch_size,
+                    start_after=start_after,
+                    on_page=_record_page,
+                    throttle=throttle,
+                    users_table=users_table,
+                )
+                with state_lock:
+                    state["in_progress"].pop(date_iso, None)
+                    state["completed"].append(date_iso)
+                    _save_checkpoint(ckpt_path, state)
+                return inserted
+
+            pending: List[dt.date] = []
+            for i in range(1, days + 1):
+                target_date = today - dt.timedelta(days=i)
+                if target_date.isoformat() in state["completed"]:
+                    print(
+                        f"[{target_date.isoformat()}] already completed (checkpoint) – skipping"
+                    )
+                    continue
+                pending.append(target_date)
+
+            # days are independent thanks to ON CONFLICT DO NOTHING
+            pool = ThreadPoolExecutor(max_workers=max(1, workers))
+            futures: list = []
+            try:
+                futures = [pool.submit(_fill_day, d) for d in pending]
+                for future in futures:
+                    overall_inserted += future.result()
+            except BaseException:
+                # drop days not started yet (cancel_futures needs Python 3.9)
+                for future in futures:
+                    future.cancel()
+                pool.shutdown(wait=True)
+                raise
+            pool.shutdown(wait=True)
+
+            # a finished run leaves nothing to resume
+            if ckpt_path and os.path.exists(ckpt_path):
+                os.remove(ckpt_path)
+    finally:
+        if users_table != USERS_TABLE_DEFAULT:
+            client.sql(_sql_drop_cohort(users_table))
 
     action = "would be inserted" if dry_run else "inserted"
-    print(f"Backfill complete: {overall_inserted} rows {action} across {days} days")
+    elapsed = time.monotonic() - started
+    rate = overall_inserted / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Backfill complete: {overall_inserted} rows {action} across {days} days "
+        f"in {elapsed:.1f}s ({rate:.0f} rows/s, workers={max(1, workers)})"
+    )
 
 
-def _parse_args() -> argparse.Namespace:
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Backfill daily_engagement_scores with default rows"
     )
@@ -160,9 +554,77 @@ def _parse_args() -> argparse.Namespace:
         default=BATCH_SIZE_DEFAULT,
         help="Insert batch size (default: 500)",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--set-based",
+        action="store_true",
+        help="Fill the whole window with generate_series × users per user-id range",
+    )
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        default=CHUNKS_DEFAULT,
+        help="Number of user-id ranges for --set-based (default: 16)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help=f"Progress file used to resume a killed run (default: {CHECKPOINT_PATH_DEFAULT}; "
+        "not supported with --set-based)",
+    )
+    parser.add_argument(
+        "--no-checkpoint",
+        action="store_true",
+        help="Ignore and do not write the checkpoint file",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of days processed concurrently, one client each (default: 1; "
+        "not supported with --set-based)",
+    )
+    parser.add_argument(
+        "--max-rows-per-second",
+        type=float,
+        default=0,
+        help="Cap on rows inserted per second across all workers (default: 0 = off; "
+        "not supported with --set-based)",
+    )
+    parser.add_argument(
+        "--active-within-days",
+        type=int,
+        default=0,
+        help="Only backfill users with engagement in the last N days (default: 0 = all users)",
+    )
+    args = parser.parse_args(argv)
+    if args.set_based:
+        # one statement per id range: no per-day cursor to checkpoint or fan out
+        unsupported = [
+            flag
+            for flag, given in (
+                ("--workers", args.workers != 1),
+                ("--checkpoint", args.checkpoint is not None),
+                ("--max-rows-per-second", args.max_rows_per_second > 0),
+            )
+            if given
+        ]
+        if unsupported:
+            parser.error(f"--set-based does not support {', '.join(unsupported)}")
+    elif args.checkpoint is None:
+        args.checkpoint = CHECKPOINT_PATH_DEFAULT
+    return args
 
 
 if __name__ == "__main__":
     args = _parse_args()
-    run(args.days, args.endpoint, args.dry_run, args.batch_size)
+    run(
+        args.days,
+        args.endpoint,
+        args.dry_run,
+        args.batch_size,
+        set_based=args.set_based,
+        chunks=args.chunks,
+        checkpoint_path=None if args.no_checkpoint else args.checkpoint,
+        workers=args.workers,
+        max_rows_per_second=args.max_rows_per_second,
+        active_within_days=args.active_within_days,
+    )
@@ -3,36 +3,133 @@
 
 Usage:
     python scripts/backfill_wearable_summary.py --days 90 [--endpoint https://XYZ.supabase.co]
+        [--concurrency 8] [--max-retries 4] [--range-days 7]
 
 The script iterates backwards from today (exclusive) for N days and calls the
-`wearable-daily-summarizer` Edge Function with the `date` query param.  It
+`wearable-daily-summarizer` Edge Function.  Days are sent in ``--range-days``
+batches via the `start`/`end` query params so the function loads
+wearable_health_data once per range; if the deployed function predates range
+support the script falls back to one `date` call per day.  Range support is
+probed with the first batch alone, before calls fan out, and every range call
+also carries ``date=<start>`` so an old function summarizes a requested day
+rather than its default "yesterday".  It
 requires env vars SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY (or SERVICE_ROLE_KEY).
 
+Calls are issued by a thread pool (``--concurrency``) sharing one keep-alive
+HTTP session.  429 and 5xx responses are retried with exponential backoff
+(honouring ``Retry-After``), and the summary line includes a per-day latency
+histogram.
+
+Offline mode (``--offline-export``) skips the Edge Function entirely: it reads
+an exported wearable_health_data file (CSV or NDJSON), aggregates it with the
+vectorized port in ``wearable_aggregator.py`` and bulk-writes the summaries
+with ``COPY`` into a staging table followed by one upsert.  It needs
+``--db-url`` (or DATABASE_URL) and psycopg2.
+
 Example:
     SUPABASE_URL=https://abc.supabase.co \
     SERVICE_ROLE_KEY=ey... \
     python scripts/backfill_wearable_summary.py --days 30
+
+    DATABASE_URL=postgresql://... \
+    python scripts/backfill_wearable_summary.py --days 730 \
+        --offline-export wearable_health_data.csv
 """
 from __future__ import annotations
 
 import argparse
 import datetime as dt
+import io
 import os
 import sys
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
 
+CONCURRENCY_DEFAULT = 4
+MAX_RETRIES_DEFAULT = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+REQUEST_TIMEOUT_SECONDS = 30
+RANGE_DAYS_DEFAULT = 7
+MAX_RANGE_DAYS = 31  # mirrors MAX_RANGE_DAYS in the edge function
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
 
-def call_summarizer(base_url: str, key: str, date: str) -> bool:
-    url = f"{base_url}/functions/v1/wearable-daily-summarizer?date={date}"
-    headers = {
+# Upper bounds (seconds) of the latency histogram buckets; last bucket is open.
+LATENCY_BUCKETS = (1, 5, 15, 30, 60)
+
+
+def make_session(pool_size: int = CONCURRENCY_DEFAULT) -> requests.Session:
+    """Return a keep-alive session whose connection pool fits *pool_size* workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _backoff_delay(attempt: int, res: Optional[requests.Response]) -> float:
+    """Seconds to wait before retry *attempt* (0-based); prefers ``Retry-After``."""
+    if res is not None:
+        retry_after = res.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+    return min(BACKOFF_BASE_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+
+
+def _get_with_retry(
+    http, url: str, headers: dict, label: str, max_retries: int
+) -> Optional[requests.Response]:
+    """GET *url*, retrying 429/5xx/network errors; ``None`` once retries run out.
+
+    Any other error response raises from ``raise_for_status``.
+    """
+    attempt = 0
+    while True:
+        res = None
+        try:
+            res = http.get(url, headers=headers, timeout=REQUEST_TIMEOUT_SECONDS)
+            if res.status_code not in RETRYABLE_STATUS:
+                res.raise_for_status()
+                return res
+            err: Exception = requests.HTTPError(f"{res.status_code} from summarizer")
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            err = exc
+
+        if attempt >= max_retries:
+            print(f"[{label}] FAILED after {attempt + 1} attempts → {err}",
+                  file=sys.stderr)
+            return None
+        delay = _backoff_delay(attempt, res)
+        print(f"[{label}] retry {attempt + 1}/{max_retries} in {delay:.1f}s → {err}",
+              file=sys.stderr)
+        time.sleep(delay)
+        attempt += 1
+
+
+def _headers(key: str) -> dict:
+    return {
         "apikey": key,
         "Authorization": f"Bearer {key}",
     }
+
+
+def call_summarizer(
+    base_url: str,
+    key: str,
+    date: str,
+    session: Optional[requests.Session] = None,
+    max_retries: int = MAX_RETRIES_DEFAULT,
+) -> bool:
+    url = f"{base_url}/functions/v1/wearable-daily-summarizer?date={date}"
     try:
-        res = requests.get(url, headers=headers, timeout=30)
-        res.raise_for_status()
+        res = _get_with_retry(session or requests, url, _headers(key), date,
+                              max_retries)
+        if res is None:
+            return False
         print(
             f"[{date}] status={res.status_code} processed={res.json().get('processed')}")
         return True
@@ -41,7 +138,72 @@ def call_summarizer(base_url: str, key: str, date: str) -> bool:
         return False
 
 
-def run(days: int, endpoint: Optional[str] = None):
+def call_summarizer_range(
+    base_url: str,
+    key: str,
+    dates: List[str],
+    session: Optional[requests.Session] = None,
+    max_retries: int = MAX_RETRIES_DEFAULT,
+) -> Tuple[bool, Optional[Dict[str, int]]]:
+    """Summarize the contiguous *dates* (ascending) in one ``start``/``end`` call.
+
+    Returns ``(True, {date: processed})`` on success, ``(False, None)`` on
+    failure and ``(True, None)`` when the deployed function predates range
+    support (its response has no ``days`` map) so the caller can fall back to
+    per-day calls.
+    """
+    start, end = dates[0], dates[-1]
+    label = f"{start}..{end}"
+    # date= is ignored by range-aware functions; an old one summarizes *start*
+    url = (f"{base_url}/functions/v1/wearable-daily-summarizer"
+           f"?start={start}&end={end}&date={start}")
+    try:
+        res = _get_with_retry(session or requests, url, _headers(key), label,
+                              max_retries)
+        if res is None:
+            return False, None
+        days = res.json().get("days")
+        if not isinstance(days, dict):
+            return True, None
+        for date in dates:
+            print(f"[{date}] status={res.status_code} processed={days.get(date, 0)}")
+        return True, {d: int(days.get(d, 0)) for d in dates}
+    except Exception as err:  # pylint: disable=broad-except
+        print(f"[{label}] FAILED → {err}", file=sys.stderr)
+        return False, None
+
+
+def _latency_histogram(latencies: List[float]) -> str:
+    """Format per-day latencies as ``<1s:N 1-5s:N … >60s:N p50=… p95=…``."""
+    if not latencies:
+        return "latency: n/a"
+    counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for secs in latencies:
+        idx = next((i for i, hi in enumerate(LATENCY_BUCKETS) if secs < hi),
+                   len(LATENCY_BUCKETS))
+        counts[idx] += 1
+    labels = [f"<{LATENCY_BUCKETS[0]}s"]
+    labels += [f"{lo}-{hi}s" for lo, hi in zip(LATENCY_BUCKETS, LATENCY_BUCKETS[1:])]
+    labels.append(f">{LATENCY_BUCKETS[-1]}s")
+    ordered = sorted(latencies)
+    p50 = ordered[int(0.50 * (len(ordered) - 1))]
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    buckets = " ".join(f"{lbl}:{n}" for lbl, n in zip(labels, counts))
+    return f"latency: {buckets} p50={p50:.1f}s p95={p95:.1f}s"
+
+
+def _contiguous_chunks(dates: List[str], size: int) -> List[List[str]]:
+    """Split descending ISO *dates* into ascending runs of at most *size* days."""
+    return [sorted(dates[i:i + size]) for i in range(0, len(dates), size)]
+
+
+def run(
+    days: int,
+    endpoint: Optional[str] = None,
+    concurrency: int = CONCURRENCY_DEFAULT,
+    max_retries: int = MAX_RETRIES_DEFAULT,
+    range_days: int = RANGE_DAYS_DEFAULT,
+):
     base_url = endpoint or os.getenv("SUPABASE_URL")
     if not base_url:
         sys.exit("SUPABASE_URL env var or --endpoint required")
@@ -49,15 +211,125 @@ def run(days: int, endpoint: Optional[str] = None):
         "SUPABASE_SERVICE_ROLE_KEY")
     if not key:
         sys.exit("SERVICE_ROLE_KEY or SUPABASE_SERVICE_ROLE_KEY env var required")
+    if not 1 <= range_days <= MAX_RANGE_DAYS:
+        sys.exit(f"--range-days must be between 1 and {MAX_RANGE_DAYS}")
+
+    today = dt.date.today()
+    dates = [(today - dt.timedelta(days=i)).isoformat()
+             for i in range(1, days + 1)]
+    session = make_session(concurrency)
+    # flipped off by the first response that shows no range support
+    ranges_supported = [range_days > 1]
+
+    def _timed_call(date: str) -> Tuple[bool, float]:
+        started = time.monotonic()
+        ok = call_summarizer(base_url, key, date, session, max_retries)
+        return ok, time.monotonic() - started
+
+    def _timed_chunk(chunk: List[str]) -> List[Tuple[bool, float]]:
+        if ranges_supported[0]:
+            started = time.monotonic()
+            ok, per_day = call_summarizer_range(base_url, key, chunk, session,
+                                                max_retries)
+            # latency is amortized across the days the call covered
+            elapsed = (time.monotonic() - started) / len(chunk)
+            if not ok or per_day is not None:
+                return [(ok, elapsed)] * len(chunk)
+            print("Summarizer has no range support – falling back to per-day calls")
+            ranges_supported[0] = False
+        return [_timed_call(date) for date in chunk]
+
+    chunks = _contiguous_chunks(dates, range_days)
+    # probe range support once, serially, so an old function is hit only once
+    probe = chunks[:1] if ranges_supported[0] else []
+    with session, ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = [r for chunk in probe for r in _timed_chunk(chunk)]
+        results += [r for chunk in pool.map(_timed_chunk, chunks[len(probe):])
+                    for r in chunk]
+
+    success = sum(int(ok) for ok, _ in results)
+    latencies = [secs for _, secs in results]
+    print(f"Backfill complete: {success}/{len(dates)} days succeeded "
+          f"({_latency_histogram(latencies)})")
+
+
+def _aggregator():
+    """Import the offline aggregator whether run as a script or as a module."""
+    try:
+        import wearable_aggregator  # type: ignore
+    except ModuleNotFoundError:  # imported as scripts.backfill_wearable_summary
+        from scripts import wearable_aggregator  # type: ignore
+    return wearable_aggregator
+
+
+def load_export(path: str, start: str, end: str) -> List[Dict[str, Any]]:
+    """Read a wearable_health_data export and summarize days in ``[start, end]``.
+
+    The export needs ``user_id``, ``data_type``, ``value`` and ``timestamp``
+    columns; days are bucketed in UTC like the Edge Function.
+    """
+    import pandas as pd  # type: ignore
+
+    cols = ["user_id", "data_type", "value", "timestamp"]
+    if path.endswith((".ndjson", ".jsonl", ".json")):
+        df = pd.read_json(path, lines=True)[cols]
+    else:
+        df = pd.read_csv(path, usecols=cols)
+    day = pd.to_datetime(df["timestamp"], utc=True).dt.strftime("%Y-%m-%d")
+    keep = (day >= start) & (day <= end)
+    return _aggregator().summarize_samples(
+        df["user_id"][keep].to_numpy(),
+        day[keep].to_numpy(),
+        df["data_type"][keep].to_numpy(),
+        pd.to_numeric(df["value"][keep], errors="coerce").to_numpy(),
+    )
+
+
+def write_summaries_copy(conn, rows: Sequence[Dict[str, Any]]) -> int:
+    """Bulk-upsert *rows* via ``COPY`` into a staging table; returns row count."""
+    agg = _aggregator()
+    cols = ", ".join(agg.SUMMARY_COLUMNS)
+    updates = ", ".join(
+        f"{c} = EXCLUDED.{c}" for c in agg.SUMMARY_COLUMNS[2:])
+    buf = io.StringIO("".join(agg.summary_to_copy_line(r) for r in rows))
+    with conn.cursor() as cur:
+        cur.execute(
+            "CREATE TEMP TABLE wearable_daily_summary_stage "
+            "(LIKE public.wearable_daily_summary INCLUDING DEFAULTS) ON COMMIT DROP")
+        cur.copy_expert(
+            f"COPY wearable_daily_summary_stage ({cols}) FROM STDIN", buf)
+        cur.execute(
+            f"INSERT INTO public.wearable_daily_summary ({cols}) "
+            f"SELECT {cols} FROM wearable_daily_summary_stage "
+            f"ON CONFLICT (user_id, summary_date) DO UPDATE SET {updates}")
+    conn.commit()
+    return len(rows)
+
+
+def run_offline(days: int, export_path: str, db_url: Optional[str] = None):
+    db_url = db_url or os.getenv("DATABASE_URL")
+    if not db_url:
+        sys.exit("DATABASE_URL env var or --db-url required for --offline-export")
+    try:
+        import psycopg2  # type: ignore
+    except ModuleNotFoundError:
+        sys.exit("psycopg2 not installed; install with `pip install psycopg2-binary`")
 
     today = dt.date.today()
-    success, total = 0, 0
-    for i in range(1, days + 1):
-        target_date = today - dt.timedelta(days=i)
-        ok = call_summarizer(base_url, key, target_date.isoformat())
-        success += int(ok)
-        total += 1
-    print(f"Backfill complete: {success}/{total} days succeeded")
+    start = (today - dt.timedelta(days=days)).isoformat()
+    end = (today - dt.timedelta(days=1)).isoformat()
+
+    started = time.monotonic()
+    rows = load_export(export_path, start, end)
+    aggregated = time.monotonic() - started
+
+    conn = psycopg2.connect(db_url)
+    try:
+        written = write_summaries_copy(conn, rows)
+    finally:
+        conn.close()
+    print(f"Offline backfill complete: {written} summaries for {start}..{end} "
+          f"(aggregate {aggregated:.1f}s, total {time.monotonic() - started:.1f}s)")
 
 
 if __name__ == "__main__":
@@ -67,6 +339,20 @@ if __name__ == "__main__":
                         help="Number of previous days to backfill (default: 30)")
     parser.add_argument(
         "--endpoint", help="Optional Supabase project URL (defaults to SUPABASE_URL env var)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY_DEFAULT,
+                        help=f"Days summarized in parallel (default: {CONCURRENCY_DEFAULT})")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES_DEFAULT,
+                        help=f"Retries on 429/5xx/network errors (default: {MAX_RETRIES_DEFAULT})")
+    parser.add_argument("--range-days", type=int, default=RANGE_DAYS_DEFAULT,
+                        help=f"Days summarized per call via start/end; 1 = per-day calls (default: {RANGE_DAYS_DEFAULT})")
+    parser.add_argument("--offline-export",
+                        help="Recompute from an exported wearable_health_data CSV/NDJSON instead of calling the edge function")
+    parser.add_argument(
+        "--db-url", help="Postgres URL for --offline-export (defaults to DATABASE_URL env var)")
     args = parser.parse_args()
 
-    run(args.days, args.endpoint)
+    if args.offline_export:
+        run_offline(args.days, args.offline_export, args.db_url)
+    else:
+        run(args.days, args.endpoint, args.concurrency, args.max_retries,
+            args.range_days)
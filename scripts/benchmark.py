@@ -0,0 +1,435 @@
+"""Latency benchmark harness for database performance scenarios.
+
+Usage (library):
+
+    from scripts.benchmark import run_benchmark, write_results
+
+    result = run_benchmark("single_insert", insert_one, iterations=200)
+    write_results("bench.json", [result], suite="engagement_events")
+
+Each benchmark runs warm-up calls first (discarded), optionally calibrates the
+iteration count to a time budget, then times every call with
+``time.perf_counter``.  Samples beyond Tukey's far-out fences are rejected
+before p50/p95/p99 are computed; each percentile carries a distribution-free
+confidence interval from the binomial order-statistic bounds, so a pass/fail
+decision can ask whether a threshold is exceeded *significantly*
+(:func:`exceeds`) instead of trusting a single mean.
+
+Result files are JSON and keep the raw samples, so runs can be compared.  A
+previous run's file serves as the baseline for the next one:
+
+    python -m scripts.benchmark compare baseline.json current.json --format markdown
+
+flags every benchmark whose p50/p95 got significantly slower – its confidence
+interval lies entirely above the baseline's – and exits non-zero if any did.
+Accepted results move the baseline forward explicitly:
+
+    python -m scripts.benchmark promote current.json baseline.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+PERCENTILES = (50, 95, 99)
+WARMUP_DEFAULT = 5
+ITERATIONS_DEFAULT = 50
+OUTLIER_K_DEFAULT = 3.0
+CONFIDENCE_DEFAULT = 0.95
+COMPARE_STATS_DEFAULT = ("p50", "p95")
+MIN_CHANGE_DEFAULT = 0.10
+
+# Two-sided standard-normal quantiles for the supported confidence levels.
+_Z = {0.90: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+
+
+def percentile(sorted_samples: list, q: float) -> float:
+    """Linear-interpolated *q*-th percentile (0–100) of pre-sorted samples."""
+    if not sorted_samples:
+        return math.nan
+    pos = (len(sorted_samples) - 1) * q / 100.0
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (pos - lo)
+
+
+def percentile_ci(
+    sorted_samples: list, q: float, confidence: float = CONFIDENCE_DEFAULT
+) -> tuple:
+    """Distribution-free ``(low, high)`` interval for the *q*-th percentile.
+
+    The number of samples below the true quantile is Binomial(n, q/100); the
+    normal approximation of that count picks the bracketing order statistics.
+    With too few samples the interval widens to the observed range.
+    """
+    n = len(sorted_samples)
+    if n == 0:
+        return math.nan, math.nan
+    p = q / 100.0
+    half = _Z[confidence] * math.sqrt(n * p * (1 - p))
+    # 1-based ranks (Conover), clamped to the sample.
+    lo = min(n, max(1, round(n * p - half)))
+    hi = min(n, max(1, round(1 + n * p + half)))
+    return sorted_samples[lo - 1], sorted_samples[hi - 1]
+
+
+def reject_outliers(samples: list, k: float = OUTLIER_K_DEFAULT) -> tuple:
+    """Split *samples* into ``(kept, rejected)`` with Tukey fences at *k*·IQR.
+
+    ``k=3`` keeps everything but "far out" values – one GC pause or a noisy
+    neighbour on a CI runner – while leaving a genuinely slow tail intact.
+    """
+    if len(samples) < 4 or k <= 0:
+        return list(samples), []
+    ordered = sorted(samples)
+    q1, q3 = percentile(ordered, 25), percentile(ordered, 75)
+    low, high = q1 - k * (q3 - q1), q3 + k * (q3 - q1)
+    kept = [s for s in samples if low <= s <= high]
+    rejected = [s for s in samples if not low <= s <= high]
+    return kept, rejected
+
+
+def summarize(
+    name: str,
+    samples_ms: list,
+    outlier_k: float = OUTLIER_K_DEFAULT,
+    confidence: float = CONFIDENCE_DEFAULT,
+) -> dict:
+    """Statistics for one benchmark's per-call latencies (milliseconds)."""
+    kept, rejected = reject_outliers(samples_ms, outlier_k)
+    ordered = sorted(kept)
+    result = {
+        "name": name,
+        "n": len(ordered),
+        "rejected": len(rejected),
+        "mean_ms": statistics.fmean(ordered) if ordered else math.nan,
+        "stdev_ms": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "min_ms": ordered[0] if ordered else math.nan,
+        "max_ms": ordered[-1] if ordered else math.nan,
+        "confidence": confidence,
+        "samples_ms": list(samples_ms),
+    }
+    for q in PERCENTILES:
+        result[f"p{q}_ms"] = percentile(ordered, q)
+        result[f"p{q}_ci_ms"] = list(percentile_ci(ordered, q, confidence))
+    return result
+
+
+def calibrate(fn, target_s: float, probe_calls: int = 3,
+              min_iterations: int = 10, max_iterations: int = 10_000) -> int:
+    """Iterations of *fn* that fit in roughly *target_s* seconds."""
+    started = time.perf_counter()
+    for _ in range(probe_calls):
+        fn()
+    per_call = (time.perf_counter() - started) / probe_calls
+    if per_call <= 0:
+        return max_iterations
+    return max(min_iterations, min(max_iterations, int(target_s / per_call)))
+
+
+def run_benchmark(
+    name: str,
+    fn,
+    iterations: int = ITERATIONS_DEFAULT,
+    warmup: int = WARMUP_DEFAULT,
+    target_s: float = None,
+    threads: int = 1,
+    outlier_k: float = OUTLIER_K_DEFAULT,
+    confidence: float = CONFIDENCE_DEFAULT,
+) -> dict:
+    """Time *fn* and return :func:`summarize` statistics plus run metadata.
+
+    *fn* is called with no arguments.  With ``threads > 1`` the iterations are
+    spread over a thread pool – each thread warms up on its own, so per-thread
+    state (see :class:`ThreadState`) is built before timing starts – and
+    ``throughput_per_s`` reports completed calls per wall-clock second.
+    *target_s* replaces *iterations* with a calibrated count that fits the
+    time budget.
+    """
+    if threads <= 1:
+        for _ in range(warmup):
+            fn()
+    if target_s is not None:
+        iterations = calibrate(fn, target_s)
+
+    def timed(count: int) -> list:
+        samples = []
+        for _ in range(count):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000.0)
+        return samples
+
+    def worker(count: int) -> list:
+        try:
+            for _ in range(warmup):
+                fn()
+        except BaseException:
+            ready.abort()  # release the other threads; f.result() re-raises
+            raise
+        ready.wait()
+        return timed(count)
+
+    if threads > 1:
+        share = [iterations // threads + (i < iterations % threads) for i in range(threads)]
+        ready = threading.Barrier(threads + 1)
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [pool.submit(worker, count) for count in share]
+            try:
+                ready.wait()
+            except threading.BrokenBarrierError:
+                pass
+            wall_started = time.perf_counter()
+            samples = [s for f in futures for s in f.result()]
+    else:
+        wall_started = time.perf_counter()
+        samples = timed(iterations)
+    wall_s = time.perf_counter() - wall_started
+
+    result = summarize(name, samples, outlier_k, confidence)
+    result.update(
+        {
+            "iterations": iterations,
+            "warmup": warmup,
+            "threads": threads,
+            "wall_s": wall_s,
+            "throughput_per_s": len(samples) / wall_s if wall_s > 0 else math.nan,
+        }
+    )
+    return result
+
+
+def exceeds(result: dict, stat: str, limit_ms: float) -> bool:
+    """True when *stat* (e.g. ``"p95"``) is significantly above *limit_ms*.
+
+    Only the lower confidence bound counts, so a noisy run whose interval
+    still reaches below the limit does not fail.
+    """
+    return result[f"{stat}_ci_ms"][0] > limit_ms
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path: str, results: list, suite: str, metadata: dict = None) -> dict:
+    """Write *results* as one JSON document keyed by benchmark name."""
+    document = {
+        "suite": suite,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "metadata": metadata or {},
+        "benchmarks": {r["name"]: r for r in results},
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=2)
+    return document
+
+
+def load_results(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def format_result(result: dict) -> str:
+    """One-line human summary, e.g. for test logs."""
+    parts = [f"{result['name']}: n={result['n']}"]
+    for q in PERCENTILES:
+        lo, hi = result[f"p{q}_ci_ms"]
+        parts.append(f"p{q}={result[f'p{q}_ms']:.2f}ms [{lo:.2f}, {hi:.2f}]")
+    if result["rejected"]:
+        parts.append(f"{result['rejected']} outliers rejected")
+    return ", ".join(parts)
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    stats: tuple = COMPARE_STATS_DEFAULT,
+    min_change: float = MIN_CHANGE_DEFAULT,
+) -> list:
+    """Per-benchmark, per-stat diff of two :func:`write_results` documents.
+
+    A change is significant when the two confidence intervals do not overlap
+    and the point estimate moved by at least *min_change* (relative), so a
+    tight interval on a sub-millisecond query cannot flag a few microseconds.
+    Each row's ``status`` is ``regression``, ``improvement``, ``unchanged``,
+    ``new`` (no baseline) or ``missing`` (dropped from the current run).
+    """
+    old, new = baseline.get("benchmarks", {}), current.get("benchmarks", {})
+    rows = []
+    for name in sorted(set(old) | set(new)):
+        for stat in stats:
+            row = {"name": name, "stat": stat, "baseline_ms": None,
+                   "current_ms": None, "change": None}
+            if name not in old or name not in new:
+                row["status"] = "new" if name in new else "missing"
+                side = new.get(name) or old[name]
+                row["current_ms" if name in new else "baseline_ms"] = side[f"{stat}_ms"]
+                rows.append(row)
+                continue
+            before, after = old[name], new[name]
+            row["baseline_ms"], row["current_ms"] = before[f"{stat}_ms"], after[f"{stat}_ms"]
+            if row["baseline_ms"]:
+                row["change"] = row["current_ms"] / row["baseline_ms"] - 1
+            big = row["change"] is None or abs(row["change"]) >= min_change
+            (b_lo, b_hi), (a_lo, a_hi) = before[f"{stat}_ci_ms"], after[f"{stat}_ci_ms"]
+            if big and a_lo > b_hi:
+                row["status"] = "regression"
+            elif big and a_hi < b_lo:
+                row["status"] = "improvement"
+            else:
+                row["status"] = "unchanged"
+            rows.append(row)
+    return rows
+
+
+def regressions(rows: list) -> list:
+    return [r for r in rows if r["status"] == "regression"]
+
+
+def format_markdown(rows: list, baseline: dict = None, current: dict = None) -> str:
+    """Markdown table of :func:`compare` rows, regressions first."""
+
+    def ms(value):
+        return "–" if value is None else f"{value:.2f}"
+
+    lines = ["## Benchmark comparison", ""]
+    if baseline and current:
+        lines += [
+            f"Baseline: {baseline.get('timestamp', '?')} → "
+            f"current: {current.get('timestamp', '?')}",
+            "",
+        ]
+    found = regressions(rows)
+    lines += [
+        f"**{len(found)} significant regression(s)**" if found
+        else "No significant regressions.",
+        "",
+        "| Benchmark | Stat | Baseline (ms) | Current (ms) | Change | Status |",
+        "|---|---|---:|---:|---:|---|",
+    ]
+    order = {"regression": 0, "missing": 1, "new": 2, "improvement": 3, "unchanged": 4}
+    for r in sorted(rows, key=lambda r: order[r["status"]]):
+        change = "–" if r["change"] is None else f"{r['change']:+.1%}"
+        status = "**regression**" if r["status"] == "regression" else r["status"]
+        lines.append(
+            f"| {r['name']} | {r['stat']} | {ms(r['baseline_ms'])} "
+            f"| {ms(r['current_ms'])} | {change} | {status} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def format_json(rows: list, baseline: dict = None, current: dict = None) -> str:
+    return json.dumps(
+        {
+            "baseline": (baseline or {}).get("timestamp"),
+            "current": (current or {}).get("timestamp"),
+            "regressions": len(regressions(rows)),
+            "rows": rows,
+        },
+        indent=2,
+    ) + "\n"
+
+
+class ThreadState:
+    """One lazily built value per thread, e.g. a DB connection per benchmark
+    thread; ``values`` lists every value created so callers can close them."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.values = []
+
+    def get(self):
+        value = getattr(self._local, "value", None)
+        if value is None:
+            value = self._local.value = self._factory()
+            with self._lock:
+                self.values.append(value)
+        return value
+
+
+def promote(current_path: str, baseline_path: str) -> dict:
+    """Make the results at *current_path* the new baseline at *baseline_path*.
+
+    The document is copied as-is (raw samples included) plus a
+    ``promoted_at`` timestamp, ready to be committed.
+    """
+    document = load_results(current_path)
+    document["promoted_at"] = datetime.now(timezone.utc).isoformat()
+    directory = os.path.dirname(baseline_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(baseline_path, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=2)
+    return document
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark result tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cmp = commands.add_parser(
+        "compare", help="Diff a results file against a baseline results file"
+    )
+    cmp.add_argument("baseline", help="Results JSON of the previous (baseline) run")
+    cmp.add_argument("current", help="Results JSON of the run under review")
+    cmp.add_argument(
+        "--format", choices=("markdown", "json"), default="markdown",
+        help="Report format (default: markdown)",
+    )
+    cmp.add_argument(
+        "--stats", nargs="+", default=list(COMPARE_STATS_DEFAULT),
+        choices=[f"p{q}" for q in PERCENTILES],
+        help="Percentiles to compare (default: p50 p95)",
+    )
+    cmp.add_argument(
+        "--min-change", type=float, default=MIN_CHANGE_DEFAULT,
+        help="Smallest relative change reported as significant (default: 0.10)",
+    )
+    cmp.add_argument("--output", help="Write the report here instead of stdout")
+    prm = commands.add_parser(
+        "promote", help="Make a results file the new baseline (overwrites it)"
+    )
+    prm.add_argument("current", help="Results JSON to accept")
+    prm.add_argument("baseline", help="Baseline file to replace")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    if args.command == "promote":
+        promote(args.current, args.baseline)
+        print(f"Promoted {args.current} → {args.baseline}")
+        return 0
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    rows = compare(baseline, current, tuple(args.stats), args.min_change)
+    render = format_markdown if args.format == "markdown" else format_json
+    report = render(rows, baseline, current)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(report)
+    else:
+        sys.stdout.write(report)
+    return 1 if regressions(rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
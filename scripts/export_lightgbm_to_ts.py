@@ -8,7 +8,13 @@ Usage (CI / local):
 
     python scripts/export_lightgbm_to_ts.py \
         --model artefacts/lightgbm_model.txt \
-        --output supabase/functions/ai-coaching-engine/personalization/lightgbm_model.ts
+        --output supabase/functions/ai-coaching-engine/personalization/lightgbm_model.ts \
+        [--format arrays] [--verify]
+
+``--format arrays`` writes the trees as typed arrays plus a loop-based
+evaluator instead of m2cgen's nested ``if`` branches; the file stays small and
+parses quickly on Edge Function cold start.  Every run prints the generated
+size and Deno scoring speed of both formats.
 
 The script is intentionally dependency-light. It only requires:
   • lightgbm
@@ -23,6 +29,9 @@ from __future__ import annotations
 import argparse
 import pathlib
 import sys
+import tempfile
+
+import numpy as np  # type: ignore
 
 # Third-party – make import errors explicit for CI logs
 try:
@@ -50,9 +59,34 @@ TS_HEADER = """// --------------------------------------------------------------
 """
 
 
-def export(model_path: pathlib.Path, output_path: pathlib.Path) -> None:
-    """Load a LightGBM model and write a TypeScript scorer file."""
+STUB_SCORER = """export function score(_: number[]): number { return 0; }"""
+
+FORMATS = ("m2cgen", "arrays")
+# --verify exit status when the NumPy cross-check cannot represent the model
+# (multiclass, categorical splits); 1 means the export is wrong.
+VERIFY_UNSUPPORTED_EXIT = 2
+
+
+def _lightgbm_numpy():
+    """Import the NumPy companion whether run as a script or as a module."""
+    try:
+        import lightgbm_numpy  # type: ignore
+    except ModuleNotFoundError:  # imported as scripts.export_lightgbm_to_ts
+        from scripts import lightgbm_numpy  # type: ignore
+    return lightgbm_numpy
+
+
+def render(model_path: pathlib.Path, fmt: str = "m2cgen") -> tuple[str, bool]:
+    """Return ``(typescript_source, is_stub)`` for *model_path* in *fmt*.
+
+    ``m2cgen`` emits nested ``if`` branches; ``arrays`` emits the trees as
+    typed arrays walked by a small loop (see ``lightgbm_numpy.to_typescript``).
+    """
     bst = lgb.Booster(model_file=str(model_path))
+    if fmt == "arrays":
+        forest = _lightgbm_numpy().compile_booster(bst)
+        return TS_HEADER + "\n" + _lightgbm_numpy().to_typescript(forest), False
+
     # m2cgen 0.10.x introduced export_to_typescript; older versions only have export_to_javascript
     if hasattr(m2c, "export_to_typescript"):
         ts_code = m2c.export_to_typescript(bst)  # type: ignore[attr-defined]
@@ -63,15 +97,85 @@ def export(model_path: pathlib.Path, output_path: pathlib.Path) -> None:
                 bst)  # type: ignore[attr-defined]
         except NotImplementedError:
             # Generate stub scorer that returns 0; keeps CI green when model unsupported
-            ts_code = """export function score(_: number[]): number { return 0; }"""
+            ts_code = STUB_SCORER
 
     # Prepend header & wrap in ESM export for Deno compatibility
     wrapped_code = TS_HEADER + "\n" + ts_code + \
         "\n\nexport function predictLightGBM(input: number[]): number {\n  return score(input);\n}\n"
+    return wrapped_code, ts_code == STUB_SCORER
+
 
+def export(model_path: pathlib.Path, output_path: pathlib.Path,
+           fmt: str = "m2cgen") -> bool:
+    """Load a LightGBM model and write a TypeScript scorer file.
+
+    Returns ``True`` when m2cgen could not translate the model and the
+    constant-zero stub scorer was written instead.
+    """
+    code, stub = render(model_path, fmt)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(wrapped_code, encoding="utf-8")
-    print(f"[export_lightgbm_to_ts] wrote TypeScript scorer → {output_path}")
+    output_path.write_text(code, encoding="utf-8")
+    print(f"[export_lightgbm_to_ts] wrote TypeScript scorer ({fmt}) → {output_path}")
+    if stub:
+        sys.stderr.write(
+            "[export_lightgbm_to_ts] WARNING: model unsupported by m2cgen – "
+            "wrote stub scorer that always returns 0\n")
+    return stub
+
+
+def report(model_path: pathlib.Path, rows: int = 1000) -> dict:
+    """Print generated size and Deno scoring speed of every export format.
+
+    Formats that cannot represent the model (``arrays`` for multiclass or
+    categorical-split models) are left out of the report.
+    """
+    ln = _lightgbm_numpy()
+    formats = list(FORMATS)
+    try:
+        X = ln.sample_inputs(ln.compile_booster(model_path), n=rows)
+    except NotImplementedError as err:
+        print(f"[export_lightgbm_to_ts]  arrays: not available ({err})")
+        formats.remove("arrays")
+        n_features = lgb.Booster(model_file=str(model_path)).num_feature()
+        X = np.random.default_rng(0).normal(size=(rows, n_features))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            code, stub = render(model_path, fmt)
+            path = pathlib.Path(tmp) / f"lightgbm_model_{fmt}.ts"
+            path.write_text(code, encoding="utf-8")
+            size = path.stat().st_size
+            speed = None if stub else ln.time_ts_scorer(path, X)
+            results[fmt] = {"bytes": size, "stub": stub, "rows_per_s": speed}
+            if stub:
+                timing = "stub scorer – not timed"
+            elif speed is None:
+                timing = "deno not found – not timed"
+            else:
+                timing = f"{speed:,.0f} rows/s"
+            print(f"[export_lightgbm_to_ts] {fmt:>7}: {size / 1024:,.1f} KiB, {timing}")
+    return results
+
+
+def verify(model_path: pathlib.Path, output_path: pathlib.Path, stub: bool) -> None:
+    """Fail unless the exported scorer reproduces LightGBM's own predictions."""
+    if stub:
+        sys.stderr.write(
+            "[export_lightgbm_to_ts] verification failed: stub scorer exported\n")
+        sys.exit(1)
+    try:
+        diff = _lightgbm_numpy().cross_check_ts(model_path, output_path)
+    except NotImplementedError as err:
+        sys.stderr.write(
+            f"[export_lightgbm_to_ts] cross-check not supported for this model: {err}\n")
+        sys.exit(VERIFY_UNSUPPORTED_EXIT)
+    except AssertionError as err:
+        sys.stderr.write(f"[export_lightgbm_to_ts] verification failed: {err}\n")
+        sys.exit(1)
+    if diff is None:
+        print("[export_lightgbm_to_ts] deno not found – TS cross-check skipped")
+    else:
+        print(f"[export_lightgbm_to_ts] verified against LightGBM (max |Δ| = {diff:.2e})")
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -84,6 +188,22 @@ if __name__ == "__main__":  # pragma: no cover
         required=True,
         help="Destination .ts file (will be overwritten)",
     )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="m2cgen",
+        help="m2cgen nested-if scorer or compact typed-array trees",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Fail on a stub export or if predictLightGBM disagrees with LightGBM "
+        f"(exit {VERIFY_UNSUPPORTED_EXIT} if the model cannot be cross-checked)",
+    )
 
     args = parser.parse_args()
-    export(pathlib.Path(args.model), pathlib.Path(args.output))
+    model_path, output_path = pathlib.Path(args.model), pathlib.Path(args.output)
+    stub = export(model_path, output_path, args.format)
+    report(model_path)
+    if args.verify:
+        verify(model_path, output_path, stub)
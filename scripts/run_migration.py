@@ -1,26 +1,306 @@
 #!/usr/bin/env python3
 """
 Simple migration runner for Supabase SQL files
+
+The file is split into statements by a small SQL tokenizer that understands
+quoted strings, identifiers, comments and dollar-quoted bodies, so ``DO $$ ...
+$$`` blocks and function definitions are sent intact.  Each statement is timed
+and statements that take write-blocking locks (e.g. ``CREATE INDEX`` without
+``CONCURRENTLY``) are flagged before anything runs.
+
+With ``--db-url`` (or DATABASE_URL) statements run over one psycopg2
+connection; ``--single-transaction`` applies the whole file atomically.
+Otherwise they go through the Supabase client's ``sql()`` RPC.
+
+``--online-indexes`` rewrites plain ``CREATE INDEX`` to ``CREATE INDEX
+CONCURRENTLY`` and runs it outside the transaction so writes are not blocked;
+the result is checked in ``pg_index.indisvalid`` and an invalid index is
+dropped and rebuilt.
+
+Given a directory (e.g. ``supabase/migrations``) the runner applies only the
+files whose version is missing from the ledger table, over one connection,
+and prints the cumulative duration after each file.
 """
+import argparse
 import os
+import re
 import sys
-from supabase import create_client, Client
+import time
 
+try:
+    from supabase import create_client, Client
+except ImportError:  # only needed without --db-url / DATABASE_URL
+    Client = object  # type: ignore
 
-def run_migration(migration_file: str):
-    """Run a SQL migration file against Supabase"""
+    def create_client(*_args, **_kwargs):  # type: ignore
+        raise RuntimeError(
+            'supabase-py not installed; install with `pip install supabase` or pass --db-url')
+
+# Statements PostgreSQL refuses to run inside a transaction block.
+NON_TRANSACTIONAL = re.compile(
+    r'^(CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY'
+    r'|DROP\s+INDEX\s+CONCURRENTLY'
+    r'|REINDEX\b.*\bCONCURRENTLY'
+    r'|VACUUM\b'
+    r'|CREATE\s+DATABASE\b'
+    r'|DROP\s+DATABASE\b'
+    r'|ALTER\s+SYSTEM\b)',
+    re.IGNORECASE | re.DOTALL)
+
+# (pattern, warning) for top-level statements that block writes while they run.
+LOCK_RULES = [
+    (re.compile(r'^CREATE\s+(UNIQUE\s+)?INDEX\s+(?!CONCURRENTLY\b)', re.IGNORECASE),
+     'CREATE INDEX without CONCURRENTLY blocks writes to the table'),
+    (re.compile(r'^REINDEX\b(?!.*\bCONCURRENTLY\b)', re.IGNORECASE | re.DOTALL),
+     'REINDEX without CONCURRENTLY blocks writes to the table'),
+    (re.compile(r'^ALTER\s+TABLE\b.*\bADD\s+(CONSTRAINT\s+\S+\s+)?'
+                r'(FOREIGN\s+KEY|CHECK)\b(?!.*\bNOT\s+VALID\b)',
+                re.IGNORECASE | re.DOTALL),
+     'ADD CONSTRAINT without NOT VALID scans the table under lock'),
+    (re.compile(r'^ALTER\s+TABLE\b.*\bALTER\s+(COLUMN\s+)?\S+\s+(SET\s+DATA\s+)?TYPE\b',
+                re.IGNORECASE | re.DOTALL),
+     'ALTER COLUMN TYPE may rewrite the table under ACCESS EXCLUSIVE lock'),
+    (re.compile(r'^(VACUUM\s+FULL|CLUSTER|LOCK\s+TABLE)\b', re.IGNORECASE),
+     'takes an ACCESS EXCLUSIVE lock'),
+]
+
+# Bare transaction control; directory mode already wraps each file in one.
+TRANSACTION_CONTROL = re.compile(
+    r'^(BEGIN|START\s+TRANSACTION|COMMIT|END)(\s+(WORK|TRANSACTION))?$', re.IGNORECASE)
+
+# Plain CREATE INDEX that --online-indexes rebuilds as CREATE INDEX CONCURRENTLY.
+_IDENT = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+ONLINE_INDEX = re.compile(
+    r'^(CREATE\s+(?:UNIQUE\s+)?INDEX)\s+(?!CONCURRENTLY\b)(IF\s+NOT\s+EXISTS\s+)?'
+    rf'({_IDENT})\s+ON\s+(?:ONLY\s+)?((?:{_IDENT}\.)?{_IDENT})',
+    re.IGNORECASE)
+INDEX_RETRIES_DEFAULT = 2
+
+LEDGER_TABLE_DEFAULT = 'supabase_migrations.schema_migrations'
+
+_DOLLAR_TAG = re.compile(r'\$([A-Za-z_][A-Za-z_0-9]*)?\$')
+
+
+def _scan(sql: str):
+    """Yield ``(kind, text)`` segments of *sql*.
+
+    *kind* is ``code``, ``string`` (quoted literal, identifier or
+    dollar-quoted body), ``comment`` or ``;`` for a top-level terminator.
+    """
+    i, n = 0, len(sql)
+    start = 0
+    while i < n:
+        ch = sql[i]
+        nxt = sql[i + 1] if i + 1 < n else ''
+        if ch == ';':
+            if start < i:
+                yield 'code', sql[start:i]
+            yield ';', ';'
+            i += 1
+            start = i
+            continue
+        if ch == '-' and nxt == '-':
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+            kind_end = end
+        elif ch == '/' and nxt == '*':
+            # block comments nest in PostgreSQL
+            depth, j = 1, i + 2
+            while j < n and depth:
+                if sql.startswith('/*', j):
+                    depth, j = depth + 1, j + 2
+                elif sql.startswith('*/', j):
+                    depth, j = depth - 1, j + 2
+                else:
+                    j += 1
+            kind_end = j
+        elif ch in ("'", '"'):
+            backslash = (ch == "'" and i > 0 and sql[i - 1] in 'eE'
+                         and (i < 2 or not (sql[i - 2].isalnum() or sql[i - 2] == '_')))
+            j = i + 1
+            while j < n:
+                if backslash and sql[j] == '\\':
+                    j += 2
+                    continue
+                if sql[j] == ch:
+                    if j + 1 < n and sql[j + 1] == ch:  # doubled quote
+                        j += 2
+                        continue
+                    break
+                j += 1
+            kind_end = min(j + 1, n)
+        elif ch == '$' and not (i > 0 and (sql[i - 1].isalnum() or sql[i - 1] == '_')):
+            m = _DOLLAR_TAG.match(sql, i)
+            if not m:
+                i += 1
+                continue
+            close = sql.find(m.group(0), m.end())
+            kind_end = n if close == -1 else close + len(m.group(0))
+        else:
+            i += 1
+            continue
+        if start < i:
+            yield 'code', sql[start:i]
+        yield ('comment' if ch in '-/' else 'string'), sql[i:kind_end]
+        i = start = kind_end
+    if start < n:
+        yield 'code', sql[start:]
+
+
+def split_statements(sql: str) -> list:
+    """Split *sql* on top-level ``;`` – never inside strings, comments or $$."""
+    statements, current, has_code = [], [], False
+    for kind, text in _scan(sql):
+        if kind == ';':
+            if has_code:
+                statements.append(''.join(current).strip())
+            current, has_code = [], False
+            continue
+        current.append(text)
+        if kind != 'comment' and text.strip():
+            has_code = True
+    if has_code:
+        statements.append(''.join(current).strip())
+    return statements
+
+
+def strip_comments(statement: str) -> str:
+    """*statement* without comments, whitespace-collapsed at the top level."""
+    parts = []
+    for kind, text in _scan(statement):
+        if kind == 'comment':
+            parts.append(' ')
+        elif kind == 'code':
+            parts.append(re.sub(r'\s+', ' ', text))
+        else:
+            parts.append(text)
+    return ''.join(parts).strip()
+
+
+def drop_transaction_control(statements: list) -> list:
+    """*statements* without bare BEGIN/COMMIT, for runners that own the transaction."""
+    return [s for s in statements if not TRANSACTION_CONTROL.match(strip_comments(s))]
 
-    # Load environment variables
-    supabase_url = os.getenv('SUPABASE_URL')
-    supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
-    if not supabase_url or not supabase_key:
-        print(
-            'Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables')
+def lock_warnings(statement: str) -> list:
+    """Warnings for a top-level statement that blocks writes while it runs."""
+    code = strip_comments(statement)
+    return [message for pattern, message in LOCK_RULES if pattern.search(code)]
+
+
+def is_transactional(statement: str) -> bool:
+    return not NON_TRANSACTIONAL.search(strip_comments(statement))
+
+
+def _summary(statement: str, width: int = 70) -> str:
+    code = strip_comments(statement).split('$', 1)[0].strip()
+    return code if len(code) <= width else code[:width - 1] + '…'
+
+
+def join_statements(statements: list) -> str:
+    """``;``-join *statements* into one script.
+
+    A statement ending in a ``--`` comment gets a newline first, otherwise the
+    comment would swallow the ``;`` and the statement after it.
+    """
+    parts = []
+    for statement in statements:
+        segments = list(_scan(statement))
+        if segments and segments[-1][0] == 'comment' and segments[-1][1].startswith('--'):
+            statement += '\n'
+        parts.append(statement)
+    return ';\n'.join(parts)
+
+
+def _print_report(timings: list, total: float):
+    print(f'\nStatement timings ({len(timings)} statements, {total * 1000:.0f} ms total):')
+    for index, elapsed, statement in sorted(timings, key=lambda t: -t[1])[:10]:
+        print(f'  #{index:<4} {elapsed * 1000:>9.1f} ms  {_summary(statement)}')
+
+
+def _connect(db_url: str):
+    import psycopg2  # type: ignore
+
+    return psycopg2.connect(db_url)
+
+
+def _run_pg(conn, statements: list, single_transaction: bool) -> list:
+    """Execute *statements* over an open psycopg2 connection; return timings."""
+    conn.autocommit = not single_transaction
+    timings = []
+    try:
+        with conn.cursor() as cur:
+            for i, statement in enumerate(statements, start=1):
+                print(f'Executing statement {i}/{len(statements)}...')
+                started = time.perf_counter()
+                if single_transaction:
+                    cur.execute('SAVEPOINT run_migration_stmt')
+                try:
+                    cur.execute(statement)
+                except Exception as e:
+                    print(f'Error in statement {i}: {e}')
+                    if 'already exists' not in str(e).lower():
+                        raise
+                    if single_transaction:
+                        cur.execute('ROLLBACK TO SAVEPOINT run_migration_stmt')
+                timings.append((i, time.perf_counter() - started, statement))
+                print(f'Statement {i} executed successfully')
+        if single_transaction:
+            conn.commit()
+    except Exception:
+        if single_transaction:
+            conn.rollback()
+        raise
+    return timings
+
+
+def _run_supabase(supabase: Client, statements: list, single_transaction: bool) -> list:
+    """Execute *statements* through the Supabase ``sql()`` RPC; return timings."""
+    if single_transaction:
+        # one round trip; the RPC gives no handle to hold a transaction open
+        script = 'BEGIN;\n' + join_statements(statements + ['COMMIT']) + ';'
+        print(f'Executing {len(statements)} statements in one transaction...')
+        started = time.perf_counter()
+        supabase.sql(script)
+        return [(1, time.perf_counter() - started, 'BEGIN … COMMIT (whole file)')]
+
+    timings = []
+    for i, statement in enumerate(statements, start=1):
+        print(f'Executing statement {i}/{len(statements)}...')
+        started = time.perf_counter()
+        try:
+            supabase.sql(statement)
+            print(f'Statement {i} executed successfully')
+        except Exception as e:
+            print(f'Error in statement {i}: {e}')
+            if 'already exists' not in str(e).lower():
+                raise
+        timings.append((i, time.perf_counter() - started, statement))
+    return timings
+
+
+def run_migration(migration_file: str, db_url: str = None,
+                  single_transaction: bool = False, online_indexes: bool = False,
+                  index_retries: int = INDEX_RETRIES_DEFAULT):
+    """Run a SQL migration file against Supabase"""
+
+    db_url = db_url or os.getenv('DATABASE_URL')
+    if online_indexes and not db_url:
+        print('Error: --online-indexes needs --db-url or DATABASE_URL')
         return False
+    supabase = None
+    if not db_url:
+        # Load environment variables
+        supabase_url = os.getenv('SUPABASE_URL')
+        supabase_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+
+        if not supabase_url or not supabase_key:
+            print(
+                'Error: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY environment variables')
+            return False
 
-    # Create client
-    supabase: Client = create_client(supabase_url, supabase_key)
+        # Create client
+        supabase = create_client(supabase_url, supabase_key)
 
     try:
         # Read migration file
@@ -28,21 +308,38 @@ def run_migration(migration_file: str):
             migration_sql = f.read()
 
         print(f'Running migration: {migration_file}')
+        statements = split_statements(migration_sql)
+        if single_transaction:
+            # the runner's transaction replaces the file's own BEGIN … COMMIT
+            statements = drop_transaction_control(statements)
 
-        # Split into individual statements and execute
-        statements = [stmt.strip()
-                      for stmt in migration_sql.split(';') if stmt.strip()]
+        _print_lock_warnings(statements, os.path.basename(migration_file), online_indexes)
+        if single_transaction and not online_indexes:
+            blocked = [i for i, s in enumerate(statements, start=1)
+                       if not is_transactional(s)]
+            if blocked:
+                print('Error: statements ' + ', '.join(map(str, blocked)) +
+                      ' cannot run inside a transaction; drop --single-transaction')
+                return False
 
-        for i, statement in enumerate(statements):
-            if statement:
-                print(f'Executing statement {i+1}/{len(statements)}...')
-                try:
-                    result = supabase.sql(statement)
-                    print(f'Statement {i+1} executed successfully')
-                except Exception as e:
-                    print(f'Error in statement {i+1}: {e}')
-                    if 'already exists' not in str(e).lower():
-                        raise
+        started = time.perf_counter()
+        if online_indexes:
+            # index builds run outside any transaction, between batches
+            conn = _connect(db_url)
+            try:
+                _apply_plan(conn, statements, None, True, index_retries)
+            finally:
+                conn.close()
+            timings = [(1, time.perf_counter() - started, 'whole file (online indexes)')]
+        elif supabase is None:
+            conn = _connect(db_url)
+            try:
+                timings = _run_pg(conn, statements, single_transaction)
+            finally:
+                conn.close()
+        else:
+            timings = _run_supabase(supabase, statements, single_transaction)
+        _print_report(timings, time.perf_counter() - started)
 
         print('Migration completed successfully!')
         return True
@@ -52,16 +349,217 @@ def run_migration(migration_file: str):
         return False
 
 
-if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print('Usage: python run_migration.py <migration_file>')
-        sys.exit(1)
+def _migration_version(filename: str) -> str:
+    """``20241215000000_momentum_meter.sql`` → ``20241215000000`` (as the Supabase CLI)."""
+    return os.path.splitext(os.path.basename(filename))[0].split('_', 1)[0]
+
+
+def _ensure_ledger(cur, ledger_table: str):
+    schema = ledger_table.split('.', 1)[0] if '.' in ledger_table else None
+    if schema:
+        cur.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+    cur.execute(f'CREATE TABLE IF NOT EXISTS {ledger_table} '
+                '(version text PRIMARY KEY, statements text[], name text)')
+    cur.execute(f'SELECT version FROM {ledger_table}')
+    return {row[0] for row in cur.fetchall()}
+
+
+def online_index_rewrite(statement: str):
+    """``(concurrent_sql, qualified_index_name)`` for a plain CREATE INDEX, else None."""
+    code = strip_comments(statement)
+    m = ONLINE_INDEX.match(code)
+    if not m:
+        return None
+    verb, if_not_exists, name, table = m.groups()
+    schema = table.rsplit('.', 1)[0] + '.' if '.' in table else ''
+    rewritten = f'{verb} CONCURRENTLY {if_not_exists or ""}{name}{code[m.end(3):]}'
+    return rewritten, schema + name
+
+
+def _index_is_valid(cur, qualified_name: str):
+    """``pg_index.indisvalid`` for the index, or None if it does not exist."""
+    cur.execute('SELECT i.indisvalid FROM pg_index i '
+                'WHERE i.indexrelid = to_regclass(%s)', (qualified_name,))
+    row = cur.fetchone()
+    return None if row is None else bool(row[0])
+
 
-    migration_file = sys.argv[1]
+def build_index_online(conn, statement: str, concurrent_sql: str, name: str,
+                       retries: int = INDEX_RETRIES_DEFAULT) -> int:
+    """Build an index with CONCURRENTLY outside any transaction and validate it.
+
+    A failed concurrent build leaves an INVALID index behind; it is dropped
+    (also concurrently) and the build retried up to *retries* times.  Returns
+    the number of attempts used.
+    """
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for attempt in range(1, retries + 2):
+            started = time.perf_counter()
+            error = None
+            try:
+                cur.execute(concurrent_sql)
+            except Exception as e:
+                if 'partitioned' in str(e).lower():
+                    # CONCURRENTLY is not supported on partitioned tables
+                    print(f'Index {name}: {e} – building without CONCURRENTLY')
+                    cur.execute(statement)
+                    return attempt
+                error = e
+            valid = _index_is_valid(cur, name)
+            if valid and (error is None or 'already exists' in str(error).lower()):
+                print(f'Built index {name} CONCURRENTLY in '
+                      f'{(time.perf_counter() - started) * 1000:.0f} ms (attempt {attempt})')
+                return attempt
+            if error is None and valid is None:
+                print(f'WARNING index {name} built but not found for validation')
+                return attempt
+            print(f'Index {name} attempt {attempt} failed: '
+                  f'{error or "index is INVALID"}')
+            if valid is False:
+                cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        raise RuntimeError(f'index {name} still invalid after {retries + 1} attempts'
+                           + (f': {error}' if error else ''))
+
+
+def _apply_plan(conn, statements: list, ledger_insert: str = None,
+                online_indexes: bool = False,
+                index_retries: int = INDEX_RETRIES_DEFAULT):
+    """Apply one file's statements in order over *conn*.
+
+    Consecutive transactional statements are pipelined as one multi-statement
+    query inside a transaction; statements that cannot run in a transaction
+    (and, with *online_indexes*, plain CREATE INDEX rebuilt CONCURRENTLY) run
+    on their own in autocommit at their original position.  *ledger_insert*
+    rides along with the last transactional batch.
+    """
+    batch = []
+
+    def flush(extra=()):
+        sql = batch + list(extra)
+        batch.clear()
+        if not sql:
+            return
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cur:
+                cur.execute(join_statements(sql))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    for statement in drop_transaction_control(statements):
+        online = online_index_rewrite(statement) if online_indexes else None
+        if online:
+            flush()
+            build_index_online(conn, statement, *online, retries=index_retries)
+        elif not is_transactional(statement):
+            flush()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(statement)
+        else:
+            batch.append(statement)
+    flush([ledger_insert] if ledger_insert else ())
+
+
+def _print_lock_warnings(statements: list, label: str, online_indexes: bool):
+    for i, statement in enumerate(statements, start=1):
+        if online_indexes and online_index_rewrite(statement):
+            print(f'{label} statement {i} ({_summary(statement, 50)}): '
+                  'will be built CONCURRENTLY')
+            continue
+        for warning in lock_warnings(statement):
+            print(f'WARNING {label} statement {i} ({_summary(statement, 50)}): {warning}')
+
+
+def run_migrations(directory: str, db_url: str = None,
+                   ledger_table: str = LEDGER_TABLE_DEFAULT,
+                   online_indexes: bool = False,
+                   index_retries: int = INDEX_RETRIES_DEFAULT):
+    """Apply every pending ``*.sql`` file in *directory*, in filename order.
+
+    Applied versions are recorded in *ledger_table* (by default the Supabase
+    CLI's own ``supabase_migrations.schema_migrations``, so CLI-applied files
+    are skipped too).  All files share one connection.  A file whose statements
+    can all run in a transaction is sent as a single multi-statement query
+    together with its ledger row – one round trip, atomic per file; statements
+    that cannot run in a transaction are executed on their own in between
+    (see :func:`_apply_plan`).
+    """
+    db_url = db_url or os.getenv('DATABASE_URL')
+    if not db_url:
+        print('Error: directory mode needs --db-url or DATABASE_URL')
+        return False
+
+    files = sorted(f for f in os.listdir(directory) if f.endswith('.sql'))
+    conn = _connect(db_url)
+    applied = skipped = 0
+    cumulative = 0.0
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            done = _ensure_ledger(cur, ledger_table)
+        for filename in files:
+            version = _migration_version(filename)
+            if version in done:
+                skipped += 1
+                continue
+            with open(os.path.join(directory, filename), 'r') as f:
+                statements = split_statements(f.read())
+            _print_lock_warnings(statements, filename, online_indexes)
+
+            with conn.cursor() as cur:
+                ledger_insert = cur.mogrify(
+                    f'INSERT INTO {ledger_table} (version, statements, name) '
+                    'VALUES (%s, %s, %s)',
+                    (version, statements, filename[:-len('.sql')].split('_', 1)[-1])).decode()
+            started = time.perf_counter()
+            try:
+                _apply_plan(conn, statements, ledger_insert, online_indexes, index_retries)
+            except Exception as e:
+                print(f'Migration {filename} failed: {e}')
+                return False
+            elapsed = time.perf_counter() - started
+            cumulative += elapsed
+            done.add(version)
+            applied += 1
+            print(f'Applied {filename} ({len(statements)} statements) '
+                  f'in {elapsed * 1000:.0f} ms – cumulative {cumulative:.2f} s')
+    finally:
+        conn.close()
+
+    print(f'Migrations complete: {applied} applied, {skipped} already applied '
+          f'({cumulative:.2f} s)')
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a SQL migration file')
+    parser.add_argument('migration_file',
+                        help='Path to the .sql migration, or a directory of migrations to apply')
+    parser.add_argument('--db-url',
+                        help='Postgres URL; run over psycopg2 (defaults to DATABASE_URL env var)')
+    parser.add_argument('--single-transaction', action='store_true',
+                        help='Apply every statement in one transaction (all or nothing)')
+    parser.add_argument('--ledger-table', default=LEDGER_TABLE_DEFAULT,
+                        help=f'Applied-version ledger for directory mode (default: {LEDGER_TABLE_DEFAULT})')
+    parser.add_argument('--online-indexes', action='store_true',
+                        help='Rebuild plain CREATE INDEX as CONCURRENTLY outside the transaction, '
+                             'validating and retrying invalid indexes')
+    parser.add_argument('--index-retries', type=int, default=INDEX_RETRIES_DEFAULT,
+                        help=f'Retries for an invalid concurrent index build (default: {INDEX_RETRIES_DEFAULT})')
+    args = parser.parse_args()
 
-    if not os.path.exists(migration_file):
-        print(f'Error: Migration file {migration_file} not found')
+    if not os.path.exists(args.migration_file):
+        print(f'Error: Migration file {args.migration_file} not found')
         sys.exit(1)
 
-    success = run_migration(migration_file)
+    if os.path.isdir(args.migration_file):
+        success = run_migrations(args.migration_file, args.db_url, args.ledger_table,
+                                 args.online_indexes, args.index_retries)
+    else:
+        success = run_migration(args.migration_file, args.db_url, args.single_transaction,
+                                args.online_indexes, args.index_retries)
     sys.exit(0 if success else 1)
@@ -0,0 +1,185 @@
+"""Batch-score NDJSON or Parquet inputs with an exported ``jitai_model.json``.
+
+Usage:
+    python scripts/score_jitai_model.py jitai_model.json export.ndjson [more ...]
+        [--output jitai_scores.csv] [--chunk_rows 50000]
+
+Rows are scored in fixed-size chunks with one vectorized dot product each, so
+memory stays flat however many months of history are back-scored.  Scoring
+mirrors ``predict-jitai``'s ``probability()``: a missing feature contributes
+nothing to the logit (rather than the training-time mean fill) and
+``patient_hash`` is always derived from ``patient_id``.
+
+The output CSV has ``source``, ``row``, ``patient_id``, ``probability`` and
+``decision`` (``probability >= threshold``) columns.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+try:
+    from train_jitai_model import (  # type: ignore
+        CHUNK_ROWS_DEFAULT,
+        FEATURES,
+        RAW_CATEGORICAL,
+        RAW_NUMERIC,
+        _hash_patient_ids,
+        iter_ndjson_chunks,
+    )
+except ModuleNotFoundError:  # imported as scripts.score_jitai_model
+    from scripts.train_jitai_model import (  # type: ignore
+        CHUNK_ROWS_DEFAULT,
+        FEATURES,
+        RAW_CATEGORICAL,
+        RAW_NUMERIC,
+        _hash_patient_ids,
+        iter_ndjson_chunks,
+    )
+
+
+def load_artefact(path: str):
+    """Return ``(weights, intercept, threshold)`` ordered like ``FEATURES``."""
+    with open(path, "r", encoding="utf-8") as fh:
+        artefact = json.load(fh)
+    weights = np.array(
+        [float(artefact["coeff"].get(f, 0.0)) for f in FEATURES], dtype=np.float64
+    )
+    return weights, float(artefact["intercept"]), float(artefact.get("threshold", 0.5))
+
+
+def iter_feature_chunks(path: str, chunk_rows: int = CHUNK_ROWS_DEFAULT):
+    """Yield ``(X, patient_ids)`` chunks from an NDJSON or Parquet file.
+
+    ``X`` is a float64 ``(n, len(FEATURES))`` matrix with NaN for missing
+    values; ``patient_ids`` is a Series (all missing when the field is absent).
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq  # type: ignore
+
+        parquet = pq.ParquetFile(path, memory_map=True)
+        names = set(parquet.schema_arrow.names)
+        # patient_hash is derived from patient_id; outcome is not a feature
+        feature_columns = RAW_NUMERIC + ["patient_id"]
+        if not names & set(feature_columns):
+            raise ValueError(
+                f"{path} has none of the feature columns "
+                f"({', '.join(feature_columns)})"
+            )
+        columns = [c for c in RAW_NUMERIC + RAW_CATEGORICAL if c in names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            frame = batch.to_pandas()
+            yield _to_matrix(
+                {c: frame[c].to_numpy() for c in frame.columns}, set(frame.columns)
+            )
+    else:
+        for columns, present in iter_ndjson_chunks(path, chunk_rows):
+            yield _to_matrix(columns, present)
+
+
+def _to_matrix(columns: dict, present: set):
+    n = len(next(iter(columns.values())))
+    if "patient_id" in present:
+        ids = pd.Series(columns["patient_id"])
+    else:
+        ids = pd.Series([None] * n, dtype=object)
+    X = np.full((n, len(FEATURES)), np.nan)
+    for j, col in enumerate(FEATURES):
+        if col == "patient_hash":
+            X[:, j] = _hash_patient_ids(ids)
+        elif col in present:
+            X[:, j] = pd.to_numeric(pd.Series(columns[col]), errors="coerce")
+    return X, ids
+
+
+def score_matrix(X: np.ndarray, weights: np.ndarray, intercept: float) -> np.ndarray:
+    """Logistic probability per row; NaN features contribute 0 to the logit."""
+    z = intercept + np.nan_to_num(X, nan=0.0) @ weights
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def score_files(
+    model_path: str,
+    paths: list,
+    output_path: str,
+    chunk_rows: int = CHUNK_ROWS_DEFAULT,
+) -> dict:
+    """Score every row of *paths* into *output_path*; return throughput stats."""
+    weights, intercept, threshold = load_artefact(model_path)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    rows = positives = 0
+    prob_sum = 0.0
+    score_seconds = 0.0
+    started = time.monotonic()
+    for path in paths:
+        offset = 0
+        for X, ids in iter_feature_chunks(path, chunk_rows):
+            t0 = time.monotonic()
+            probs = score_matrix(X, weights, intercept)
+            score_seconds += time.monotonic() - t0
+            decisions = probs >= threshold
+            pd.DataFrame(
+                {
+                    "source": os.path.basename(path),
+                    "row": np.arange(offset, offset + len(probs)),
+                    "patient_id": ids.to_numpy(dtype=object),
+                    "probability": probs,
+                    "decision": decisions.astype(int),
+                }
+            ).to_csv(output_path, mode="a", header=rows == 0, index=False)
+            offset += len(probs)
+            rows += len(probs)
+            positives += int(decisions.sum())
+            prob_sum += float(probs.sum())
+
+    elapsed = time.monotonic() - started
+    return {
+        "rows": rows,
+        "positives": positives,
+        "mean_probability": prob_sum / rows if rows else 0.0,
+        "elapsed_s": elapsed,
+        "rows_per_s": rows / elapsed if elapsed > 0 else 0.0,
+        "score_rows_per_s": rows / score_seconds if score_seconds > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Batch-score data with an exported JITAI logistic model"
+    )
+    parser.add_argument("model_path", help="Path to jitai_model.json")
+    parser.add_argument(
+        "input_paths", nargs="+", help="NDJSON or .parquet file(s) to score"
+    )
+    parser.add_argument(
+        "--output", default="jitai_scores.csv", help="Path for the scored CSV"
+    )
+    parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=CHUNK_ROWS_DEFAULT,
+        help="Rows scored per chunk",
+    )
+    args = parser.parse_args()
+
+    stats = score_files(args.model_path, args.input_paths, args.output, args.chunk_rows)
+    print(
+        f"Scored {stats['rows']} rows → {args.output} "
+        f"({stats['positives']} above threshold, "
+        f"mean p={stats['mean_probability']:.4f})"
+    )
+    print(
+        f"Throughput: {stats['rows_per_s']:,.0f} rows/s end-to-end, "
+        f"{stats['score_rows_per_s']:,.0f} rows/s scoring "
+        f"({stats['elapsed_s']:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
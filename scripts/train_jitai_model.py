@@ -1,11 +1,17 @@
 import argparse
+import hashlib
 import json
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
 
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
-from sklearn.linear_model import LogisticRegression  # type: ignore
+from pandas.api.types import union_categoricals  # type: ignore
+from sklearn.linear_model import LogisticRegression, SGDClassifier  # type: ignore
 from sklearn.metrics import roc_auc_score  # type: ignore
-from sklearn.model_selection import train_test_split  # type: ignore
+from sklearn.model_selection import StratifiedKFold, train_test_split  # type: ignore
 
 FEATURES = [
     "sleep_score",
@@ -17,17 +23,67 @@ FEATURES = [
     "patient_hash",
 ]
 
+# Raw NDJSON fields the model needs; patient_hash is derived from patient_id.
+RAW_NUMERIC = [f for f in FEATURES if f != "patient_hash"]
+RAW_CATEGORICAL = ["outcome", "patient_id"]
+CHUNK_ROWS_DEFAULT = 50_000
+# Share of a cold-start first chunk held out (scored before it is trained on).
+COLD_HOLDOUT = 0.25
+C_GRID_DEFAULT = (0.01, 0.1, 1.0, 10.0)
+CACHE_DIR_DEFAULT = ".jitai_cache"
+# Parquet key-value metadata listing the raw fields present in the source.
+_PRESENT_KEY = b"jitai_present_columns"
+# Bump when the shard layout changes without a change to the column lists.
+CACHE_FORMAT = 1
+
+
+def _utf16_units(text: str) -> np.ndarray:
+    """UTF-16 code units of *text* – what JS ``charCodeAt`` iterates over."""
+    return np.frombuffer(text.encode("utf-16-le"), dtype="<u2")
+
 
 def _hash_patient_id(pid: str) -> float:
     """Quick deterministic hash → float 0-1 (matches Deno/TS patientHash)."""
     if not isinstance(pid, str):
         pid = str(pid or "")
     h = 0
-    for ch in pid:
-        h = (h * 31 + ord(ch)) & 0xFFFFFFFF
+    for unit in _utf16_units(pid).tolist():
+        h = (h * 31 + unit) & 0xFFFFFFFF
     return (h % 1000) / 1000.0
 
 
+def _hash_patient_ids(ids: pd.Series) -> np.ndarray:
+    """Vectorized :func:`_hash_patient_id` over a Series of patient ids.
+
+    Ids repeat heavily, so each distinct id is hashed once and broadcast back.
+    The distinct ids are hashed together as a zero-padded matrix of UTF-16
+    code units, advancing the rolling hash one character column at a time.
+    """
+    codes, uniques = pd.factorize(ids)
+    units = [_utf16_units(u if isinstance(u, str) else str(u or "")) for u in uniques]
+    lengths = np.array([len(u) for u in units], dtype=np.int64)
+    width = int(lengths.max()) if len(units) else 0
+    matrix = np.zeros((len(units), width), dtype=np.uint64)
+    for row, u in enumerate(units):
+        matrix[row, : len(u)] = u
+
+    h = np.zeros(len(units), dtype=np.uint64)
+    for pos in range(width):
+        # ids shorter than *pos* keep their finished hash
+        active = lengths > pos
+        h[active] = (h[active] * 31 + matrix[active, pos]) & 0xFFFFFFFF
+    # trailing slot absorbs the -1 code factorize gives missing values
+    per_unique = np.append((h % 1000).astype(np.float64) / 1000.0, 0.0)
+    hashes = per_unique[codes]
+
+    # None and NaN stringify differently, so hash missing ids one by one
+    missing = codes < 0
+    if missing.any():
+        raw = ids.to_numpy(dtype=object)[missing]
+        hashes[missing] = [_hash_patient_id(v) for v in raw]
+    return hashes
+
+
 def load_ndjson(path: str) -> pd.DataFrame:
     """Load newline-delimited JSON into a DataFrame."""
     records = []
@@ -42,13 +98,196 @@ def load_ndjson(path: str) -> pd.DataFrame:
     return pd.DataFrame.from_records(records)
 
 
+def _categorical(values: list) -> pd.Categorical:
+    """Categorical of *values* as strings, missing values kept missing.
+
+    Categories are always object-dtype strings – even for an all-null or
+    all-numeric chunk – so every chunk's categorical can be unioned.
+    """
+    labels = pd.Series(values, dtype=object)
+    labels = labels.where(labels.isna(), labels.astype(str))
+    categories = pd.Index(labels.dropna().unique(), dtype=object)
+    return pd.Categorical(labels, categories=categories)
+
+
+def _chunk_to_columns(chunk: list) -> dict:
+    """Convert a list of parsed records into typed column arrays."""
+    cols = {}
+    for col in RAW_NUMERIC:
+        raw = pd.Series([rec.get(col) for rec in chunk], dtype=object)
+        cols[col] = pd.to_numeric(raw, errors="coerce").to_numpy(np.float32)
+    for col in RAW_CATEGORICAL:
+        cols[col] = _categorical([rec.get(col) for rec in chunk])
+    return cols
+
+
+def iter_ndjson_chunks(path: str, chunk_rows: int = CHUNK_ROWS_DEFAULT):
+    """Yield ``(columns, present)`` for each fixed-size chunk of *path*.
+
+    *columns* maps every raw model field to a typed array for the chunk and
+    *present* is the set of those fields that appeared in any of its records.
+    """
+    chunk: list = []
+
+    def _emit():
+        present = {
+            col
+            for col in RAW_NUMERIC + RAW_CATEGORICAL
+            if any(col in rec for rec in chunk)
+        }
+        return _chunk_to_columns(chunk), present
+
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_rows:
+                yield _emit()
+                chunk = []
+    if chunk:
+        yield _emit()
+
+
+def load_ndjson_streaming(
+    path: str, chunk_rows: int = CHUNK_ROWS_DEFAULT
+) -> pd.DataFrame:
+    """Load NDJSON in fixed-size chunks, keeping only the model's columns.
+
+    Only ``chunk_rows`` parsed records are alive at a time; each chunk is
+    reduced to float32 feature arrays plus categorical ``outcome`` /
+    ``patient_id`` before the next one is read, so peak memory tracks the
+    final columnar frame rather than a list of dicts for the whole file.
+    """
+    parts: dict = {col: [] for col in RAW_NUMERIC + RAW_CATEGORICAL}
+    # remember which fields exist at all so absent ones stay absent
+    seen: set = set()
+    for columns, present in iter_ndjson_chunks(path, chunk_rows):
+        seen |= present
+        for col, arr in columns.items():
+            parts[col].append(arr)
+    if not parts["outcome"]:
+        raise ValueError("no records loaded from NDJSON – aborting")
+
+    data = {col: np.concatenate(parts[col]) for col in RAW_NUMERIC if col in seen}
+    for col in RAW_CATEGORICAL:
+        if col in seen:
+            data[col] = union_categoricals(parts[col])
+    return pd.DataFrame(data)
+
+
+def _file_digest(path: str) -> str:
+    """SHA-256 of *path*'s bytes – the cache key for its Parquet shard."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _schema_tag() -> str:
+    """Short digest of the shard layout, so a feature change misses the cache."""
+    layout = json.dumps([CACHE_FORMAT, RAW_NUMERIC, RAW_CATEGORICAL])
+    return hashlib.sha256(layout.encode()).hexdigest()[:12]
+
+
+def _parquet_schema():
+    import pyarrow as pa  # type: ignore
+
+    fields = [pa.field(col, pa.float32()) for col in RAW_NUMERIC]
+    fields += [pa.field(col, pa.string()) for col in RAW_CATEGORICAL]
+    return pa.schema(fields)
+
+
+def ndjson_to_parquet(
+    path: str,
+    cache_dir: str = CACHE_DIR_DEFAULT,
+    chunk_rows: int = CHUNK_ROWS_DEFAULT,
+) -> str:
+    """Convert *path* to a typed Parquet shard in *cache_dir*, once.
+
+    The shard is named after the NDJSON's content hash plus the shard layout
+    (:func:`_schema_tag`), so an export that was already converted – on any
+    previous day – is reused without re-parsing, while changing ``FEATURES``
+    converts it afresh.
+    Rows are streamed through :func:`iter_ndjson_chunks`; only the model's raw
+    columns are written.  Returns the shard path.
+    """
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+
+    os.makedirs(cache_dir, exist_ok=True)
+    target = os.path.join(cache_dir, f"{_file_digest(path)}-{_schema_tag()}.parquet")
+    if os.path.exists(target):
+        return target
+
+    schema = _parquet_schema()
+    seen: set = set()
+    tmp = f"{target}.tmp"
+    try:
+        with pq.ParquetWriter(tmp, schema) as writer:
+            for columns, present in iter_ndjson_chunks(path, chunk_rows):
+                seen |= present
+                arrays = [pa.array(columns[col]) for col in RAW_NUMERIC]
+                arrays += [
+                    pa.array(
+                        pd.Series(columns[col]).astype("string"), type=pa.string()
+                    )
+                    for col in RAW_CATEGORICAL
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            if "outcome" not in seen:
+                raise ValueError("no records loaded from NDJSON – aborting")
+            writer.add_key_value_metadata(
+                {_PRESENT_KEY: json.dumps(sorted(seen)).encode()}
+            )
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return target
+
+
+def load_parquet(path: str) -> pd.DataFrame:
+    """Memory-map a Parquet shard and read only the model's columns.
+
+    ``outcome`` / ``patient_id`` come back dictionary-encoded (pandas
+    categoricals); fields absent from the original NDJSON are omitted, as in
+    :func:`load_ndjson`.
+    """
+    import pyarrow.parquet as pq  # type: ignore
+
+    meta = pq.ParquetFile(path, memory_map=True).metadata.metadata or {}
+    wanted = RAW_NUMERIC + RAW_CATEGORICAL
+    present = set(json.loads(meta[_PRESENT_KEY])) if _PRESENT_KEY in meta else None
+    columns = [c for c in wanted if present is None or c in present]
+    table = pq.read_table(
+        path,
+        columns=columns,
+        memory_map=True,
+        read_dictionary=[c for c in RAW_CATEGORICAL if c in columns],
+    )
+    return table.to_pandas()
+
+
+def load_cached(
+    path: str,
+    cache_dir: str = CACHE_DIR_DEFAULT,
+    chunk_rows: int = CHUNK_ROWS_DEFAULT,
+) -> pd.DataFrame:
+    """Load *path* (NDJSON or Parquet) through the columnar cache."""
+    if path.endswith(".parquet"):
+        return load_parquet(path)
+    return load_parquet(ndjson_to_parquet(path, cache_dir, chunk_rows))
+
+
 def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
     # Outcome: engaged (1) vs otherwise (0)
     df = df.copy()
     df["label"] = (df["outcome"] == "engaged").astype(int)
     # Derive patient_hash then fill missing numeric features
     if "patient_id" in df.columns:
-        df["patient_hash"] = df["patient_id"].apply(_hash_patient_id)
+        df["patient_hash"] = _hash_patient_ids(df["patient_id"])
     else:
         df["patient_hash"] = 0.0
     # Fill missing numeric features with column mean
@@ -74,21 +313,232 @@ def train(df: pd.DataFrame):
     return model, auc
 
 
-def export_model(model: LogisticRegression, output_path: str):
+def _cv_fold_auc(task):
+    """Fit one (C, fold) cell against the memory-mapped arrays; return its AUC."""
+    data_dir, c, train_idx, test_idx = task
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(data_dir, "y.npy"), mmap_mode="r")
+    model = LogisticRegression(C=c, max_iter=200)
+    model.fit(X[train_idx], y[train_idx])
+    return c, roc_auc_score(y[test_idx], model.predict_proba(X[test_idx])[:, 1])
+
+
+def train_cv(
+    df: pd.DataFrame,
+    folds: int = 5,
+    c_grid: Sequence[float] = C_GRID_DEFAULT,
+    n_jobs: Optional[int] = None,
+):
+    """Stratified k-fold CV over a ``C`` grid, fanned out to a process pool.
+
+    ``X``/``y`` are written once to ``.npy`` files that every worker opens with
+    ``mmap_mode="r"``, so the feature matrix is shared rather than pickled per
+    task.  The best ``C`` (highest mean AUC) is refit on all rows.
+
+    Returns ``(model, mean_auc, results)`` where *results* maps each ``C`` to
+    ``{"mean_auc": …, "std_auc": …}``.
+    """
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df["label"].to_numpy(dtype=np.int64)
+    splits = list(
+        StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(X, y)
+    )
+
+    aucs: dict = {c: [] for c in c_grid}
+    with tempfile.TemporaryDirectory(prefix="jitai_cv_") as data_dir:
+        np.save(os.path.join(data_dir, "X.npy"), X)
+        np.save(os.path.join(data_dir, "y.npy"), y)
+        tasks = [(data_dir, c, tr, te) for c in c_grid for tr, te in splits]
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            for c, auc in pool.map(_cv_fold_auc, tasks):
+                aucs[c].append(auc)
+
+    results = {
+        c: {"mean_auc": float(np.mean(v)), "std_auc": float(np.std(v))}
+        for c, v in aucs.items()
+    }
+    best_c = max(results, key=lambda c: results[c]["mean_auc"])
+    model = LogisticRegression(C=best_c, max_iter=200)
+    model.fit(X, y)
+    return model, results[best_c]["mean_auc"], results
+
+
+def export_model(
+    model: LogisticRegression, output_path: str, extra: Optional[dict] = None
+):
     coef = {feat: float(w) for feat, w in zip(FEATURES, model.coef_[0])}
     artefact = {
         "intercept": float(model.intercept_[0]),
         "coeff": coef,
         "threshold": 0.5,
+        **(extra or {}),
     }
     with open(output_path, "w", encoding="utf-8") as fh:
         json.dump(artefact, fh)
     print(f"Model artefact written to {output_path}")
 
 
+class RunningStats:
+    """Per-feature running mean / variance, merged chunk by chunk (Chan et al.).
+
+    The means replace the whole-frame ``fillna(mean)`` of :func:`prepare_data`
+    and, with the variances, standardize features for SGD.
+    """
+
+    def __init__(self, n_features: int):
+        self.count = np.zeros(n_features)
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunningStats":
+        stats = cls(len(FEATURES))
+        stats.count = np.array([data["count"][f] for f in FEATURES], dtype=float)
+        stats.mean = np.array([data["mean"][f] for f in FEATURES], dtype=float)
+        stats.m2 = np.array([data["m2"][f] for f in FEATURES], dtype=float)
+        return stats
+
+    def to_dict(self) -> dict:
+        return {
+            key: {f: float(v) for f, v in zip(FEATURES, arr)}
+            for key, arr in (
+                ("count", self.count),
+                ("mean", self.mean),
+                ("m2", self.m2),
+            )
+        }
+
+    def update(self, X: np.ndarray) -> None:
+        valid = ~np.isnan(X)
+        n_b = valid.sum(axis=0).astype(float)
+        sum_b = np.where(valid, X, 0.0).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, sum_b / n_b, 0.0)
+            m2_b = np.where(valid, (X - mean_b) ** 2, 0.0).sum(axis=0)
+            total = self.count + n_b
+            delta = mean_b - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * n_b / total, 0.0)
+            self.m2 = np.where(
+                total > 0, self.m2 + m2_b + delta**2 * self.count * n_b / total, 0.0
+            )
+        self.count = total
+
+    @property
+    def std(self) -> np.ndarray:
+        var = np.where(self.count > 1, self.m2 / np.maximum(self.count - 1, 1), 0.0)
+        std = np.sqrt(var)
+        return np.where(std > 0, std, 1.0)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Fill NaN with the running mean, then standardize."""
+        X = np.where(np.isnan(X), self.mean, X)
+        return (X - self.mean) / self.std
+
+
+def _chunk_features(columns: dict, present: set):
+    """Raw feature matrix (NaN = missing) and labels for one streamed chunk."""
+    n = len(columns["outcome"])
+    X = np.full((n, len(FEATURES)), np.nan)
+    for j, col in enumerate(FEATURES):
+        if col == "patient_hash":
+            if "patient_id" in present:
+                X[:, j] = _hash_patient_ids(pd.Series(columns["patient_id"]))
+            else:
+                X[:, j] = 0.0
+        elif col in present:
+            X[:, j] = columns[col]
+    y = (np.asarray(columns["outcome"]) == "engaged").astype(int)
+    return X, y
+
+
+def _load_warm_start(path: str):
+    """Return ``(coef_raw, intercept_raw, stats)`` from a previous artefact."""
+    with open(path, "r", encoding="utf-8") as fh:
+        artefact = json.load(fh)
+    coef = np.array([artefact["coeff"].get(f, 0.0) for f in FEATURES], dtype=float)
+    stats = None
+    if "feature_stats" in artefact:
+        stats = RunningStats.from_dict(artefact["feature_stats"])
+    return coef, float(artefact["intercept"]), stats
+
+
+def train_incremental(
+    paths: list,
+    chunk_rows: int = CHUNK_ROWS_DEFAULT,
+    warm_start: Optional[str] = None,
+    eta0: float = 0.01,
+):
+    """Train with ``SGDClassifier.partial_fit`` over NDJSON shards, chunk by chunk.
+
+    Nothing larger than one chunk is materialized.  Features are filled and
+    standardized with :class:`RunningStats`; when *warm_start* names a previous
+    artefact its coefficients (and stored stats) seed the model.  AUC is
+    prequential: each chunk is scored before the model trains on it.  On a
+    cold start the first chunk has no model to score it, so its last
+    ``COLD_HOLDOUT`` share is scored after training on the rest – otherwise a
+    single-chunk file would have no AUC at all.
+
+    Returns ``(model, auc, stats)`` where *model* carries raw-feature-space
+    ``coef_`` / ``intercept_`` compatible with :func:`export_model`.
+    """
+    model = SGDClassifier(
+        loss="log_loss", learning_rate="constant", eta0=eta0, random_state=42
+    )
+    stats = RunningStats(len(FEATURES))
+    init = None
+    if warm_start and os.path.exists(warm_start):
+        coef_raw, intercept_raw, prev_stats = _load_warm_start(warm_start)
+        stats = prev_stats or stats
+        init = (coef_raw, intercept_raw)
+        print(f"Warm-starting from {warm_start}")
+
+    scores: list = []
+    labels: list = []
+    fitted = False
+    for path in paths:
+        for columns, present in iter_ndjson_chunks(path, chunk_rows):
+            X_raw, y = _chunk_features(columns, present)
+            stats.update(X_raw)
+            if init is not None:
+                # express the previous raw-space model in standardized space
+                coef_raw, intercept_raw = init
+                model.classes_ = np.array([0, 1])
+                model.coef_ = (coef_raw * stats.std)[None, :]
+                model.intercept_ = np.array([intercept_raw + coef_raw @ stats.mean])
+                fitted, init = True, None
+            X = stats.transform(X_raw)
+            cut = int(len(y) * (1 - COLD_HOLDOUT))
+            if not fitted and 0 < cut < len(y):
+                model.partial_fit(X[:cut], y[:cut], classes=np.array([0, 1]))
+                X, y, fitted = X[cut:], y[cut:], True
+            if fitted:
+                scores.append(model.predict_proba(X)[:, 1])
+                labels.append(y)
+            model.partial_fit(X, y, classes=np.array([0, 1]))
+            fitted = True
+    if not fitted:
+        raise ValueError("no records loaded from NDJSON – aborting")
+
+    y_all = np.concatenate(labels) if labels else np.array([])
+    auc = (
+        roc_auc_score(y_all, np.concatenate(scores))
+        if len(np.unique(y_all)) == 2
+        else float("nan")
+    )
+
+    # fold standardization back so the artefact applies to raw features
+    std = stats.std
+    coef_raw = model.coef_[0] / std
+    model.coef_ = coef_raw[None, :]
+    model.intercept_ = np.array([model.intercept_[0] - coef_raw @ stats.mean])
+    return model, auc, stats
+
+
 def main():
     parser = argparse.ArgumentParser(description="Train JITAI logistic model")
-    parser.add_argument("ndjson_path", help="Path to training NDJSON file")
+    parser.add_argument(
+        "ndjson_path", nargs="+", help="Path(s) to training NDJSON file(s)"
+    )
     parser.add_argument(
         "--output", default="jitai_model.json", help="Path for JSON artefact"
     )
@@ -98,18 +548,108 @@ def main():
         default=0.6,
         help="Minimum acceptable ROC-AUC (set 0 to bypass gate)",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Load the NDJSON in chunks with float32/categorical columns",
+    )
+    parser.add_argument(
+        "--chunk_rows",
+        type=int,
+        default=CHUNK_ROWS_DEFAULT,
+        help="Records parsed per chunk when --stream/--incremental is set",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Train out-of-core with SGD partial_fit, warm-starting from --output",
+    )
+    parser.add_argument(
+        "--warm_start",
+        help="Artefact to warm-start --incremental from (default: --output)",
+    )
+    parser.add_argument(
+        "--eta0",
+        type=float,
+        default=0.01,
+        help="Constant SGD learning rate for --incremental",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Convert each NDJSON to a content-hashed Parquet shard in "
+        "--cache_dir and load from it on later runs",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        default=CACHE_DIR_DEFAULT,
+        help=f"Parquet shard directory for --cache (default {CACHE_DIR_DEFAULT})",
+    )
+    parser.add_argument(
+        "--cv_folds",
+        type=int,
+        default=0,
+        help="Stratified k-fold CV with a C grid instead of one 75/25 split",
+    )
+    parser.add_argument(
+        "--c_grid",
+        default=",".join(str(c) for c in C_GRID_DEFAULT),
+        help="Comma-separated inverse regularization strengths for --cv_folds",
+    )
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=None,
+        help="Worker processes for --cv_folds (default: all cores)",
+    )
     args = parser.parse_args()
 
-    df = load_ndjson(args.ndjson_path)
-    df = prepare_data(df)
-    model, auc = train(df)
+    extra = None
+    if args.incremental:
+        warm_start = args.warm_start or args.output
+        if not os.path.exists(warm_start):
+            print(f"No artefact at {warm_start} – cold start")
+        elif not args.warm_start:
+            print(f"Warm start defaults to --output ({warm_start})")
+        model, auc, stats = train_incremental(
+            args.ndjson_path,
+            args.chunk_rows,
+            warm_start=warm_start,
+            eta0=args.eta0,
+        )
+        extra = {"feature_stats": stats.to_dict()}
+    else:
+        if args.cache:
+            frames = [
+                load_cached(p, args.cache_dir, args.chunk_rows)
+                for p in args.ndjson_path
+            ]
+        elif args.stream:
+            frames = [
+                load_ndjson_streaming(p, args.chunk_rows) for p in args.ndjson_path
+            ]
+        else:
+            frames = [load_ndjson(p) for p in args.ndjson_path]
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        df = prepare_data(df)
+        if args.cv_folds > 1:
+            c_grid = [float(c) for c in args.c_grid.split(",") if c.strip()]
+            model, auc, results = train_cv(df, args.cv_folds, c_grid, args.n_jobs)
+            for c, res in results.items():
+                print(
+                    f"C={c:g}: ROC-AUC {res['mean_auc']:.4f} "
+                    f"± {res['std_auc']:.4f} ({args.cv_folds}-fold)"
+                )
+            extra = {"regularization_c": float(model.C)}
+        else:
+            model, auc = train(df)
     print(f"ROC-AUC: {auc:.4f}")
 
-    if args.min_auc and auc < args.min_auc:
+    if args.min_auc and not auc >= args.min_auc:
         print(f"AUC below threshold ({args.min_auc:.2f}) – failing")
         exit(1)
 
-    export_model(model, args.output)
+    export_model(model, args.output, extra)
 
     # Export AUC for CI consumption
     os.environ["JITAI_AUC"] = str(auc)
@@ -0,0 +1,172 @@
+"""Python reference implementation of the wearable daily aggregator.
+
+Ports ``computeDailySummary`` from
+``supabase/functions/wearable-daily-summarizer/aggregator.ts`` so history can be
+recomputed offline (see ``backfill_wearable_summary.py --offline-export``)
+without one Edge Function call per day.
+
+Two entry points are provided:
+
+* :func:`compute_daily_summary` – a line-by-line port operating on a list of
+  sample dicts for a single user/day.  It is the parity reference.
+* :func:`summarize_samples` – a NumPy-vectorized path that groups every sample
+  by ``(user_id, day, data_type)`` in one pass (``np.unique`` + ``np.bincount``)
+  and returns one summary row per ``(user_id, day)``.
+
+NOTE: Keep in sync with ``aggregator.ts``.  ``Math.round`` rounds halves up,
+so :func:`_js_round` is used instead of Python's banker's ``round``.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np  # type: ignore
+
+# Metric order used for the (group, metric) bincount matrix.
+METRICS = ("sleep_minutes", "heart_rate", "steps", "hrv")
+_SLEEP, _HR, _STEPS, _HRV = range(len(METRICS))
+
+SUMMARY_COLUMNS = (
+    "user_id",
+    "summary_date",
+    "sleep_score",
+    "sleep_hours",
+    "avg_hr",
+    "steps_total",
+    "hrv_avg",
+)
+
+
+def _js_round(x: float) -> int:
+    """``Math.round`` semantics: halves round towards +∞."""
+    return int(np.floor(x + 0.5))
+
+
+def _num(value: Any) -> float:
+    """``Number(value || 0)`` for sums: falsy / non-numeric values count as 0."""
+    try:
+        out = float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if np.isnan(out) else out
+
+
+def compute_daily_summary(samples: Iterable[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Aggregate one user/day of samples – mirrors ``computeDailySummary``."""
+    sleep_minutes = 0.0
+    steps_total = 0.0
+    hr: List[float] = []
+    hrv: List[float] = []
+    for s in samples:
+        kind = s.get("data_type")
+        if kind == "sleep_minutes":
+            sleep_minutes += _num(s.get("value"))
+        elif kind == "steps":
+            steps_total += _num(s.get("value"))
+        elif kind == "heart_rate":
+            hr.append(float(s.get("value")))
+        elif kind == "hrv":
+            hrv.append(float(s.get("value")))
+
+    sleep_hours = sleep_minutes / 60
+    return {
+        "sleep_hours": sleep_hours,
+        "sleep_score": min(100, _js_round((sleep_hours / 8) * 100)),
+        "avg_hr": _js_round(sum(hr) / len(hr)) if hr else None,
+        "steps_total": steps_total,
+        "hrv_avg": _js_round(sum(hrv) / len(hrv)) if hrv else None,
+    }
+
+
+def summarize_samples(
+    user_ids: Sequence[Any],
+    days: Sequence[Any],
+    data_types: Sequence[Any],
+    values: Sequence[Any],
+) -> List[Dict[str, Any]]:
+    """Vectorized aggregation of column arrays into per-(user, day) summaries.
+
+    All four inputs must have the same length.  Every ``(user_id, day)`` pair
+    present yields a row – even one with no recognised metric – matching the
+    Edge Function, which summarizes every user with any data that day.
+    """
+    users = np.asarray(user_ids, dtype=str)
+    day_arr = np.asarray(days, dtype=str)
+    if users.size == 0:
+        return []
+    types = np.asarray(data_types, dtype=str)
+    vals = np.asarray(values, dtype=np.float64)
+
+    # factorize (user, day) once – group_idx maps each sample to its row
+    pairs = np.char.add(np.char.add(users, "|"), day_arr)
+    groups, group_idx = np.unique(pairs, return_inverse=True)
+
+    metric_idx = np.full(types.shape, -1, dtype=np.int64)
+    for i, name in enumerate(METRICS):
+        metric_idx[types == name] = i
+    known = metric_idx >= 0
+
+    n_groups, n_metrics = len(groups), len(METRICS)
+    flat = group_idx[known] * n_metrics + metric_idx[known]
+    size = n_groups * n_metrics
+    # sums treat NaN as 0 (``Number(v || 0)``); averages keep raw values
+    sums = np.bincount(
+        flat, weights=np.nan_to_num(vals[known]), minlength=size
+    ).reshape(n_groups, n_metrics)
+    raw_sums = np.bincount(flat, weights=vals[known], minlength=size).reshape(
+        n_groups, n_metrics
+    )
+    counts = np.bincount(flat, minlength=size).reshape(n_groups, n_metrics)
+
+    sleep_hours = sums[:, _SLEEP] / 60
+    sleep_score = np.minimum(100, np.floor(sleep_hours / 8 * 100 + 0.5))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_hr = np.floor(raw_sums[:, _HR] / counts[:, _HR] + 0.5)
+        hrv_avg = np.floor(raw_sums[:, _HRV] / counts[:, _HRV] + 0.5)
+
+    rows: List[Dict[str, Any]] = []
+    for g, key in enumerate(groups.tolist()):
+        uid, day = key.split("|", 1)
+        rows.append(
+            {
+                "user_id": uid,
+                "summary_date": day,
+                "sleep_score": int(sleep_score[g]),
+                "sleep_hours": float(sleep_hours[g]),
+                "avg_hr": int(avg_hr[g]) if np.isfinite(avg_hr[g]) else None,
+                "steps_total": float(sums[g, _STEPS]),
+                "hrv_avg": int(hrv_avg[g]) if np.isfinite(hrv_avg[g]) else None,
+            }
+        )
+    return rows
+
+
+def summarize_records(
+    records: Iterable[Mapping[str, Any]], day_key: str = "day"
+) -> List[Dict[str, Any]]:
+    """Convenience wrapper over :func:`summarize_samples` for row dicts."""
+    cols: Dict[str, List[Any]] = {
+        "user_id": [],
+        day_key: [],
+        "data_type": [],
+        "value": [],
+    }
+    for rec in records:
+        for col, bucket in cols.items():
+            bucket.append(rec.get(col))
+    return summarize_samples(
+        cols["user_id"], cols[day_key], cols["data_type"], cols["value"]
+    )
+
+
+def summary_to_copy_line(row: Mapping[str, Any]) -> str:
+    """Render *row* as a tab-separated ``COPY … FROM STDIN`` text line."""
+
+    def _fmt(value: Optional[Any]) -> str:
+        if value is None:
+            return r"\N"
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    return "\t".join(_fmt(row.get(col)) for col in SUMMARY_COLUMNS) + "\n"
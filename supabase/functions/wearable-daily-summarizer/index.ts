@@ -6,6 +6,197 @@ const STEP_GOAL = 10000; // default daily step goal for goal-tracking (can be us
 // deno-lint-ignore no-explicit-any
 type SupabaseClient = any;
 
+type SampleRow = { data_type: string; value: string | number };
+
+/**
+ * Builds the wearable_daily_summary row for one user/day from that day's
+ * wearable_health_data samples. Shared by the single-date and range modes.
+ */
+function buildSummaryRow(uid: string, targetDate: string, data: SampleRow[]) {
+    const totalSleepMinutes = data.filter((
+        r: { data_type: string; value: string | number },
+    ) => r.data_type === "sleep_minutes").reduce(
+        (a: number, r: { value: string | number }) =>
+            a + Number(r.value || 0),
+        0,
+    ) || 0;
+    const hrs = totalSleepMinutes / 60;
+    const sleepScore = Math.min(100, Math.round((hrs / 8) * 100));
+
+    // Average heart rate
+    const hrSamples = data.filter((
+        r: { data_type: string; value: string | number },
+    ) => r.data_type === "heart_rate").map((
+        r: { value: string | number },
+    ) => Number(r.value)) || [];
+    const avgHr = hrSamples.length
+        ? Math.round(
+            hrSamples.reduce((a: number, b: number) => a + b, 0) /
+                hrSamples.length,
+        )
+        : null;
+
+    // Total steps
+    const stepsTotal = data.filter((
+        r: { data_type: string; value: string | number },
+    ) => r.data_type === "steps")
+        .reduce(
+            (a: number, r: { value: string | number }) =>
+                a + Number(r.value || 0),
+            0,
+        ) ||
+        0;
+
+    // HRV average (ms) if present
+    const hrvSamples = data.filter((
+        r: { data_type: string; value: string | number },
+    ) => r.data_type === "hrv")
+        .map((r: { value: string | number }) => Number(r.value)) ||
+        [];
+    const avgHrv = hrvSamples.length
+        ? Math.round(
+            hrvSamples.reduce((a: number, b: number) => a + b, 0) /
+                hrvSamples.length,
+        )
+        : null;
+
+    // ===== Task 4: Activity data processing =====
+    // Active energy burned (kcal)
+    const activeEnergy = data.filter((
+        r: { data_type: string; value: string | number },
+    ) => r.data_type === "active_energy").reduce(
+        (a: number, r: { value: string | number }) =>
+            a + Number(r.value || 0),
+        0,
+    ) || 0;
+
+    // Active minutes – if explicit exercise_time available use it, else estimate via 100 steps ≈ 1 min
+    let activeMinutes = data.filter((
+        r: { data_type: string; value: string | number },
+    ) => r.data_type === "active_minutes").reduce(
+        (a: number, r: { value: string | number }) =>
+            a + Number(r.value || 0),
+        0,
+    ) || 0;
+    if (!activeMinutes && stepsTotal) {
+        activeMinutes = Math.round(stepsTotal / 100);
+    }
+
+    const goalStepsMet = stepsTotal >= STEP_GOAL;
+
+    // ===== Task 5: HRV stress / recovery classification =====
+    let hrvStatus: string | null = null;
+    if (avgHrv !== null) {
+        if (avgHrv >= 70) {
+            hrvStatus = "excellent";
+        } else if (avgHrv >= 50) {
+            hrvStatus = "good";
+        } else if (avgHrv >= 30) {
+            hrvStatus = "moderate";
+        } else hrvStatus = "poor";
+    }
+
+    return {
+        user_id: uid,
+        summary_date: targetDate,
+        sleep_score: sleepScore,
+        sleep_hours: hrs,
+        avg_hr: avgHr,
+        steps_total: stepsTotal,
+        hrv_avg: avgHrv,
+        active_energy_kcal: activeEnergy,
+        active_minutes: activeMinutes,
+        goal_steps_target: STEP_GOAL,
+        goal_steps_met: goalStepsMet,
+        hrv_status: hrvStatus,
+    };
+}
+
+const MAX_RANGE_DAYS = 31; // cap per invocation to bound memory & runtime
+const PAGE_SIZE = 1000; // PostgREST default max rows per request
+const ISO_DATE = /^\d{4}-\d{2}-\d{2}$/;
+
+/**
+ * Resolves the dates requested via `start`/`end` (inclusive) or a
+ * comma-separated `dates` list. Returns null when neither is present so the
+ * caller keeps the single-`date` behaviour.
+ */
+function parseRangeDates(url: URL): string[] | null {
+    const list = url.searchParams.get("dates");
+    const start = url.searchParams.get("start");
+    const end = url.searchParams.get("end");
+    let dates: string[];
+    if (list) {
+        dates = [...new Set(list.split(",").map((d) => d.trim()))].sort();
+    } else if (start && end) {
+        dates = [];
+        const cur = new Date(`${start}T00:00:00Z`);
+        const last = new Date(`${end}T00:00:00Z`);
+        while (cur <= last && dates.length <= MAX_RANGE_DAYS) {
+            dates.push(cur.toISOString().split("T")[0]);
+            cur.setUTCDate(cur.getUTCDate() + 1);
+        }
+    } else {
+        return null;
+    }
+    if (!dates.length || dates.some((d) => !ISO_DATE.test(d))) {
+        throw new Error("invalid date range");
+    }
+    if (dates.length > MAX_RANGE_DAYS) {
+        throw new Error(`range exceeds ${MAX_RANGE_DAYS} days`);
+    }
+    return dates;
+}
+
+/**
+ * Range mode: loads wearable_health_data for the whole span once (paged),
+ * groups it by (user, day) and upserts every summary row in one request.
+ */
+async function summarizeRange(client: SupabaseClient, dates: string[]) {
+    const wanted = new Set(dates);
+    const groups = new Map<string, SampleRow[]>();
+    for (let from = 0;; from += PAGE_SIZE) {
+        const { data, error } = await client
+            .from("wearable_health_data")
+            .select("user_id,data_type,value,timestamp")
+            .gte("timestamp", `${dates[0]}T00:00:00Z`)
+            .lte("timestamp", `${dates[dates.length - 1]}T23:59:59Z`)
+            .order("id", { ascending: true })
+            .range(from, from + PAGE_SIZE - 1);
+        if (error) throw error;
+        for (
+            const r of (data ?? []) as (SampleRow & {
+                user_id: string;
+                timestamp: string;
+            })[]
+        ) {
+            const day = String(r.timestamp).slice(0, 10);
+            if (!wanted.has(day)) continue;
+            const key = `${r.user_id}|${day}`;
+            const bucket = groups.get(key);
+            if (bucket) bucket.push(r);
+            else groups.set(key, [r]);
+        }
+        if (!data || data.length < PAGE_SIZE) break;
+    }
+
+    const rows = [...groups.entries()].map(([key, samples]) => {
+        const [uid, day] = key.split("|");
+        return buildSummaryRow(uid, day, samples);
+    });
+    const days: Record<string, number> = Object.fromEntries(
+        dates.map((d) => [d, 0]),
+    );
+    if (rows.length) {
+        const { error } = await client
+            .from("wearable_daily_summary")
+            .upsert(rows, { onConflict: "user_id,summary_date" });
+        if (error) throw error;
+    }
+    for (const row of rows) days[row.summary_date]++;
+    return { days, processed: rows.length };
+}
+
 serve(async (req) => {
     if (req.method === "OPTIONS") return new Response("ok");
     if (req.method !== "POST" && req.method !== "GET") {
@@ -14,6 +205,18 @@ serve(async (req) => {
 
     const url = new URL(req.url);
     const isTest = url.searchParams.get("test") === "true";
+    let rangeDates: string[] | null;
+    try {
+        rangeDates = parseRangeDates(url);
+    } catch (err) {
+        return new Response(
+            JSON.stringify({
+                success: false,
+                error: err instanceof Error ? err.message : String(err),
+            }),
+            { status: 400, headers: { "Content-Type": "application/json" } },
+        );
+    }
     const targetDate = url.searchParams.get("date") ||
         new Date(Date.now() - 24 * 60 * 60 * 1000).toISOString().split("T")[0];
 
@@ -23,6 +226,23 @@ serve(async (req) => {
     const client: SupabaseClient = await getSupabaseClient(serviceRole);
 
     try {
+        if (rangeDates) {
+            const { days, processed } = await summarizeRange(
+                client,
+                rangeDates,
+            );
+            return new Response(
+                JSON.stringify({
+                    success: true,
+                    start: rangeDates[0],
+                    end: rangeDates[rangeDates.length - 1],
+                    days,
+                    processed,
+                }),
+                { headers: { "Content-Type": "application/json" } },
+            );
+        }
+
         // fetch distinct users with any data for date
         const { data: users, error: userErr } = await client
             .from("wearable_health_data")
@@ -51,105 +271,11 @@ serve(async (req) => {
                 continue;
             }
 
-            const totalSleepMinutes = data?.filter((
-                r: { data_type: string; value: string | number },
-            ) => r.data_type === "sleep_minutes").reduce(
-                (a: number, r: { value: string | number }) =>
-                    a + Number(r.value || 0),
-                0,
-            ) || 0;
-            const hrs = totalSleepMinutes / 60;
-            const sleepScore = Math.min(100, Math.round((hrs / 8) * 100));
-
-            // Average heart rate
-            const hrSamples = data?.filter((
-                r: { data_type: string; value: string | number },
-            ) => r.data_type === "heart_rate").map((
-                r: { value: string | number },
-            ) => Number(r.value)) || [];
-            const avgHr = hrSamples.length
-                ? Math.round(
-                    hrSamples.reduce((a: number, b: number) => a + b, 0) /
-                        hrSamples.length,
-                )
-                : null;
-
-            // Total steps
-            const stepsTotal = data?.filter((
-                r: { data_type: string; value: string | number },
-            ) => r.data_type === "steps")
-                .reduce(
-                    (a: number, r: { value: string | number }) =>
-                        a + Number(r.value || 0),
-                    0,
-                ) ||
-                0;
-
-            // HRV average (ms) if present
-            const hrvSamples = data?.filter((
-                r: { data_type: string; value: string | number },
-            ) => r.data_type === "hrv")
-                .map((r: { value: string | number }) => Number(r.value)) ||
-                [];
-            const avgHrv = hrvSamples.length
-                ? Math.round(
-                    hrvSamples.reduce((a: number, b: number) => a + b, 0) /
-                        hrvSamples.length,
-                )
-                : null;
-
-            // ===== Task 4: Activity data processing =====
-            // Active energy burned (kcal)
-            const activeEnergy = data?.filter((
-                r: { data_type: string; value: string | number },
-            ) => r.data_type === "active_energy").reduce(
-                (a: number, r: { value: string | number }) =>
-                    a + Number(r.value || 0),
-                0,
-            ) || 0;
-
-            // Active minutes – if explicit exercise_time available use it, else estimate via 100 steps ≈ 1 min
-            let activeMinutes = data?.filter((
-                r: { data_type: string; value: string | number },
-            ) => r.data_type === "active_minutes").reduce(
-                (a: number, r: { value: string | number }) =>
-                    a + Number(r.value || 0),
-                0,
-            ) || 0;
-            if (!activeMinutes && stepsTotal) {
-                activeMinutes = Math.round(stepsTotal / 100);
-            }
-
-            const goalStepsMet = stepsTotal >= STEP_GOAL;
-
-            // ===== Task 5: HRV stress / recovery classification =====
-            let hrvStatus: string | null = null;
-            if (avgHrv !== null) {
-                if (avgHrv >= 70) {
-                    hrvStatus = "excellent";
-                } else if (avgHrv >= 50) {
-                    hrvStatus = "good";
-                } else if (avgHrv >= 30) {
-                    hrvStatus = "moderate";
-                } else hrvStatus = "poor";
-            }
-
             const { error: upErr } = await client
                 .from("wearable_daily_summary")
-                .upsert({
-                    user_id: uid,
-                    summary_date: targetDate,
-                    sleep_score: sleepScore,
-                    sleep_hours: hrs,
-                    avg_hr: avgHr,
-                    steps_total: stepsTotal,
-                    hrv_avg: avgHrv,
-                    active_energy_kcal: activeEnergy,
-                    active_minutes: activeMinutes,
-                    goal_steps_target: STEP_GOAL,
-                    goal_steps_met: goalStepsMet,
-                    hrv_status: hrvStatus,
-                }, { onConflict: "user_id,summary_date" });
+                .upsert(buildSummaryRow(uid, targetDate, data ?? []), {
+                    onConflict: "user_id,summary_date",
+                });
 
             if (upErr) {
                 console.error("upsert error", upErr.message);
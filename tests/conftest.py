@@ -9,6 +9,8 @@ from __future__ import annotations
 
 import json
 import re
+import sqlite3
+import threading
 import uuid
 from collections import defaultdict
 from datetime import date, datetime, timedelta
@@ -33,9 +35,21 @@ _EVENT_POINTS = {
 }
 
 
-def _clone(row: Dict[str, Any]) -> Dict[str, Any]:
-    """Cheap deep-copy so tests can mutate results safely."""
-    return json.loads(json.dumps(row))
+def _clone(value: Any) -> Any:
+    """Deep-copy JSON-like data so tests can mutate results safely.
+
+    Rows only ever hold dicts, lists and scalars, so this walks them directly
+    instead of round-tripping through ``json`` on every read.
+    """
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+# Hash indexes maintained by every _FakeTable (most specific first).
+_INDEXED_FIELDS = (("user_id", "score_date"), ("user_id",))
 
 
 class _FakeQuery:
@@ -47,29 +61,73 @@ class _FakeQuery:
         self._filters.append((field, value))
         return self
 
-    def _match(self, row: Dict[str, Any]) -> bool:
-        return all(row.get(k) == v for k, v in self._filters)
-
     def execute(self):  # Supabase returns an object with .data
         if self._action == "insert":
             row = _clone(self._payload)
             row.setdefault("id", str(uuid.uuid4()))
-            self._table.rows.append(row)
+            self._table.add(row)
             data = [row]
         elif self._action == "delete":
-            before = len(self._table.rows)
-            self._table.rows[:] = [
-                r for r in self._table.rows if not self._match(r)]
-            data = [{"deleted": before - len(self._table.rows)}]
+            data = [{"deleted": self._table.remove(self._filters)}]
         else:  # select
-            data = [_clone(r) for r in self._table.rows if self._match(r)]
+            data = [_clone(r) for r in self._table.find(self._filters)]
         return SimpleNamespace(data=data)
 
 
 class _FakeTable:
-    def __init__(self):
-        self.rows: List[Dict[str, Any]] = []
+    """Rows keyed by insertion slot, plus hash indexes on ``_INDEXED_FIELDS``.
 
+    ``eq`` filters covering an indexed field set are answered from the index
+    instead of scanning (and cloning) the whole table.
+    """
+
+    def __init__(self):
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._next_slot = 0
+        self._indexes: Dict[tuple, Dict[tuple, Dict[int, None]]] = {
+            fields: defaultdict(dict) for fields in _INDEXED_FIELDS
+        }
+
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        return list(self._rows.values())
+
+    # internal row access (no cloning) ---------------------------------
+    def add(self, row: Dict[str, Any]) -> None:
+        slot = self._next_slot
+        self._next_slot += 1
+        self._rows[slot] = row
+        for fields, index in self._indexes.items():
+            index[tuple(row.get(f) for f in fields)][slot] = None
+
+    def _slots(self, filters: List[tuple[str, Any]]):
+        eq = dict(filters)
+        for fields, index in self._indexes.items():
+            if all(f in eq for f in fields):
+                slots = index.get(tuple(eq[f] for f in fields), {})
+                break
+        else:
+            slots = self._rows
+        return [
+            slot for slot in list(slots)
+            if all(self._rows[slot].get(k) == v for k, v in filters)
+        ]
+
+    def find(self, filters: List[tuple[str, Any]]) -> List[Dict[str, Any]]:
+        return [self._rows[slot] for slot in self._slots(filters)]
+
+    def remove(self, filters: List[tuple[str, Any]]) -> int:
+        slots = self._slots(filters)
+        for slot in slots:
+            row = self._rows.pop(slot)
+            for fields, index in self._indexes.items():
+                key = tuple(row.get(f) for f in fields)
+                index[key].pop(slot, None)
+                if not index[key]:
+                    del index[key]
+        return len(slots)
+
+    # Supabase SDK surface ----------------------------------------------
     def insert(self, payload: Dict[str, Any]):
         return _FakeQuery(self, "insert", payload)
 
@@ -122,11 +180,9 @@ def _is_uuid(val: Any) -> bool:
 
 
 def _calc_score(client: _FakeSupabaseClient, user_id: str, tgt: str) -> Dict[str, Any]:
-    events = [
-        r
-        for r in client._rows("engagement_events")
-        if r["user_id"] == user_id and r["event_date"] == tgt
-    ]
+    events = client.table("engagement_events").find(
+        [("user_id", user_id), ("event_date", tgt)]
+    )
 
     by_type: Dict[str, int] = defaultdict(int)
     pts_by_type: Dict[str, int] = defaultdict(int)
@@ -137,11 +193,8 @@ def _calc_score(client: _FakeSupabaseClient, user_id: str, tgt: str) -> Dict[str
             pts_by_type[et] += _EVENT_POINTS.get(et, 0)
     raw = min(sum(pts_by_type.values()), 100)  # daily cap
 
-    history = [
-        r
-        for r in client._rows("daily_engagement_scores")
-        if r["user_id"] == user_id and r["score_date"] < tgt
-    ]
+    scores = client.table("daily_engagement_scores")
+    history = [r for r in scores.find([("user_id", user_id)]) if r["score_date"] < tgt]
     final = min(raw + 5 * len(history), 100)  # simple decay bonus
 
     state = "NeedsCare" if final < 45 else (
@@ -196,12 +249,8 @@ def _calc_score(client: _FakeSupabaseClient, user_id: str, tgt: str) -> Dict[str
         "calculation_metadata": meta,
     }
     # upsert
-    client._rows("daily_engagement_scores")[:] = [
-        r
-        for r in client._rows("daily_engagement_scores")
-        if not (r["user_id"] == user_id and r["score_date"] == tgt)
-    ]
-    client._rows("daily_engagement_scores").append(row)
+    scores.remove([("user_id", user_id), ("score_date", tgt)])
+    scores.add(row)
     return row
 
 
@@ -301,23 +350,257 @@ def _install_requests(monkeypatch: pytest.MonkeyPatch, client: _FakeSupabaseClie
 
 
 # ---------------------------------------------------------------------------
-# 3. Ultra-simple psycopg2 connect() stub (just enough for failing tests)
+# 3. psycopg2 connect() stub backed by an in-memory SQLite database
 # ---------------------------------------------------------------------------
 
 
-class _MemDB:
-    users: Dict[str, Dict[str, Any]] = {}
-    profiles: Dict[str, Dict[str, Any]] = {}
-    daily_scores: Dict[tuple[str, str], Dict[str, Any]] = {}
-    error_logs: Dict[str, Dict[str, Any]] = {}
-    momentum_notifications: List[Dict[str, Any]] = []
-    coach_interventions: List[Dict[str, Any]] = []
+# Simplified momentum schema.  The validation triggers from
+# 20241217000002_data_validation_error_handling.sql become CHECK constraints,
+# and auth.users lives in an attached ``auth`` database.
+_SQLITE_SCHEMA = """
+CREATE TABLE auth.users (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    encrypted_password TEXT
+);
+CREATE TABLE profiles (
+    id TEXT PRIMARY KEY,
+    onboarding_complete BOOLEAN DEFAULT false,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE daily_engagement_scores (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    score_date DATE NOT NULL,
+    raw_score REAL NOT NULL DEFAULT 0 CHECK (raw_score >= 0),
+    normalized_score REAL NOT NULL DEFAULT 0
+        CHECK (normalized_score BETWEEN 0 AND 100),
+    final_score REAL NOT NULL DEFAULT 0,
+    momentum_state TEXT NOT NULL
+        CHECK (momentum_state IN ('Rising', 'Steady', 'NeedsCare')),
+    breakdown JSONB NOT NULL DEFAULT '{}',
+    algorithm_version TEXT NOT NULL DEFAULT 'v1.0',
+    events_count INTEGER NOT NULL DEFAULT 0 CHECK (events_count >= 0),
+    calculation_metadata JSONB DEFAULT '{}',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (user_id, score_date)
+);
+CREATE INDEX idx_daily_scores_date_state
+    ON daily_engagement_scores(score_date, momentum_state);
+CREATE TABLE momentum_notifications (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    notification_type TEXT NOT NULL CHECK (notification_type IN (
+        'momentum_drop', 'needs_care_consecutive', 'celebration',
+        'consistency_reminder', 'coach_intervention', 'custom')),
+    trigger_date DATE NOT NULL,
+    trigger_score REAL,
+    trigger_state TEXT,
+    trigger_metadata JSONB DEFAULT '{}',
+    title TEXT NOT NULL CHECK (length(trim(title)) > 0),
+    message TEXT NOT NULL CHECK (length(message) <= 500),
+    action_type TEXT CHECK (action_type IN (
+        'open_app', 'complete_lesson', 'schedule_call', 'view_momentum',
+        'journal_entry', 'none')),
+    action_data JSONB DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN (
+        'pending', 'sent', 'delivered', 'opened', 'clicked', 'failed')),
+    sent_at TIMESTAMP,
+    read_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_notifications_user_date
+    ON momentum_notifications(user_id, trigger_date DESC);
+CREATE INDEX idx_notifications_status
+    ON momentum_notifications(status, created_at);
+CREATE TABLE coach_interventions (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    user_id TEXT NOT NULL,
+    intervention_type TEXT NOT NULL CHECK (intervention_type IN (
+        'automated_call_schedule', 'manual_outreach', 'escalation',
+        'check_in', 'celebration_call', 'crisis_intervention')),
+    trigger_date DATE NOT NULL,
+    trigger_reason TEXT NOT NULL CHECK (length(trim(trigger_reason)) > 0),
+    status TEXT NOT NULL DEFAULT 'scheduled' CHECK (status IN (
+        'scheduled', 'in_progress', 'completed', 'cancelled', 'no_response')),
+    scheduled_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+CREATE INDEX idx_interventions_user_date
+    ON coach_interventions(user_id, trigger_date DESC);
+CREATE TABLE momentum_error_logs (
+    id TEXT PRIMARY KEY DEFAULT (gen_random_uuid()),
+    error_type TEXT NOT NULL,
+    error_code TEXT NOT NULL,
+    error_message TEXT NOT NULL,
+    error_details JSONB DEFAULT '{}',
+    user_id TEXT,
+    function_name TEXT,
+    table_name TEXT,
+    operation_type TEXT,
+    input_data JSONB,
+    severity TEXT NOT NULL DEFAULT 'medium'
+        CHECK (severity IN ('low', 'medium', 'high', 'critical')),
+    is_resolved BOOLEAN DEFAULT false,
+    resolution_notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    resolved_at TIMESTAMP
+);
+"""
+
+# Argument names of log_momentum_error(), in declaration order.
+_LOG_ERROR_ARGS = (
+    "error_type", "error_code", "error_message", "error_details", "user_id",
+    "function_name", "table_name", "operation_type", "input_data", "severity",
+)
+
+# Tables whose SELECT policy is "owner only": table -> owner column.
+_RLS_OWNER = {"profiles": "id"}
+
+# Postgres spellings rewritten for SQLite, applied in order.
+_PG_TO_SQLITE = (
+    (re.compile(r"%\((\w+)\)s"), r":\1"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"%%"), "%"),
+    (re.compile(r"\bpublic\."), ""),
+    (re.compile(r"::\w+"), ""),
+    (re.compile(r"\b(?:now\(\)|current_timestamp)\s*-\s*interval\s*'(\d+ \w+)'", re.I),
+     r"datetime('now', '-\1')"),
+    (re.compile(r"\bcurrent_date\s*-\s*interval\s*'(\d+ \w+)'", re.I),
+     r"date('now', '-\1')"),
+    (re.compile(r"\bnow\(\)", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bilike\b", re.I), "LIKE"),
+)
+
+
+def _sqlite_value(value: Any) -> Any:
+    """Adapt a psycopg2 parameter to something sqlite3 can bind."""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _sqlite_params(params: Any) -> Any:
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {k: _sqlite_value(v) for k, v in params.items()}
+    return tuple(_sqlite_value(v) for v in params)
+
+
+def _call_args(query: str, name: str) -> str:
+    """Return the raw argument list of the first ``name(...)`` call in *query*."""
+    start = query.lower().index(name + "(") + len(name) + 1
+    depth, quoted = 1, False
+    for i in range(start, len(query)):
+        ch = query[i]
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+            if depth == 0:
+                return query[start:i]
+    raise _real_psycopg2.ProgrammingError(f"unterminated call to {name}")
+
+
+class _SqliteDB:
+    """Process-wide in-memory SQLite database behind the psycopg2 fake.
+
+    Every fake connection shares it (like every real connection shares the
+    Supabase container) and a lock serialises access, so threaded tests work;
+    pytest-xdist workers each get their own copy.  The RLS owner is the uid
+    of whichever connection is currently executing.
+    """
+
+    _conn: Optional[sqlite3.Connection] = None
+    _lock = threading.RLock()
+    _uid: Optional[str] = None
+
+    @classmethod
+    def connection(cls) -> sqlite3.Connection:
+        if cls._conn is None:
+            sqlite3.register_converter("BOOLEAN", lambda b: b not in (b"0", b""))
+            sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+            sqlite3.register_converter(
+                "TIMESTAMP", lambda b: datetime.fromisoformat(b.decode()))
+            sqlite3.register_converter("JSONB", json.loads)
+            conn = sqlite3.connect(
+                ":memory:",
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None,  # autocommit, like the real fixtures
+                check_same_thread=False,
+            )
+            conn.create_function("gen_random_uuid", 0, lambda: str(uuid.uuid4()))
+            conn.create_function("auth_uid", 0, lambda: cls._uid)
+            conn.execute("ATTACH DATABASE ':memory:' AS auth")
+            conn.executescript(_SQLITE_SCHEMA)
+            cls._conn = conn
+        return cls._conn
+
+    @staticmethod
+    def translate(query: str, rls: bool) -> str:
+        sql = query
+        for pattern, repl in _PG_TO_SQLITE:
+            sql = pattern.sub(repl, sql)
+        if rls and sql.lstrip().lower().startswith("select"):
+            for table, owner in _RLS_OWNER.items():
+                sql = re.sub(
+                    rf"\bfrom\s+{table}\b",
+                    f"FROM (SELECT * FROM {table} WHERE {owner} = auth_uid()) AS {table}",
+                    sql,
+                    flags=re.IGNORECASE,
+                )
+        return sql
+
+    @classmethod
+    def run(cls, uid: Optional[str], query: str, params: Any = None,
+            many: bool = False):
+        """Execute *query*; return ``(columns, rows, rowcount)``."""
+        sql = cls.translate(query, rls=uid is not None)
+        with cls._lock:
+            cls._uid = uid
+            try:
+                if many:
+                    cur = cls.connection().executemany(
+                        sql, [_sqlite_params(p) for p in params])
+                else:
+                    cur = cls.connection().execute(sql, _sqlite_params(params))
+                rows = cur.fetchall()
+            except sqlite3.IntegrityError as exc:
+                raise _real_psycopg2.IntegrityError(str(exc)) from exc
+            except sqlite3.Error as exc:
+                raise _real_psycopg2.ProgrammingError(str(exc)) from exc
+        columns = [d[0] for d in cur.description] if cur.description else []
+        return columns, rows, cur.rowcount
 
 
 class _FakeCursor:
-    def __init__(self, uid: Optional[str]):
-        self._uid = uid
+    """psycopg2 cursor whose plain SQL runs in ``_SqliteDB``.
+
+    Only PL/pgSQL functions keep hand-written branches in ``execute``.
+    """
+
+    def __init__(self, conn: "_FakeConn", dict_rows: bool = False):
+        self._conn = conn
+        self._dict_rows = dict_rows
         self._rows: List[Any] = []
+        self.rowcount = -1
+
+    @property
+    def _uid(self) -> Optional[str]:
+        return self._conn._uid
 
     # context manager --------------------------------------------------
     def __enter__(self):
@@ -326,15 +609,33 @@ class _FakeCursor:
     def __exit__(self, *_exc):
         return False  # propagate
 
+    def _sql(self, query: str, params: Any = None, many: bool = False):
+        columns, rows, self.rowcount = _SqliteDB.run(self._uid, query, params, many)
+        if self._dict_rows:
+            self._rows = [dict(zip(columns, r)) for r in rows]
+        else:
+            self._rows = [tuple(r) for r in rows]
+
+    def _call(self, query: str, name: str, params: Any) -> tuple:
+        """Evaluate the arguments of ``name(...)`` in SQLite."""
+        args = _call_args(query, name).strip()
+        if not args:
+            return ()
+        _, rows, _ = _SqliteDB.run(None, f"SELECT {args}", params)
+        return tuple(rows[0])
+
     # execute ----------------------------------------------------------
+    def executemany(self, query: str, params_seq):
+        self._sql(query, list(params_seq), many=True)
+
     def execute(self, query: str, params: tuple | None = None):
         q = " ".join(query.lower().split())
         p = params or ()
 
-        # helper auth.set_uid (no-op) -----------------------------------
+        # helper auth.set_uid (session-level, like set_config) -------------
         if "auth.set_uid" in q:
             if p:
-                self._uid = p[0]  # remember for RLS simulation
+                self._conn._uid = p[0]  # remember for RLS simulation
             self._rows = []
             return
 
@@ -443,45 +744,39 @@ class _FakeCursor:
 
         # error logging helpers ---------------------------------------
         if "log_momentum_error" in q:
-            err_id = str(uuid.uuid4())
-            _MemDB.error_logs[err_id] = {
-                "id": err_id,
-                "error_type": p[0] if p else "validation_error",
-                "error_code": p[1] if len(p) > 1 else "ERR",
-                "user_id": p[4] if len(p) > 4 else None,
-                "is_resolved": False,
-                "severity": p[-1] if p else "low",
-            }
+            args = self._call(query, "log_momentum_error", params)
+            row = dict(zip(_LOG_ERROR_ARGS, args))
+            row["id"] = err_id = str(uuid.uuid4())
+            _SqliteDB.run(
+                None,
+                f"INSERT INTO momentum_error_logs ({', '.join(row)}) "
+                f"VALUES ({', '.join(['%s'] * len(row))})",
+                tuple(row.values()),
+            )
             self._rows = [{"error_id": err_id}]
             return
         if "resolve_momentum_error" in q:
-            eid = p[0] if p else None
-            ok = eid in _MemDB.error_logs
-            if ok:
-                _MemDB.error_logs[eid]["is_resolved"] = True
-                _MemDB.error_logs[eid]["resolved_at"] = datetime.utcnow()
-                _MemDB.error_logs[eid]["resolution_notes"] = (
-                    p[1] if len(p) > 1 else None
-                )
-            self._rows = [{"success": ok}]
-            return
-        if "select * from momentum_error_logs" in q:
-            eid = (p[0] if p else None) or re.search(
-                r"where id *= *'([^']+)'", q
-            ).group(1)
-            row = _MemDB.error_logs.get(eid)
-            self._rows = [row] if row else []
+            eid, notes = (self._call(query, "resolve_momentum_error", params) + (None,))[:2]
+            self._sql(
+                "UPDATE momentum_error_logs SET is_resolved = true, "
+                "resolved_at = NOW(), resolution_notes = %s WHERE id = %s",
+                (notes, eid),
+            )
+            self._rows = [{"success": self.rowcount > 0}]
             return
         if "get_error_statistics" in q:
-            hrs = int(re.search(r"\((\d+)\)", q).group(1)) if "(" in q else 24
+            (hrs,) = self._call(query, "get_error_statistics", params) or (24,)
+            _, by_type, _ = _SqliteDB.run(
+                None,
+                "SELECT error_type, COUNT(*) FROM momentum_error_logs "
+                "WHERE created_at >= datetime('now', %s) GROUP BY error_type",
+                (f"-{int(hrs)} hours",),
+            )
             stats = {
-                "total_errors": len(_MemDB.error_logs),
-                "period_hours": hrs,
-                "by_type": defaultdict(int),
+                "total_errors": sum(n for _, n in by_type),
+                "period_hours": int(hrs),
+                "by_type": dict(by_type),
             }
-            for v in _MemDB.error_logs.values():
-                stats["by_type"][v["error_type"]] += 1
-            stats["by_type"] = dict(stats["by_type"])
             self._rows = [{"stats": stats}]
             return
         if "check_momentum_system_health" in q:
@@ -492,80 +787,20 @@ class _FakeCursor:
             ]
             return
         if "cleanup_error_logs" in q:
-            before = len(_MemDB.error_logs)
-            _MemDB.error_logs = {
-                k: v for k, v in _MemDB.error_logs.items() if not v.get("is_resolved")
-            }
-            self._rows = [{"deleted_count": before - len(_MemDB.error_logs)}]
-            return
-
-        # table ops -----------------------------------------------------
-        if "insert into public.profiles" in q:
-            if p:
-                uid = p[0]
-                onboarding = p[1] if len(p) > 1 else ("true" in q)
-            else:
-                # extract from SQL literals
-                uid_match = re.search(r"values *\('([^']+)'", q)
-                uid = uid_match.group(1) if uid_match else str(uuid.uuid4())
-                onboarding = "true" in q
-            _MemDB.profiles[uid] = {"id": uid,
-                                    "onboarding_complete": onboarding}
-            return
-        if "select onboarding_complete" in q:
-            self._rows = [(_MemDB.profiles.get(
-                p[0], {}).get("onboarding_complete"),)]
-            return
-        if "select * from public.profiles" in q:
-            row = _MemDB.profiles.get(p[0]) if p[0] == self._uid else None
-            self._rows = [row] if row else []
-            return
-
-        if "insert into daily_engagement_scores" in q:
-            uid, sdate, raw, norm, final, state, breakdown, events = p
-            key = (uid, sdate)
-            if (
-                key in _MemDB.daily_scores
-                or raw < 0
-                or not 0 <= norm <= 100
-                or state not in {"Rising", "Steady", "NeedsCare"}
-            ):
-                raise _real_psycopg2.Error("invalid scores")
-            _MemDB.daily_scores[key] = {"id": str(uuid.uuid4())}
-            if "returning id" in q:
-                self._rows = [{"id": _MemDB.daily_scores[key]["id"]}]
-            return
-
-        if "insert into momentum_notifications" in q and "returning id" in q:
-            nid = str(uuid.uuid4())
-            self._rows = [{"id": nid}]
-            return
-        if "insert into coach_interventions" in q and "returning id" in q:
-            iid = str(uuid.uuid4())
-            self._rows = [{"id": iid}]
-            return
-
-        # invalid inserts need to raise BEFORE valid branch that returns id -----
-        if "insert into momentum_notifications" in q:
-            if (
-                p and ("invalid_type" in p or "invalid_action" in p or "" in p)
-            ) or re.search(r",\s*''\s*[,)]", q):
-                raise _real_psycopg2.Error("invalid notification")
-        if "insert into coach_interventions" in q:
-            if p and ("invalid_type" in p or "invalid_status" in p or "" in p):
-                raise _real_psycopg2.Error("invalid intervention")
-
-        # select momentum_error_logs (any column list) --------------------------
-        if "from momentum_error_logs" in q:
-            eid = (p[0] if p else None) or re.search(
-                r"where id *= *'([^']+)'", q, re.IGNORECASE
-            ).group(1)
-            row = _MemDB.error_logs.get(eid)
-            self._rows = [row] if row else []
+            self._sql(
+                "DELETE FROM momentum_error_logs WHERE is_resolved "
+                "AND resolved_at < NOW() - INTERVAL '90 days'"
+            )
+            deleted = self.rowcount
+            self._sql(
+                "DELETE FROM momentum_error_logs WHERE severity = 'low' "
+                "AND created_at < NOW() - INTERVAL '30 days'"
+            )
+            self._rows = [{"deleted_count": deleted + self.rowcount}]
             return
 
-        # default fall-through -----------------------------------------
-        self._rows = []
+        # plain SQL -----------------------------------------------------
+        self._sql(query, params)
 
     # fetch helpers ----------------------------------------------------
     def fetchone(self):
@@ -580,8 +815,14 @@ class _FakeConn:
         self.autocommit = True
         self._uid = uid
 
-    def cursor(self, *_, **__):
-        return _FakeCursor(self._uid)
+    def cursor(self, *_, cursor_factory: Any = None, **__):
+        return _FakeCursor(self, dict_rows=cursor_factory is not None)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
 
     def close(self):
         pass
@@ -0,0 +1,22 @@
+"""Fixtures for the Postgres-backed suites in tests/db."""
+
+import pytest
+
+from tests.db.db_utils import _TxSession, _checkin, _checkout
+
+
+@pytest.fixture
+def db_tx():
+    """Wrap the test in one transaction that is rolled back afterwards.
+
+    Schema set-up stays in module fixtures (via ``_psql``); per-test rows go
+    through the yielded ``_TxSession`` and disappear with the rollback.
+    """
+
+    raw = _checkout("postgres")
+    raw.autocommit = False
+    try:
+        yield _TxSession(raw)
+    finally:
+        raw.rollback()
+        _checkin("postgres", raw)
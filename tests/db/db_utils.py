@@ -1,11 +1,21 @@
+import atexit
+import contextlib
+import hashlib
 import os
 import json
-import subprocess
+import threading
 import uuid
 
 import psycopg2 as _real_psycopg2
+from psycopg2 import sql as _sql
 
-__all__ = ["_psql", "_conn"]
+from scripts.run_migration import run_migrations, split_statements
+
+__all__ = ["_psql", "_conn", "_TxSession"]
+
+# Captured at import, before conftest's autouse fixture swaps psycopg2.connect
+# for the in-memory fake: these helpers always talk to the real test database.
+_pg_connect = _real_psycopg2.connect
 
 # ---------------------------------------------------------------------------
 # Environment helpers
@@ -60,14 +70,261 @@ _RLS_USER = os.getenv("RLS_TEST_USER", "rls_test_user")
 _RLS_PW = os.getenv("RLS_TEST_PASSWORD", "postgres")
 
 
-def _base_env() -> dict[str, str]:
-    """Return a copy of *os.environ* with libpq variables populated."""
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+
+# Idle connections per login role.  Opening a connection (TCP + auth + backend
+# fork) costs far more than the statements most DB tests run on it.
+_idle: dict[str, list] = {}
+_idle_lock = threading.Lock()
+
+
+def _password(role: str) -> str:
+    return _PG_SUPER_PW if role == "postgres" else _RLS_PW
+
+
+def _checkout(role: str):
+    with _idle_lock:
+        pool = _idle.setdefault(role, [])
+        while pool:
+            raw = pool.pop()
+            if not raw.closed:
+                return raw
+    return _pg_connect(
+        host=_PG_HOST,
+        port=_PG_PORT,
+        dbname=_PG_DB,
+        user=role,
+        password=_password(role),
+    )
+
+
+def _checkin(role: str, raw) -> None:
+    """Reset *raw* to a fresh session and return it to the pool.
+
+    Connections that cannot be reset (broken, or stuck in a failed
+    transaction) are closed instead.
+    """
+
+    if raw.closed:
+        return
+    try:
+        raw.rollback()
+        raw.autocommit = True
+        with raw.cursor() as cur:
+            # An explicit BEGIN sent in autocommit mode is invisible to
+            # psycopg2's own transaction tracking.
+            if (
+                raw.info.transaction_status
+                != _real_psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            ):
+                cur.execute("ROLLBACK")
+            cur.execute("DISCARD ALL")
+        raw.autocommit = False
+    except _real_psycopg2.Error:
+        raw.close()
+        return
+    with _idle_lock:
+        _idle.setdefault(role, []).append(raw)
+
+
+@atexit.register
+def _close_pool() -> None:
+    with _idle_lock:
+        for pool in _idle.values():
+            for raw in pool:
+                raw.close()
+        _idle.clear()
 
-    env = dict(os.environ)
-    env.setdefault("PGHOST", _PG_HOST)
-    env.setdefault("PGPORT", _PG_PORT)
-    env.setdefault("PGDATABASE", _PG_DB)
-    return env
+
+class _PooledConnection:
+    """A pooled psycopg2 connection; ``close()`` hands it back to the pool.
+
+    Everything else – cursors, ``autocommit``, ``with conn:`` transactions –
+    is forwarded to the underlying connection.
+    """
+
+    def __init__(self, role: str, raw):
+        object.__setattr__(self, "_role", role)
+        object.__setattr__(self, "_raw", raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise _real_psycopg2.InterfaceError("connection already closed")
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._raw.__exit__(*exc)
+
+    @property
+    def closed(self) -> int:
+        return 1 if self._raw is None else self._raw.closed
+
+    def close(self) -> None:
+        if self._raw is not None:
+            _checkin(self._role, self._raw)
+            object.__setattr__(self, "_raw", None)
+
+
+# ---------------------------------------------------------------------------
+# Per-worker databases cloned from a migrated template (DB_TEMPLATE=1)
+# ---------------------------------------------------------------------------
+
+# With DB_TEMPLATE=1 every file in supabase/migrations is applied once into
+# "<DB_NAME>_template"; each pytest-xdist worker then gets its own
+# CREATE DATABASE ... TEMPLATE copy ("<DB_NAME>_gw0", ...), so
+# `DB_TEMPLATE=1 pytest -n auto tests/db` runs workers side by side.  The
+# template is rebuilt only when the migration files change.
+
+_MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "..", "supabase", "migrations"
+)
+
+# Arbitrary advisory-lock key serialising template builds and clones.
+_TEMPLATE_LOCK = 7_431_205
+
+# Minimal stand-ins for what the Supabase platform provides before migrations.
+_PLATFORM_BOOTSTRAP = """
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE TABLE IF NOT EXISTS auth.users (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  email TEXT,
+  encrypted_password TEXT
+);
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID AS $$
+BEGIN
+  RETURN NULLIF(current_setting('request.jwt.claims', true)::jsonb->>'sub', '')::UUID;
+EXCEPTION WHEN others THEN
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+DO $$
+DECLARE r TEXT;
+BEGIN
+  FOREACH r IN ARRAY ARRAY['anon', 'authenticated', 'service_role'] LOOP
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = r) THEN
+      EXECUTE format('CREATE ROLE %I NOLOGIN', r);
+    END IF;
+  END LOOP;
+END$$;
+"""
+
+
+def _migrations_digest() -> str:
+    digest = hashlib.sha256()
+    for name in sorted(f for f in os.listdir(_MIGRATIONS_DIR) if f.endswith(".sql")):
+        digest.update(name.encode())
+        with open(os.path.join(_MIGRATIONS_DIR, name), "rb") as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()
+
+
+def _admin_connect(dbname: str = "postgres"):
+    conn = _pg_connect(
+        host=_PG_HOST,
+        port=_PG_PORT,
+        dbname=dbname,
+        user="postgres",
+        password=_PG_SUPER_PW,
+    )
+    conn.autocommit = True
+    return conn
+
+
+def _build_template(cur, template: str, stamp: str) -> None:
+    name = _sql.Identifier(template)
+    cur.execute(_sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(name))
+    cur.execute(_sql.SQL("CREATE DATABASE {}").format(name))
+
+    conn = _admin_connect(template)
+    try:
+        with conn.cursor() as bootstrap:
+            for statement in split_statements(_PLATFORM_BOOTSTRAP):
+                bootstrap.execute(statement)
+    finally:
+        conn.close()
+
+    dsn = _real_psycopg2.extensions.make_dsn(
+        host=_PG_HOST,
+        port=_PG_PORT,
+        dbname=template,
+        user="postgres",
+        password=_PG_SUPER_PW,
+    )
+    if not run_migrations(_MIGRATIONS_DIR, dsn):
+        raise RuntimeError(f"migrating template database {template!r} failed")
+    # The stamp goes in last, so a half-built template is rebuilt next run.
+    cur.execute(_sql.SQL("COMMENT ON DATABASE {} IS %s").format(name), (stamp,))
+
+
+def _drop_database(name: str) -> None:
+    try:
+        conn = _admin_connect()
+    except _real_psycopg2.Error:
+        return
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                _sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                    _sql.Identifier(name)
+                )
+            )
+    finally:
+        conn.close()
+
+
+def _clone_worker_database(base: str) -> str:
+    """Create this worker's copy of the migrated template; return its name."""
+
+    template = f"{base}_template"
+    clone = f"{base}_{os.getenv('PYTEST_XDIST_WORKER', 'main')}"
+    stamp = f"migrations:{_migrations_digest()}"
+
+    conn = _admin_connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (_TEMPLATE_LOCK,))
+            try:
+                cur.execute(
+                    "SELECT shobj_description(oid, 'pg_database') "
+                    "FROM pg_database WHERE datname = %s",
+                    (template,),
+                )
+                row = cur.fetchone()
+                if row is None or row[0] != stamp:
+                    _build_template(cur, template, stamp)
+                cur.execute(
+                    _sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                        _sql.Identifier(clone)
+                    )
+                )
+                cur.execute(
+                    _sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(
+                        _sql.Identifier(clone), _sql.Identifier(template)
+                    )
+                )
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (_TEMPLATE_LOCK,))
+    finally:
+        conn.close()
+
+    atexit.register(_drop_database, clone)
+    return clone
+
+
+if os.getenv("DB_TEMPLATE", "").lower() in ("1", "true", "yes"):
+    _PG_DB = _clone_worker_database(_PG_DB)
+    # Suites that build their own DSN from DB_NAME follow along.
+    os.environ["DB_NAME"] = _PG_DB
 
 
 # ---------------------------------------------------------------------------
@@ -76,23 +333,25 @@ def _base_env() -> dict[str, str]:
 
 
 def _psql(sql: str) -> None:
-    """Execute *sql* via the *psql* CLI with **ON_ERROR_STOP**.
+    """Execute *sql* as *postgres*, statement by statement, like ``psql -f``.
 
-    Relies exclusively on libpq environment variables for connection details, so
-    callers only need to make sure `DB_HOST/DB_PORT/...` are exported.
+    Runs in-process over a pooled superuser connection in autocommit mode, so
+    explicit ``BEGIN``/``COMMIT`` blocks behave as they do under psql; the
+    first failing statement raises (the ``ON_ERROR_STOP=1`` behaviour).
     """
 
-    subprocess.run(
-        ["psql", "-v", "ON_ERROR_STOP=1", "-q", "-f", "-"],
-        input=sql,
-        check=True,
-        text=True,
-        env={**_base_env(), "PGUSER": "postgres", "PGPASSWORD": _PG_SUPER_PW},
-    )
+    raw = _checkout("postgres")
+    try:
+        raw.autocommit = True
+        with raw.cursor() as cur:
+            for statement in split_statements(sql):
+                cur.execute(statement)
+    finally:
+        _checkin("postgres", raw)
 
 
 def _conn(user_id: uuid.UUID | None = None, *, superuser: bool = False):
-    """Return a psycopg2 connection.
+    """Return a pooled psycopg2 connection; ``close()`` returns it to the pool.
 
     If *superuser* is *True*, connect as *postgres*; otherwise connect as the
     dedicated non-superuser role used for RLS tests.  If *user_id* is supplied,
@@ -100,22 +359,71 @@ def _conn(user_id: uuid.UUID | None = None, *, superuser: bool = False):
     session.
     """
 
-    if superuser:
-        creds = {"user": "postgres", "password": _PG_SUPER_PW}
-    else:
-        creds = {"user": _RLS_USER, "password": _RLS_PW}
-
-    conn = _real_psycopg2.connect(
-        host=_PG_HOST,
-        port=_PG_PORT,
-        dbname=_PG_DB,
-        **creds,
-    )
+    role = "postgres" if superuser else _RLS_USER
+    raw = _checkout(role)
 
     if user_id:
-        with conn.cursor() as cur:
+        with raw.cursor() as cur:
             cur.execute(
                 "SELECT set_config('request.jwt.claims', %s, false)",
                 (json.dumps({"sub": str(user_id)}),),
             )
-    return conn
+        # Keep the session setting even if the caller's first transaction
+        # rolls back.
+        raw.commit()
+    return _PooledConnection(role, raw)
+
+
+class _TxSession:
+    """One transaction on a pooled superuser connection, rolled back by the
+    ``db_tx`` fixture (tests/db/conftest.py) when the test ends.
+
+    Rows a test creates are never committed, so no cleanup is needed and
+    tests cannot see each other's data – several can share one database.
+    ``as_user()`` switches to the RLS role for a block; statements expected
+    to fail belong inside ``savepoint()`` so the transaction stays usable.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._depth = 0
+
+    def cursor(self):
+        return self._raw.cursor()
+
+    def execute(self, query: str, params=None):
+        """Run *query*; return its rows, or ``None`` for statements without."""
+        with self._raw.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall() if cur.description else None
+
+    @contextlib.contextmanager
+    def savepoint(self):
+        """Roll back to a savepoint if the block raises, then re-raise."""
+        self._depth += 1
+        name = _sql.Identifier(f"test_sp_{self._depth}")
+        try:
+            self.execute(_sql.SQL("SAVEPOINT {}").format(name))
+            try:
+                yield self
+            except BaseException:
+                self.execute(_sql.SQL("ROLLBACK TO SAVEPOINT {}").format(name))
+                raise
+            self.execute(_sql.SQL("RELEASE SAVEPOINT {}").format(name))
+        finally:
+            self._depth -= 1
+
+    @contextlib.contextmanager
+    def as_user(self, user_id: uuid.UUID | None, role: str = _RLS_USER):
+        """Run the block as *role* with `auth.uid()` returning *user_id*.
+
+        Both settings are transaction-local and scoped by a savepoint, so an
+        error inside the block also undoes them.
+        """
+        claims = json.dumps({"sub": str(user_id)}) if user_id else ""
+        with self.savepoint():
+            self.execute(_sql.SQL("SET LOCAL ROLE {}").format(_sql.Identifier(role)))
+            self.execute("SELECT set_config('request.jwt.claims', %s, true)", (claims,))
+            yield self
+            self.execute("RESET ROLE")
+            self.execute("SELECT set_config('request.jwt.claims', '', true)")
@@ -4,7 +4,7 @@ import uuid
 import psycopg2 as _real_psycopg2
 import pytest
 
-from tests.db.db_utils import _psql, _conn
+from tests.db.db_utils import _psql
 
 # Ordered list of migration files required for action_steps feature
 MIGRATION_FILES = [
@@ -85,14 +85,13 @@ def _prepare_db():
 
 @pytest.mark.integration
 @pytest.mark.skipif(os.getenv("ACT") == "true", reason="Skip heavy DB test in ACT mode")
-def test_happy_path_insert_select():
+def test_happy_path_insert_select(db_tx):
     """User can insert & select their own action step (RLS happy path)."""
 
     user_id = uuid.uuid4()
-    _psql(f"INSERT INTO auth.users (id) VALUES ('{user_id}');")
+    db_tx.execute("INSERT INTO auth.users (id) VALUES (%s);", (str(user_id),))
 
-    conn = _conn(user_id)
-    with conn, conn.cursor() as cur:
+    with db_tx.as_user(user_id), db_tx.cursor() as cur:
         # Insert a valid action step for *this* user
         cur.execute(
             """
@@ -105,25 +104,26 @@ def test_happy_path_insert_select():
         )
         step_id = cur.fetchone()[0]
 
-    # Re-query to make sure row is visible
-    with conn, conn.cursor() as cur:
+        # Re-query to make sure row is visible
         cur.execute("SELECT id FROM public.action_steps WHERE id = %s", (step_id,))
         assert cur.fetchone() is not None, "Inserted row not found for same user"
-    conn.close()
 
 
 @pytest.mark.integration
 @pytest.mark.skipif(os.getenv("ACT") == "true", reason="Skip heavy DB test in ACT mode")
-def test_insert_other_user_denied():
+def test_insert_other_user_denied(db_tx):
     """RLS blocks insert when user_id ≠ auth.uid()."""
 
     user_a = uuid.uuid4()
     user_b = uuid.uuid4()
-    _psql(f"INSERT INTO auth.users (id) VALUES ('{user_a}'), ('{user_b}');")
+    db_tx.execute(
+        "INSERT INTO auth.users (id) VALUES (%s), (%s);", (str(user_a), str(user_b))
+    )
 
-    conn_b = _conn(user_b)
-    with conn_b, conn_b.cursor() as cur:
-        with pytest.raises(_real_psycopg2.errors.InsufficientPrivilege):
+    with db_tx.as_user(user_b), db_tx.cursor() as cur:
+        with pytest.raises(
+            _real_psycopg2.errors.InsufficientPrivilege
+        ), db_tx.savepoint():
             cur.execute(
                 """
                 INSERT INTO public.action_steps (user_id, category, description, frequency, week_start)
@@ -132,61 +132,62 @@ def test_insert_other_user_denied():
                 """,
                 (str(user_a),),
             )
-    conn_b.close()
 
 
 @pytest.mark.integration
 @pytest.mark.skipif(os.getenv("ACT") == "true", reason="Skip heavy DB test in ACT mode")
-def test_select_other_user_denied():
+def test_select_other_user_denied(db_tx):
     """User should not see other users' rows."""
 
     user_a = uuid.uuid4()
     user_b = uuid.uuid4()
-    _psql(f"INSERT INTO auth.users (id) VALUES ('{user_a}'), ('{user_b}');")
+    db_tx.execute(
+        "INSERT INTO auth.users (id) VALUES (%s), (%s);", (str(user_a), str(user_b))
+    )
 
-    # Insert row for user_a via superuser (bypass RLS)
-    _psql(
-        f"""
+    # Insert row for user_a as superuser (bypass RLS)
+    db_tx.execute(
+        """
         INSERT INTO public.action_steps (user_id, category, description, frequency, week_start)
-        VALUES ('{user_a}', 'Movement', '10k steps', 5,
+        VALUES (%s, 'Movement', '10k steps', 5,
                 date_trunc('week', timezone('utc', current_date))::date);
-        """
+        """,
+        (str(user_a),),
     )
 
-    conn_b = _conn(user_b)
-    with conn_b, conn_b.cursor() as cur:
+    with db_tx.as_user(user_b), db_tx.cursor() as cur:
         cur.execute("SELECT count(*) FROM public.action_steps;")
         visible = cur.fetchone()[0]
         assert visible == 0, "RLS leak: user_b sees other users' action steps"
-    conn_b.close()
 
 
 @pytest.mark.integration
 @pytest.mark.skipif(os.getenv("ACT") == "true", reason="Skip heavy DB test in ACT mode")
-def test_action_step_logs_rls():
+def test_action_step_logs_rls(db_tx):
     """RLS enforcement on action_step_logs via join to owner action_step."""
 
     user_a = uuid.uuid4()
     user_b = uuid.uuid4()
-    _psql(f"INSERT INTO auth.users (id) VALUES ('{user_a}'), ('{user_b}');")
+    db_tx.execute(
+        "INSERT INTO auth.users (id) VALUES (%s), (%s);", (str(user_a), str(user_b))
+    )
 
     # Insert action step for user_a (superuser bypass)
-    insert_step_sql = f"""
+    ((step_id,),) = db_tx.execute(
+        """
         INSERT INTO public.action_steps (id, user_id, category, description, frequency, week_start)
-        VALUES ('{uuid.uuid4()}', '{user_a}', 'Yoga', 'Sun salutations', 3,
+        VALUES (%s, %s, 'Yoga', 'Sun salutations', 3,
                 date_trunc('week', timezone('utc', current_date))::date)
         RETURNING id;
-    """
-    conn_super = _conn(None, superuser=True)
-    with conn_super, conn_super.cursor() as cur:
-        cur.execute(insert_step_sql)
-        step_id = cur.fetchone()[0]
-    conn_super.close()
+        """,
+        (str(uuid.uuid4()), str(user_a)),
+    )
 
     # ▶ Attempt insert log as *other* user – expect permission error
-    conn_b = _conn(user_b)
-    with conn_b, conn_b.cursor() as cur:
-        with pytest.raises(_real_psycopg2.errors.InsufficientPrivilege):
+    with db_tx.as_user(user_b), db_tx.cursor() as cur:
+        with pytest.raises(
+            _real_psycopg2.errors.InsufficientPrivilege
+        ), db_tx.savepoint():
             cur.execute(
                 """
                 INSERT INTO public.action_step_logs (action_step_id, completed_on)
@@ -194,11 +195,9 @@ def test_action_step_logs_rls():
                 """,
                 (str(step_id),),
             )
-    conn_b.close()
 
     # ▶ Happy-path insert & select for owner
-    conn_a = _conn(user_a)
-    with conn_a, conn_a.cursor() as cur:
+    with db_tx.as_user(user_a), db_tx.cursor() as cur:
         cur.execute(
             """
             INSERT INTO public.action_step_logs (action_step_id, completed_on)
@@ -209,7 +208,5 @@ def test_action_step_logs_rls():
         )
         log_id = cur.fetchone()[0]
 
-    with conn_a, conn_a.cursor() as cur:
         cur.execute("SELECT id FROM public.action_step_logs WHERE id = %s;", (log_id,))
         assert cur.fetchone() is not None, "Owner cannot see their own log"
-    conn_a.close()
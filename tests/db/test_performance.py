@@ -8,8 +8,15 @@ Milestone: 1 · Data Backbone
 This script tests the performance characteristics of the engagement_events table
 including Realtime notification latency and concurrent insert performance.
 
+Every scenario runs on the benchmark harness in scripts/benchmark.py: warm-up
+calls, many timed iterations, outlier rejection and p50/p95/p99 with
+confidence intervals.  A scenario fails only when a percentile is
+*significantly* above its target, and all samples are written to a JSON
+results file that later runs can be compared against.
+
 Usage:
-    python test_performance.py
+    python tests/db/test_performance.py [--iterations 100] [--warmup 5]
+        [--results tests/db/benchmark_results.json]
 
 Requirements:
     pip install psycopg2-binary asyncio websockets python-dotenv
@@ -18,28 +25,49 @@ Created: 2024-12-01
 Author: BEE Development Team
 """
 
+import argparse
 import os
 import sys
 import psycopg2
-import time
 import json
 import uuid
-import statistics
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional
 
 # Add project root to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from scripts.benchmark import (  # noqa: E402
+    ITERATIONS_DEFAULT,
+    WARMUP_DEFAULT,
+    ThreadState,
+    exceeds,
+    format_result,
+    run_benchmark,
+    write_results,
+)
+
+RESULTS_PATH_DEFAULT = "tests/db/benchmark_results.json"
 
 
 class PerformanceTester:
     """Test class for performance verification"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        iterations: int = ITERATIONS_DEFAULT,
+        warmup: int = WARMUP_DEFAULT,
+        results_path: str = RESULTS_PATH_DEFAULT,
+    ):
         self.db_config = self._get_db_config()
         self.test_user_id = "11111111-1111-1111-1111-111111111111"
         self.test_results = []
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results_path = results_path
+        self.benchmarks = []
 
     def _get_db_config(self) -> Dict[str, str]:
         """Get database configuration from environment or defaults"""
@@ -92,64 +120,59 @@ class PerformanceTester:
             for key, value in metrics.items():
                 print(f"  📊 {key}: {value}")
 
+    def _benchmark(self, name: str, fn, **kwargs) -> Dict:
+        """Run *fn* on the harness with this tester's iteration settings."""
+        kwargs.setdefault("iterations", self.iterations)
+        kwargs.setdefault("warmup", self.warmup)
+        result = run_benchmark(name, fn, **kwargs)
+        self.benchmarks.append(result)
+        print(f"  ⏱  {format_result(result)}")
+        return result
+
+    @staticmethod
+    def _latency_metrics(result: Dict, prefix: str) -> Dict:
+        metrics = {}
+        for q in (50, 95, 99):
+            lo, hi = result[f"p{q}_ci_ms"]
+            metrics[
+                f"{prefix}_p{q}_ms"
+            ] = f"{result[f'p{q}_ms']:.2f} (CI {lo:.2f}–{hi:.2f})"
+        metrics[f"{prefix}_samples"] = result["n"]
+        metrics[f"{prefix}_outliers_rejected"] = result["rejected"]
+        return metrics
+
+    def _insert_event(self, conn, event_type: str, value: Dict):
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO engagement_events (user_id, event_type, value) 
+                VALUES (%s, %s, %s)
+            """,
+                (self.test_user_id, event_type, json.dumps(value)),
+            )
+
     def test_single_insert_performance(self) -> bool:
         """Test 1: Measure single insert performance"""
         try:
             conn = self._get_connection(self.test_user_id)
-
-            # Warm up
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO engagement_events (user_id, event_type, value) 
-                    VALUES (%s, %s, %s)
-                """,
-                    (self.test_user_id, "warmup", "{}"),
+            counter = iter(range(10**9))
+
+            def insert():
+                i = next(counter)
+                self._insert_event(
+                    conn,
+                    f"perf_test_single_{i}",
+                    {"test_id": str(uuid.uuid4()), "iteration": i},
                 )
 
-            # Measure single inserts
-            insert_times = []
-            num_tests = 10
-
-            for i in range(num_tests):
-                start_time = time.perf_counter()
-
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        INSERT INTO engagement_events (user_id, event_type, value) 
-                        VALUES (%s, %s, %s)
-                    """,
-                        (
-                            self.test_user_id,
-                            f"perf_test_single_{i}",
-                            json.dumps({"test_id": str(uuid.uuid4()), "iteration": i}),
-                        ),
-                    )
-
-                end_time = time.perf_counter()
-                insert_times.append((end_time - start_time) * 1000)  # Convert to ms
-
+            result = self._benchmark("single_insert", insert)
             conn.close()
 
-            # Calculate statistics
-            avg_time = statistics.mean(insert_times)
-            median_time = statistics.median(insert_times)
-            max_time = max(insert_times)
-            min_time = min(insert_times)
-
-            # Performance criteria: single insert should be < 50ms on average
-            performance_passed = avg_time < 50.0
-
-            metrics = {
-                "average_insert_time_ms": f"{avg_time:.2f}",
-                "median_insert_time_ms": f"{median_time:.2f}",
-                "max_insert_time_ms": f"{max_time:.2f}",
-                "min_insert_time_ms": f"{min_time:.2f}",
-                "total_inserts": num_tests,
-            }
+            # Performance criteria: median single insert should be < 50ms
+            performance_passed = not exceeds(result, "p50", 50.0)
 
-            details = f"Average insert time: {avg_time:.2f}ms (target: <50ms)"
+            metrics = self._latency_metrics(result, "insert")
+            details = f"Median insert time: {result['p50_ms']:.2f}ms (target: <50ms)"
 
             self._log_test_result(
                 "Single Insert Performance", performance_passed, details, metrics
@@ -166,106 +189,57 @@ class PerformanceTester:
         """Test 2: Measure performance with 100+ concurrent inserts"""
         try:
             num_threads = 20
-            inserts_per_thread = 10
-
-            def insert_events(thread_id: int) -> List[float]:
-                """Insert events in a single thread and return timing data"""
-                times = []
-                try:
-                    conn = self._get_connection(self.test_user_id)
-
-                    for i in range(inserts_per_thread):
-                        start_time = time.perf_counter()
-
-                        with conn.cursor() as cur:
-                            cur.execute(
-                                """
-                                INSERT INTO engagement_events (user_id, event_type, value) 
-                                VALUES (%s, %s, %s)
-                            """,
-                                (
-                                    self.test_user_id,
-                                    f"perf_test_concurrent_{thread_id}_{i}",
-                                    json.dumps(
-                                        {
-                                            "test_id": str(uuid.uuid4()),
-                                            "thread_id": thread_id,
-                                            "iteration": i,
-                                            "timestamp": datetime.now().isoformat(),
-                                        }
-                                    ),
-                                ),
-                            )
-
-                        end_time = time.perf_counter()
-                        times.append((end_time - start_time) * 1000)
+            inserts_per_thread = max(10, self.iterations // num_threads)
+            conns = ThreadState(lambda: self._get_connection(self.test_user_id))
+            counter = iter(range(10**9))
+
+            def insert():
+                i = next(counter)
+                self._insert_event(
+                    conns.get(),
+                    f"perf_test_concurrent_{i}",
+                    {
+                        "test_id": str(uuid.uuid4()),
+                        "iteration": i,
+                        "timestamp": datetime.now().isoformat(),
+                    },
+                )
 
+            try:
+                result = self._benchmark(
+                    "concurrent_insert",
+                    insert,
+                    iterations=num_threads * inserts_per_thread,
+                    threads=num_threads,
+                )
+            finally:
+                for conn in conns.values:
                     conn.close()
-                    return times
-
-                except Exception as e:
-                    print(f"Thread {thread_id} error: {str(e)}")
-                    return []
-
-            # Execute concurrent inserts
-            start_time = time.perf_counter()
-
-            with ThreadPoolExecutor(max_workers=num_threads) as executor:
-                futures = [
-                    executor.submit(insert_events, i) for i in range(num_threads)
-                ]
-                all_times = []
-
-                for future in as_completed(futures):
-                    thread_times = future.result()
-                    all_times.extend(thread_times)
-
-            end_time = time.perf_counter()
-            total_duration = (end_time - start_time) * 1000  # Convert to ms
-
-            # Calculate statistics
-            if all_times:
-                avg_time = statistics.mean(all_times)
-                median_time = statistics.median(all_times)
-                max_time = max(all_times)
-                min_time = min(all_times)
-                throughput = len(all_times) / (
-                    total_duration / 1000
-                )  # inserts per second
-
-                # Performance criteria:
-                # - Average insert time should still be reasonable under load (<100ms)
-                # - Should achieve >50 inserts per second
-                performance_passed = avg_time < 100.0 and throughput > 50.0
-
-                metrics = {
-                    "total_inserts": len(all_times),
-                    "total_duration_ms": f"{total_duration:.2f}",
-                    "average_insert_time_ms": f"{avg_time:.2f}",
-                    "median_insert_time_ms": f"{median_time:.2f}",
-                    "max_insert_time_ms": f"{max_time:.2f}",
-                    "min_insert_time_ms": f"{min_time:.2f}",
-                    "throughput_inserts_per_sec": f"{throughput:.2f}",
-                    "concurrent_threads": num_threads,
-                }
 
-                details = (
-                    f"Concurrent inserts: {len(all_times)}, "
-                    f"Avg time: {avg_time:.2f}ms, Throughput: {throughput:.2f}/sec"
-                )
+            throughput = result["throughput_per_s"]
 
-                self._log_test_result(
-                    "Concurrent Insert Performance",
-                    performance_passed,
-                    details,
-                    metrics,
-                )
-                return performance_passed
-            else:
-                self._log_test_result(
-                    "Concurrent Insert Performance", False, "No successful inserts"
-                )
-                return False
+            # Performance criteria:
+            # - Median insert time should still be reasonable under load (<100ms)
+            # - Should achieve >50 inserts per second
+            performance_passed = not exceeds(result, "p50", 100.0) and throughput > 50.0
+
+            metrics = self._latency_metrics(result, "insert")
+            metrics["total_duration_ms"] = f"{result['wall_s'] * 1000:.2f}"
+            metrics["throughput_inserts_per_sec"] = f"{throughput:.2f}"
+            metrics["concurrent_threads"] = num_threads
+
+            details = (
+                f"Concurrent inserts: {result['iterations']}, "
+                f"Median time: {result['p50_ms']:.2f}ms, Throughput: {throughput:.2f}/sec"
+            )
+
+            self._log_test_result(
+                "Concurrent Insert Performance",
+                performance_passed,
+                details,
+                metrics,
+            )
+            return performance_passed
 
         except Exception as e:
             self._log_test_result(
@@ -274,85 +248,91 @@ class PerformanceTester:
             return False
 
     def test_query_performance_with_indexes(self) -> bool:
-        """Test 3: Verify index effectiveness with EXPLAIN ANALYZE"""
+        """Test 3: Verify index usage with EXPLAIN, then benchmark the queries"""
         try:
             conn = self._get_connection(self.test_user_id)
 
-            # Test 1: User timeline query (should use user_timestamp index)
-            with conn.cursor() as cur:
-                cur.execute(
+            # (name, sql, params, latency target in ms)
+            queries = [
+                (
+                    "timeline_query",
                     """
-                    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) 
                     SELECT * FROM engagement_events 
                     WHERE user_id = %s 
                     ORDER BY timestamp DESC 
                     LIMIT 50
                 """,
                     (self.test_user_id,),
-                )
-
-                timeline_plan = cur.fetchone()[0][0]
-
-            # Test 2: Event type filtering (should use event_type index)
-            with conn.cursor() as cur:
-                cur.execute(
+                    50.0,
+                ),
+                (
+                    "event_type_query",
                     """
-                    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) 
                     SELECT COUNT(*) FROM engagement_events 
                     WHERE event_type = 'app_open'
                 """,
-                    (self.test_user_id,),
-                )
-
-                event_type_plan = cur.fetchone()[0][0]
-
-            # Test 3: JSONB search (should use GIN index)
-            with conn.cursor() as cur:
-                cur.execute(
+                    None,
+                    100.0,
+                ),
+                (
+                    "jsonb_query",
                     """
-                    EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) 
                     SELECT * FROM engagement_events 
                     WHERE value @> '{"goal_type": "steps"}'
-                """
-                )
+                """,
+                    None,
+                    200.0,
+                ),
+            ]
 
-                jsonb_plan = cur.fetchone()[0][0]
+            # Check if indexes are being used (look for Index Scan in plan)
+            plans = {}
+            for name, sql, params, _target in queries:
+                with conn.cursor() as cur:
+                    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                    plans[name] = str(cur.fetchone()[0][0])
 
-            conn.close()
+            timeline_uses_index = "Index Scan" in plans["timeline_query"]
+            event_type_uses_index = "Index Scan" in plans["event_type_query"]
+            jsonb_uses_index = (
+                "Bitmap" in plans["jsonb_query"] or "Index Scan" in plans["jsonb_query"]
+            )
 
-            # Analyze execution plans
-            timeline_time = timeline_plan["Execution Time"]
-            event_type_time = event_type_plan["Execution Time"]
-            jsonb_time = jsonb_plan["Execution Time"]
+            def query_runner(sql, params):
+                def run():
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        cur.fetchall()
 
-            # Check if indexes are being used (look for Index Scan in plan)
-            timeline_uses_index = "Index Scan" in str(timeline_plan)
-            event_type_uses_index = "Index Scan" in str(event_type_plan)
-            jsonb_uses_index = "Bitmap" in str(jsonb_plan) or "Index Scan" in str(
-                jsonb_plan
-            )
+                return run
+
+            results = {
+                name: (self._benchmark(name, query_runner(sql, params)), target)
+                for name, sql, params, target in queries
+            }
+            conn.close()
 
             # Performance criteria: queries should be fast and use indexes
             performance_passed = (
-                timeline_time < 50.0  # Timeline query < 50ms
-                and event_type_time < 100.0  # Event type query < 100ms
-                and jsonb_time < 200.0  # JSONB query < 200ms
+                not any(exceeds(r, "p95", target) for r, target in results.values())
                 and timeline_uses_index
                 and event_type_uses_index
             )
 
-            metrics = {
-                "timeline_query_time_ms": f"{timeline_time:.2f}",
-                "event_type_query_time_ms": f"{event_type_time:.2f}",
-                "jsonb_query_time_ms": f"{jsonb_time:.2f}",
-                "timeline_uses_index": timeline_uses_index,
-                "event_type_uses_index": event_type_uses_index,
-                "jsonb_uses_index": jsonb_uses_index,
-            }
+            metrics = {}
+            for name, (result, _target) in results.items():
+                metrics.update(self._latency_metrics(result, name))
+            metrics.update(
+                {
+                    "timeline_uses_index": timeline_uses_index,
+                    "event_type_uses_index": event_type_uses_index,
+                    "jsonb_uses_index": jsonb_uses_index,
+                }
+            )
 
-            details = (
-                f"Timeline: {timeline_time:.2f}ms, Event type: {event_type_time:.2f}ms, "
-                f"JSONB: {jsonb_time:.2f}ms"
+            details = ", ".join(
+                f"{name}: p95 {result['p95_ms']:.2f}ms (target <{target:.0f}ms)"
+                for name, (result, target) in results.items()
             )
 
             self._log_test_result(
@@ -420,61 +400,63 @@ class PerformanceTester:
                         )
 
             # Test various query patterns on large dataset
+            week_ago = datetime.now() - timedelta(days=7)
             queries = [
                 (
                     "Recent events",
                     "SELECT * FROM engagement_events WHERE user_id = %s ORDER BY timestamp DESC LIMIT 100",
+                    (self.test_user_id,),
                 ),
                 (
                     "Date range",
                     "SELECT COUNT(*) FROM engagement_events WHERE user_id = %s AND timestamp >= %s",
+                    (self.test_user_id, week_ago),
                 ),
                 (
                     "Event type filter",
-                    "SELECT COUNT(*) FROM engagement_events WHERE user_id = %s AND event_type LIKE 'app_%'",
+                    "SELECT COUNT(*) FROM engagement_events WHERE user_id = %s AND event_type LIKE 'app_%%'",
+                    (self.test_user_id,),
                 ),
                 (
                     "JSONB aggregation",
                     "SELECT COUNT(*) FROM engagement_events WHERE user_id = %s AND value ? 'batch'",
+                    (self.test_user_id,),
                 ),
             ]
 
-            query_times = {}
-
-            for query_name, query_sql in queries:
-                start_time = time.perf_counter()
-
-                with conn.cursor() as cur:
-                    if query_name == "Date range":
-                        cur.execute(
-                            query_sql,
-                            (self.test_user_id, datetime.now() - timedelta(days=7)),
-                        )
-                    else:
-                        cur.execute(query_sql, (self.test_user_id,))
-
-                cur.fetchall()
+            def query_runner(sql, params):
+                def run():
+                    with conn.cursor() as cur:
+                        cur.execute(sql, params)
+                        cur.fetchall()
 
-                end_time = time.perf_counter()
-                query_times[query_name] = (end_time - start_time) * 1000
+                return run
 
+            results = {
+                name: self._benchmark(
+                    "large_dataset_" + name.lower().replace(" ", "_"),
+                    query_runner(sql, params),
+                )
+                for name, sql, params in queries
+            }
             conn.close()
 
             # Performance criteria: all queries should complete in reasonable time
             max_acceptable_time = 500.0  # 500ms
-            performance_passed = all(
-                time < max_acceptable_time for time in query_times.values()
+            performance_passed = not any(
+                exceeds(r, "p95", max_acceptable_time) for r in results.values()
             )
 
-            metrics = {
-                f"{name.lower().replace(' ', '_')}_time_ms": f"{time:.2f}"
-                for name, time in query_times.items()
-            }
+            metrics = {}
+            for name, result in results.items():
+                metrics.update(
+                    self._latency_metrics(result, name.lower().replace(" ", "_"))
+                )
             metrics["dataset_size"] = target_count
             metrics["max_acceptable_time_ms"] = max_acceptable_time
 
             details = (
-                f"Largest query time: {max(query_times.values()):.2f}ms "
+                f"Largest p95 query time: {max(r['p95_ms'] for r in results.values()):.2f}ms "
                 f"(target: <{max_acceptable_time}ms)"
             )
 
@@ -496,16 +478,10 @@ class PerformanceTester:
             # In a real test, this would measure the time from INSERT to WebSocket notification
 
             conn = self._get_connection(self.test_user_id)
+            counter = iter(range(10**9))
 
             # Simulate the latency by measuring insert + immediate query time
-            latencies = []
-            num_tests = 10
-
-            for i in range(num_tests):
-                # Insert event
-                insert_start = time.perf_counter()
-                event_id = str(uuid.uuid4())
-
+            def insert_then_query():
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -515,10 +491,14 @@ class PerformanceTester:
                         (
                             self.test_user_id,
                             "realtime_test",
-                            json.dumps({"test_id": event_id, "iteration": i}),
+                            json.dumps(
+                                {
+                                    "test_id": str(uuid.uuid4()),
+                                    "iteration": next(counter),
+                                }
+                            ),
                         ),
                     )
-
                     inserted_id = cur.fetchone()[0]
 
                 # Immediately query for the event (simulating notification trigger)
@@ -530,45 +510,28 @@ class PerformanceTester:
                     """,
                         (inserted_id,),
                     )
+                    if cur.fetchone() is None:
+                        raise AssertionError(f"inserted event {inserted_id} not found")
 
-                    result = cur.fetchone()
-
-                insert_end = time.perf_counter()
-
-                if result:
-                    latency = (insert_end - insert_start) * 1000  # Convert to ms
-                    latencies.append(latency)
-
+            result = self._benchmark("realtime_latency_simulated", insert_then_query)
             conn.close()
 
-            if latencies:
-                avg_latency = statistics.mean(latencies)
-                max_latency = max(latencies)
-                min_latency = min(latencies)
-
-                # Performance criteria: simulated latency should be < 500ms (target from PRD)
-                # Note: Real Realtime latency would include WebSocket transmission time
-                performance_passed = avg_latency < 500.0
-
-                metrics = {
-                    "average_latency_ms": f"{avg_latency:.2f}",
-                    "max_latency_ms": f"{max_latency:.2f}",
-                    "min_latency_ms": f"{min_latency:.2f}",
-                    "target_latency_ms": "500.00",
-                    "test_type": "simulated_insert_query",
-                }
+            # Performance criteria: simulated latency should be < 500ms (target from PRD)
+            # Note: Real Realtime latency would include WebSocket transmission time
+            performance_passed = not exceeds(result, "p95", 500.0)
 
-                details = f"Simulated avg latency: {avg_latency:.2f}ms (target: <500ms)"
+            metrics = self._latency_metrics(result, "latency")
+            metrics["target_latency_ms"] = "500.00"
+            metrics["test_type"] = "simulated_insert_query"
 
-                self._log_test_result(
-                    "Realtime Latency (Simulated)", performance_passed, details, metrics
-                )
-                return performance_passed
-            else:
-                self._log_test_result(
-                    "Realtime Latency (Simulated)", False, "No latency measurements"
-                )
-                return False
+            details = (
+                f"Simulated p95 latency: {result['p95_ms']:.2f}ms (target: <500ms)"
+            )
+
+            self._log_test_result(
+                "Realtime Latency (Simulated)", performance_passed, details, metrics
+            )
+            return performance_passed
 
         except Exception as e:
             self._log_test_result(
@@ -639,10 +602,44 @@ class PerformanceTester:
 
         print(f"Detailed performance report saved to: tests/db/{report_file}")
 
+        write_results(
+            self.results_path,
+            self.benchmarks,
+            suite="engagement_events",
+            metadata={
+                "database": {
+                    k: v for k, v in self.db_config.items() if k != "password"
+                },
+                "iterations": self.iterations,
+                "warmup": self.warmup,
+            },
+        )
+        print(f"Benchmark samples saved to: {self.results_path}")
+
 
 def main():
     """Main test execution"""
-    tester = PerformanceTester()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=ITERATIONS_DEFAULT,
+        help="Timed iterations per benchmark",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=WARMUP_DEFAULT,
+        help="Untimed warm-up calls per benchmark (per thread when concurrent)",
+    )
+    parser.add_argument(
+        "--results",
+        default=RESULTS_PATH_DEFAULT,
+        help="JSON file for the benchmark samples and statistics",
+    )
+    args = parser.parse_args()
+
+    tester = PerformanceTester(args.iterations, args.warmup, args.results)
     success = tester.run_all_tests()
 
     if success:
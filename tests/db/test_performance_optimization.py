@@ -12,6 +12,8 @@ Tests cover:
 - Memory and resource usage
 """
 
+import os
+import sys
 import pytest
 import time
 import uuid
@@ -22,6 +24,24 @@ import json
 import statistics
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Add project root to path for imports
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from scripts.benchmark import (  # noqa: E402
+    compare,
+    exceeds,
+    format_json,
+    format_markdown,
+    format_result,
+    load_results,
+    promote,
+    regressions,
+    run_benchmark,
+    write_results,
+)
+
 # Skip this heavy performance-optimization suite in CI until seed fixtures for auth.users
 # and other supporting tables are available. This prevents foreign-key errors and lets
 # the rest of the test pipeline pass.
@@ -48,6 +68,24 @@ TEST_CONFIG = {
     },
 }
 
+# Baseline store: each run is written to results_path and compared with the
+# committed baseline_path.  The baseline only moves when asked to – run with
+# PERF_PROMOTE=1 (or `python -m scripts.benchmark promote <results> <baseline>`)
+# and commit the updated file with the change that justifies it.  Diff two
+# runs by hand with
+#   python -m scripts.benchmark compare <baseline> <results>
+_HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_CONFIG = {
+    "baseline_path": os.environ.get(
+        "PERF_BASELINE", os.path.join(_HERE, "performance_baseline.json")
+    ),
+    "results_path": os.environ.get(
+        "PERF_RESULTS", os.path.join(_HERE, "performance_results.json")
+    ),
+    "promote": os.environ.get("PERF_PROMOTE") == "1",
+}
+BASELINE_ITERATIONS = 30
+
 
 class TestPerformanceOptimization:
     """Test suite for database performance optimization"""
@@ -698,6 +736,8 @@ class TestPerformanceOptimization:
 
     def test_performance_baseline_establishment(self, db_connection, test_data_setup):
         """Establish performance baselines for future regression testing"""
+        baseline_path = BASELINE_CONFIG["baseline_path"]
+        results_path = BASELINE_CONFIG["results_path"]
         cursor = db_connection.cursor(cursor_factory=RealDictCursor)
 
         # Define baseline queries and their expected performance
@@ -740,23 +780,32 @@ class TestPerformanceOptimization:
             },
         ]
 
-        # Test each baseline query
-        performance_results = {}
+        # Benchmark each baseline query
+        results = []
         for query_test in baseline_queries:
-            query_time = self.measure_query_time(
-                cursor, query_test["query"], query_test["params"]
+            result = run_benchmark(
+                query_test["name"],
+                lambda q=query_test: self.measure_query_time(
+                    cursor, q["query"], q["params"]
+                ),
+                iterations=BASELINE_ITERATIONS,
             )
-
-            performance_results[query_test["name"]] = {
-                "execution_time_ms": query_time,
-                "threshold_ms": query_test["threshold_ms"],
-                "passed": query_time < query_test["threshold_ms"],
-            }
-
-            # Assert performance meets baseline
-            assert (
-                query_time < query_test["threshold_ms"]
-            ), f"Query {query_test['name']} took {query_time}ms, expected < {query_test['threshold_ms']}ms"
+            result["threshold_ms"] = query_test["threshold_ms"]
+            results.append(result)
+
+        # Persist this run and diff it against the committed baseline
+        current = write_results(results_path, results, suite="performance_optimization")
+        baseline, rows = None, []
+        if os.path.exists(baseline_path):
+            baseline = load_results(baseline_path)
+            rows = compare(baseline, current)
+        else:
+            print(
+                f"No baseline at {baseline_path} – regression check skipped; "
+                "run with PERF_PROMOTE=1 and commit the file to enable it"
+            )
+        if BASELINE_CONFIG["promote"]:
+            promote(results_path, baseline_path)
 
         # Log performance baselines for future reference
         cursor.execute(
@@ -770,9 +819,16 @@ class TestPerformanceOptimization:
                 'low'
             )
         """,
-            (json.dumps(performance_results),),
+            (format_json(rows, baseline, current),),
         )
 
+        # Assert performance meets baseline
+        for result in results:
+            assert not exceeds(
+                result, "p50", result["threshold_ms"]
+            ), f"Query {format_result(result)}, expected p50 < {result['threshold_ms']}ms"
+        assert not regressions(rows), format_markdown(rows, baseline, current)
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
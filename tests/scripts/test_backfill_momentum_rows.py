@@ -1,4 +1,5 @@
 import importlib
+import json
 import types
 import sys  # add sys import
 
@@ -15,9 +16,22 @@ class StubClient:  # pylint: disable=too-few-public-methods
 
     def sql(self, stmt: str):  # noqa: D401 – short method
         self.statements.append(stmt)
-        # Simulate INSERT returning rows list (len == number of rows inserted)
+        # Simulate active-user cohort materialization
+        if "create unlogged table" in stmt.lower():
+            return [{"cohort_size": 7}]
+        # Simulate set-based window statements (one row per day)
+        if "generate_series" in stmt.lower():
+            column = "inserted" if "insert into" in stmt.lower() else "missing"
+            return [{"score_date": "2024-01-01", column: 3}]
+        # Simulate keyset INSERT page (one user scanned & inserted)
         if "insert into" in stmt.lower():
-            return [{}]  # single row inserted
+            return [
+                {
+                    "last_id": "00000000-0000-0000-0000-000000000001",
+                    "scanned": 1,
+                    "inserted": 1,
+                }
+            ]
         # Simulate COUNT query
         if "count(*)" in stmt.lower():
             return [{"missing": 42}]
@@ -61,3 +75,151 @@ def test_backfill_inserts(backfill):
     # Should have executed at least 2 INSERT statements (one per day)
     inserts = [s for s in stub.statements if "insert into" in s.lower()]
     assert len(inserts) >= 2
+
+
+def test_uuid_ranges_cover_keyspace(backfill):
+    module, _ = backfill
+    ranges = module._uuid_ranges(4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == "00000000-0000-0000-0000-000000000000"
+    assert ranges[-1][1] is None
+    # Contiguous: each range starts where the previous one ended
+    for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+        assert hi == lo
+
+
+def test_set_based_one_statement_per_chunk(backfill):
+    module, stub = backfill
+    module.run(days=90, endpoint="http://example.com", set_based=True, chunks=4)
+    assert len(stub.statements) == 4
+    assert all("generate_series" in s for s in stub.statements)
+    assert all("offset" not in s.lower() for s in stub.statements)
+
+
+def test_set_based_dry_run_aggregates_per_day(backfill):
+    module, stub = backfill
+    per_day = module.process_window_set_based(
+        stub,
+        module.dt.date(2024, 1, 1),
+        module.dt.date(2024, 1, 3),
+        dry_run=True,
+        chunks=2,
+    )
+    assert per_day == {"2024-01-01": 6}
+    assert all("insert into" not in s.lower() for s in stub.statements)
+
+
+def test_keyset_pagination_never_uses_offset(backfill):
+    module, stub = backfill
+    module.run(days=1, endpoint="http://example.com")
+    assert "offset" not in stub.statements[0].lower()
+    assert "order by u.id" in stub.statements[0].lower()
+
+
+def test_checkpoint_resumes_and_is_removed(backfill, tmp_path):
+    module, stub = backfill
+    today = module.dt.date.today()
+    done = (today - module.dt.timedelta(days=1)).isoformat()
+    partial = (today - module.dt.timedelta(days=2)).isoformat()
+    cursor = "7fffffff-0000-0000-0000-000000000000"
+    ckpt = tmp_path / "ckpt.json"
+    run_key = {"start": partial, "end": done, "active_within_days": 0}
+    ckpt.write_text(
+        json.dumps(
+            {"run": run_key, "completed": [done], "in_progress": {partial: cursor}}
+        )
+    )
+
+    module.run(days=2, endpoint="http://example.com", checkpoint_path=str(ckpt))
+
+    # Only the partial day is redone, starting after the saved user id
+    assert len(stub.statements) == 1
+    assert f"'{partial}'" in stub.statements[0]
+    assert f"u.id > '{cursor}'" in stub.statements[0]
+    assert not ckpt.exists()
+
+
+def test_checkpoint_from_a_different_run_is_refused(backfill, tmp_path):
+    module, stub = backfill
+    ckpt = tmp_path / "ckpt.json"
+    module._save_checkpoint(
+        str(ckpt),
+        module._load_checkpoint(None, {"start": "2024-01-01", "end": "2024-01-30"}),
+    )
+
+    with pytest.raises(SystemExit):
+        module.run(days=2, endpoint="http://example.com", checkpoint_path=str(ckpt))
+    assert stub.statements == []
+    assert ckpt.exists()
+
+
+def test_checkpoint_survives_failure(backfill, tmp_path, monkeypatch):
+    module, stub = backfill
+    ckpt = tmp_path / "ckpt.json"
+    calls = {"n": 0}
+    original = stub.sql
+
+    def flaky(stmt):
+        calls["n"] += 1
+        if calls["n"] > 1:
+            raise TimeoutError("statement timeout")
+        return original(stmt)
+
+    monkeypatch.setattr(stub, "sql", flaky)
+    with pytest.raises(TimeoutError):
+        module.run(days=2, endpoint="http://example.com", checkpoint_path=str(ckpt))
+
+    state = json.loads(ckpt.read_text())
+    yday = (module.dt.date.today() - module.dt.timedelta(days=1)).isoformat()
+    assert state["completed"] == [yday]
+
+
+def test_workers_process_every_day_once(backfill):
+    module, stub = backfill
+    module.run(days=6, endpoint="http://example.com", workers=3)
+    inserts = [s for s in stub.statements if "insert into" in s.lower()]
+    days = {s.split("'")[1] for s in inserts if "::DATE" in s}
+    assert len(inserts) == 6
+    assert len(days) == 6
+
+
+def test_row_rate_limiter_sleeps_when_over_budget(backfill, monkeypatch):
+    module, _ = backfill
+    sleeps: list[float] = []
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+    limiter = module._RowRateLimiter(rows_per_second=100)
+    limiter(50)
+    limiter(50)
+    assert sleeps and max(sleeps) > 0.5
+    # rate 0 disables throttling entirely
+    module._RowRateLimiter(rows_per_second=0)(10_000)
+    assert len(sleeps) == 2
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_active_cohort_materialized_once_and_dropped(backfill, dry_run):
+    module, stub = backfill
+    module.run(
+        days=3, endpoint="http://example.com", dry_run=dry_run, active_within_days=14
+    )
+    cleanup, create, *work, drop = stub.statements
+    assert "pg_tables" in cleanup and "backfill\\_momentum\\_cohort\\_%" in cleanup
+    assert "create unlogged table" in create.lower()
+    assert "interval '14 days'" in create.lower()
+    table = create.split()[3]
+    assert len(work) == 3
+    assert all(f"FROM {table} u" in s for s in work)
+    assert all("auth.users" not in s for s in work)
+    assert drop == f"DROP TABLE IF EXISTS {table};"
+
+
+@pytest.mark.parametrize(
+    "flag",
+    [["--workers", "4"], ["--checkpoint", "x.json"], ["--max-rows-per-second", "9"]],
+)
+def test_set_based_rejects_per_day_flags(backfill, flag):
+    module, _ = backfill
+    with pytest.raises(SystemExit):
+        module._parse_args(["--set-based", *flag])
+    assert module._parse_args(["--set-based"]).checkpoint is None
+    assert module._parse_args([]).checkpoint == module.CHECKPOINT_PATH_DEFAULT
@@ -0,0 +1,181 @@
+import importlib
+
+import pytest
+
+MODULE_PATH = "scripts.backfill_wearable_summary"
+
+
+class StubResponse:  # pylint: disable=too-few-public-methods
+    def __init__(self, status: int, body=None, headers=None):
+        self.status_code = status
+        self._body = body or {}
+        self.headers = headers or {}
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class StubSession:
+    """Session stub that replays queued responses and records URLs."""
+
+    def __init__(self, responses=None, supports_ranges=False):
+        self.responses = list(responses or [])
+        self.supports_ranges = supports_ranges
+        self.urls: list[str] = []
+
+    def get(self, url, **_kwargs):
+        self.urls.append(url)
+        if self.responses:
+            return self.responses.pop(0)
+        if self.supports_ranges and "start=" in url:
+            query = dict(kv.split("=") for kv in url.split("?", 1)[1].split("&"))
+            return StubResponse(200, {"days": {query["start"]: 2}, "processed": 2})
+        return StubResponse(200, {"processed": 1})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+
+@pytest.fixture()
+def wearable(monkeypatch):
+    module = importlib.import_module(MODULE_PATH)
+    importlib.reload(module)
+    sleeps: list[float] = []
+    monkeypatch.setattr(module.time, "sleep", sleeps.append)
+    monkeypatch.setenv("SERVICE_ROLE_KEY", "dummy-key")
+    return module, sleeps
+
+
+def test_retries_429_and_5xx_with_backoff(wearable):
+    module, sleeps = wearable
+    session = StubSession(
+        [StubResponse(429), StubResponse(503), StubResponse(200, {"processed": 3})]
+    )
+    assert module.call_summarizer("http://x", "k", "2024-01-01", session)
+    assert len(session.urls) == 3
+    assert sleeps == [1.0, 2.0]
+
+
+def test_honours_retry_after_and_gives_up(wearable):
+    module, sleeps = wearable
+    session = StubSession([StubResponse(429, headers={"Retry-After": "7"})] * 3)
+    assert not module.call_summarizer(
+        "http://x", "k", "2024-01-01", session, max_retries=2
+    )
+    assert sleeps == [7.0, 7.0]
+
+
+def test_client_errors_are_not_retried(wearable):
+    module, sleeps = wearable
+    session = StubSession([StubResponse(400)])
+    assert not module.call_summarizer("http://x", "k", "2024-01-01", session)
+    assert len(session.urls) == 1
+    assert not sleeps
+
+
+def test_run_uses_shared_session_and_reports_histogram(wearable, monkeypatch, capsys):
+    module, _ = wearable
+    session = StubSession()
+    monkeypatch.setattr(module, "make_session", lambda *_a: session)
+    module.run(days=5, endpoint="http://x", concurrency=3, range_days=1)
+    assert len(session.urls) == 5
+    assert all("?date=" in url for url in session.urls)
+    summary = capsys.readouterr().out.strip().splitlines()[-1]
+    assert "5/5 days succeeded" in summary
+    assert "<1s:5" in summary and "p95=" in summary
+
+
+def test_range_mode_batches_days(wearable, monkeypatch, capsys):
+    module, _ = wearable
+    session = StubSession(supports_ranges=True)
+    monkeypatch.setattr(module, "make_session", lambda *_a: session)
+    module.run(days=10, endpoint="http://x", concurrency=2, range_days=7)
+    assert len(session.urls) == 2
+    assert all("start=" in url and "end=" in url for url in session.urls)
+    assert "10/10 days succeeded" in capsys.readouterr().out
+
+
+def test_range_mode_falls_back_to_per_day(wearable, monkeypatch, capsys):
+    module, _ = wearable
+    session = StubSession(supports_ranges=False)
+    monkeypatch.setattr(module, "make_session", lambda *_a: session)
+    module.run(days=3, endpoint="http://x", concurrency=1, range_days=7)
+    # one probing range call, then one call per day
+    assert len(session.urls) == 4
+    assert sum("?date=" in url for url in session.urls) == 3
+    assert "3/3 days succeeded" in capsys.readouterr().out
+
+
+def test_range_support_is_probed_once_before_fanning_out(wearable, monkeypatch):
+    module, _ = wearable
+    session = StubSession(supports_ranges=False)
+    monkeypatch.setattr(module, "make_session", lambda *_a: session)
+    module.run(days=21, endpoint="http://x", concurrency=4, range_days=7)
+    (probe,) = [url for url in session.urls if "start=" in url]
+    assert probe == session.urls[0]
+    # an old function ignores start/end, so it summarizes a requested day
+    query = dict(kv.split("=") for kv in probe.split("?", 1)[1].split("&"))
+    assert query["date"] == query["start"]
+    assert len(session.urls) == 1 + 21
+
+
+class StubCopyCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, sql):
+        self.log.append(("execute", sql))
+
+    def copy_expert(self, sql, buf):
+        self.log.append(("copy", sql, buf.read()))
+
+
+class StubCopyConn:
+    def __init__(self):
+        self.log: list = []
+        self.committed = False
+
+    def cursor(self):
+        return StubCopyCursor(self.log)
+
+    def commit(self):
+        self.committed = True
+
+
+def test_offline_export_aggregates_and_copies(wearable, tmp_path):
+    module, _ = wearable
+    export = tmp_path / "wearable_health_data.csv"
+    export.write_text(
+        "user_id,data_type,value,timestamp\n"
+        "u1,steps,1000,2024-01-01T08:00:00Z\n"
+        "u1,steps,500,2024-01-01T23:30:00+00:00\n"
+        "u1,hrv,61,2024-01-02T01:00:00Z\n"
+        "u2,heart_rate,70,2024-01-03T01:00:00Z\n"
+    )
+    rows = module.load_export(str(export), "2024-01-01", "2024-01-02")
+    assert [(r["user_id"], r["summary_date"]) for r in rows] == [
+        ("u1", "2024-01-01"),
+        ("u1", "2024-01-02"),
+    ]
+    assert rows[0]["steps_total"] == 1500
+
+    conn = StubCopyConn()
+    assert module.write_summaries_copy(conn, rows) == 2
+    kinds = [entry[0] for entry in conn.log]
+    assert kinds == ["execute", "copy", "execute"]
+    assert conn.log[1][2].count("\n") == 2
+    assert "ON CONFLICT (user_id, summary_date) DO UPDATE" in conn.log[2][1]
+    assert conn.committed
@@ -0,0 +1,140 @@
+import json
+import random
+import threading
+
+import pytest
+
+from scripts import benchmark as bm
+
+
+def test_percentile_interpolates_between_order_statistics():
+    samples = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert bm.percentile(samples, 50) == 3.0
+    assert bm.percentile(samples, 25) == 2.0
+    assert bm.percentile(samples, 90) == 4.6
+
+
+def test_percentile_ci_brackets_the_true_quantile():
+    rng = random.Random(7)
+    covered = 0
+    for _ in range(200):
+        samples = sorted(rng.expovariate(1.0) for _ in range(400))
+        lo, hi = bm.percentile_ci(samples, 95)
+        # True p95 of Exp(1) is ln(20).
+        covered += lo <= 2.9957 <= hi
+    assert covered >= 180  # ~95% nominal coverage
+
+
+def test_reject_outliers_drops_only_far_out_values():
+    samples = [10.0 + 0.1 * i for i in range(50)] + [500.0]
+    kept, rejected = bm.reject_outliers(samples)
+    assert rejected == [500.0]
+    assert len(kept) == 50
+
+    result = bm.summarize("q", samples)
+    assert result["rejected"] == 1
+    assert result["max_ms"] < 20
+    assert len(result["samples_ms"]) == 51  # raw samples are kept
+
+
+def test_run_benchmark_warms_up_each_thread_before_timing():
+    calls = []
+    lock = threading.Lock()
+    state = bm.ThreadState(threading.get_ident)
+
+    def fn():
+        state.get()
+        with lock:
+            calls.append(1)
+
+    result = bm.run_benchmark("noop", fn, iterations=40, warmup=3, threads=4)
+
+    assert len(calls) == 40 + 4 * 3
+    assert result["n"] + result["rejected"] == 40
+    assert len(state.values) == 4
+    assert result["throughput_per_s"] > 0
+    for q in bm.PERCENTILES:
+        lo, hi = result[f"p{q}_ci_ms"]
+        assert lo <= result[f"p{q}_ms"] <= hi
+
+
+def test_exceeds_requires_the_whole_interval_above_the_limit():
+    result = {"p95_ci_ms": [9.0, 12.0]}
+    assert not bm.exceeds(result, "p95", 10.0)
+    assert bm.exceeds(result, "p95", 8.5)
+
+
+def test_results_round_trip_through_json(tmp_path):
+    result = bm.run_benchmark("noop", lambda: None, iterations=20, warmup=1)
+    path = tmp_path / "out" / "bench.json"
+
+    bm.write_results(str(path), [result], suite="unit", metadata={"run": 1})
+    loaded = bm.load_results(str(path))
+
+    assert loaded["suite"] == "unit"
+    assert loaded["metadata"] == {"run": 1}
+    assert loaded["benchmarks"]["noop"]["samples_ms"] == result["samples_ms"]
+
+
+def _document(tmp_path, name, **latencies):
+    results = [bm.summarize(bench, samples) for bench, samples in latencies.items()]
+    path = tmp_path / f"{name}.json"
+    bm.write_results(str(path), results, suite="unit")
+    return str(path)
+
+
+def test_compare_flags_only_significant_regressions(tmp_path):
+    rng = random.Random(3)
+    fast = [rng.gauss(10.0, 0.5) for _ in range(200)]
+    baseline = _document(tmp_path, "baseline", slower=fast, noisy=fast, gone=fast)
+    current = _document(
+        tmp_path,
+        "current",
+        slower=[s * 1.5 for s in fast],
+        noisy=[s * 1.01 for s in fast],
+        added=fast,
+    )
+
+    rows = bm.compare(bm.load_results(baseline), bm.load_results(current))
+    status = {(r["name"], r["stat"]): r["status"] for r in rows}
+
+    assert status[("slower", "p50")] == "regression"
+    assert status[("slower", "p95")] == "regression"
+    assert status[("noisy", "p50")] == "unchanged"  # below min_change
+    assert status[("gone", "p50")] == "missing"
+    assert status[("added", "p95")] == "new"
+    assert {r["name"] for r in bm.regressions(rows)} == {"slower"}
+
+
+def test_compare_command_emits_report_and_exit_code(tmp_path, capsys):
+    samples = [10.0 + 0.01 * i for i in range(100)]
+    baseline = _document(tmp_path, "baseline", q=samples)
+    same = _document(tmp_path, "same", q=samples)
+    slower = _document(tmp_path, "slower", q=[s * 2 for s in samples])
+
+    assert bm.main(["compare", baseline, same]) == 0
+    assert "No significant regressions." in capsys.readouterr().out
+
+    report = tmp_path / "diff.json"
+    assert (
+        bm.main(
+            ["compare", baseline, slower, "--format", "json", "--output", str(report)]
+        )
+        == 1
+    )
+    diff = json.loads(report.read_text())
+    assert diff["regressions"] == 2
+    assert diff["rows"][0]["change"] == pytest.approx(1.0, rel=0.01)
+
+
+def test_promote_replaces_the_baseline(tmp_path, capsys):
+    baseline = _document(tmp_path, "baseline", q=[10.0] * 20)
+    slower = _document(tmp_path, "slower", q=[20.0 + 0.01 * i for i in range(20)])
+
+    assert bm.main(["compare", baseline, slower]) == 1
+    assert bm.main(["promote", slower, baseline]) == 0
+    assert bm.main(["compare", baseline, slower]) == 0
+
+    promoted = bm.load_results(baseline)
+    assert "promoted_at" in promoted
+    assert promoted["benchmarks"] == bm.load_results(slower)["benchmarks"]
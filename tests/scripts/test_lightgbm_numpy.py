@@ -0,0 +1,170 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+lgb = pytest.importorskip("lightgbm")
+
+from scripts import export_lightgbm_to_ts as exporter  # noqa: E402
+from scripts import lightgbm_numpy as ln  # noqa: E402
+
+
+def _data(n: int = 2000):
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(n, 4))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[rng.random(X.shape) < 0.05] = 0.0
+    y = (np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1]) * X[:, 2] > 0).astype(int)
+    return X, y
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"objective": "binary"},
+        {"objective": "binary", "use_missing": False},
+        {"objective": "regression", "zero_as_missing": True},
+        {
+            "objective": "binary",
+            "boosting": "rf",
+            "bagging_fraction": 0.5,
+            "bagging_freq": 1,
+        },
+    ],
+)
+def test_flat_forest_matches_booster(params):
+    X, y = _data()
+    booster = lgb.train(
+        {**params, "verbose": -1, "num_leaves": 15},
+        lgb.Dataset(X, y),
+        num_boost_round=20,
+    )
+    forest = ln.compile_booster(booster)
+
+    assert forest.num_trees == booster.num_trees()
+    np.testing.assert_allclose(forest.predict(X), booster.predict(X), atol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "objective",
+    [
+        "regression_l1",
+        "huber",
+        "quantile",
+        "poisson",
+        "gamma",
+        "tweedie",
+        "cross_entropy",
+        "cross_entropy_lambda",
+    ],
+)
+def test_flat_forest_applies_objective_link(objective):
+    X, _ = _data()
+    signal = np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1])
+    if objective.startswith("cross_entropy"):
+        y = 1.0 / (1.0 + np.exp(-signal))
+    else:
+        y = np.exp(signal) + 0.1
+    booster = lgb.train(
+        {"objective": objective, "verbose": -1, "num_leaves": 15},
+        lgb.Dataset(X, y),
+        num_boost_round=20,
+    )
+    forest = ln.compile_booster(booster)
+
+    np.testing.assert_allclose(forest.predict(X), booster.predict(X), rtol=1e-12)
+
+
+def test_compile_rejects_unsupported_objective():
+    X, _ = _data(500)
+    booster = lgb.train(
+        {"objective": "regression", "reg_sqrt": True, "verbose": -1},
+        lgb.Dataset(X, np.abs(np.nan_to_num(X[:, 0]))),
+        num_boost_round=3,
+    )
+    with pytest.raises(NotImplementedError):
+        ln.compile_booster(booster)
+
+
+def _booster_file(tmp_path) -> pathlib.Path:
+    X, y = _data(500)
+    booster = lgb.train(
+        {"objective": "binary", "verbose": -1}, lgb.Dataset(X, y), num_boost_round=5
+    )
+    path = tmp_path / "lightgbm_model.txt"
+    booster.save_model(str(path))
+    return path
+
+
+def test_cross_check_flags_disagreeing_scorer(tmp_path, monkeypatch):
+    model_path = _booster_file(tmp_path)
+    ts_path = tmp_path / "lightgbm_model.ts"
+
+    monkeypatch.setattr(ln, "run_ts_scorer", lambda _path, X: np.zeros(len(X)))
+    with pytest.raises(AssertionError):
+        ln.cross_check_ts(model_path, ts_path)
+
+    booster = lgb.Booster(model_file=str(model_path))
+    monkeypatch.setattr(ln, "run_ts_scorer", lambda _path, X: booster.predict(X))
+    assert ln.cross_check_ts(model_path, ts_path) == 0.0
+
+
+def test_export_reports_stub_and_verify_fails(tmp_path, monkeypatch):
+    model_path = _booster_file(tmp_path)
+    ts_path = tmp_path / "lightgbm_model.ts"
+
+    def _unsupported(_model):
+        raise NotImplementedError
+
+    monkeypatch.setattr(exporter.m2c, "export_to_javascript", _unsupported)
+    monkeypatch.delattr(exporter.m2c, "export_to_typescript", raising=False)
+
+    assert exporter.export(model_path, ts_path) is True
+    with pytest.raises(SystemExit):
+        exporter.verify(model_path, ts_path, stub=True)
+
+
+def test_array_export_embeds_flattened_trees(tmp_path, monkeypatch):
+    model_path = _booster_file(tmp_path)
+    ts_path = tmp_path / "lightgbm_model.ts"
+
+    assert exporter.export(model_path, ts_path, fmt="arrays") is False
+    code = ts_path.read_text(encoding="utf-8")
+    forest = ln.compile_booster(model_path)
+    assert "export function predictLightGBM(input: number[]): number" in code
+    assert f"const ROOTS = new Int32Array([{', '.join(map(str, forest.roots))}])" in (
+        code
+    )
+    assert " if (" not in code.split("export function score")[0]
+
+    monkeypatch.setattr(ln, "time_ts_scorer", lambda _path, X: 1000.0)
+    results = exporter.report(model_path, rows=10)
+    assert set(results) == set(exporter.FORMATS)
+    assert results["arrays"]["rows_per_s"] == 1000.0
+    assert results["arrays"]["bytes"] == len(code.encode("utf-8"))
+
+
+def test_export_and_report_multiclass_model(tmp_path, monkeypatch):
+    X, _ = _data(600)
+    y = np.digitize(np.nan_to_num(X[:, 0]), [-0.5, 0.5])
+    booster = lgb.train(
+        {"objective": "multiclass", "num_class": 3, "verbose": -1},
+        lgb.Dataset(X, y),
+        num_boost_round=3,
+    )
+    model_path = tmp_path / "lightgbm_model.txt"
+    booster.save_model(str(model_path))
+
+    stub = exporter.export(model_path, tmp_path / "lightgbm_model.ts")
+    with pytest.raises(NotImplementedError):
+        exporter.export(model_path, tmp_path / "arrays.ts", fmt="arrays")
+
+    monkeypatch.setattr(ln, "time_ts_scorer", lambda _path, X: 1000.0)
+    results = exporter.report(model_path, rows=10)
+    assert set(results) == {"m2cgen"}
+    assert results["m2cgen"]["stub"] is stub
+
+    # the NumPy cross-check cannot represent multiclass models
+    with pytest.raises(SystemExit) as exc:
+        exporter.verify(model_path, tmp_path / "lightgbm_model.ts", stub=False)
+    assert exc.value.code == exporter.VERIFY_UNSUPPORTED_EXIT
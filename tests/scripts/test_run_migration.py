@@ -0,0 +1,339 @@
+import glob
+import os
+import types
+
+import pytest
+
+from scripts import run_migration as rm
+
+MIGRATIONS = os.path.join(
+    os.path.dirname(__file__), "..", "..", "supabase", "migrations", "*.sql"
+)
+
+
+def test_split_keeps_dollar_quoted_bodies_intact():
+    sql = """
+    -- leading comment; not a statement
+    CREATE TABLE t (id int, note text DEFAULT 'a;b', "odd;name" int);
+    DO $$
+    BEGIN
+      PERFORM 1; PERFORM 2;
+    END $$;
+    CREATE FUNCTION f() RETURNS text AS $fn$
+      SELECT $$nested; $$ || E'it\\'s; ok' || 'isn''t;';
+    $fn$ LANGUAGE sql;
+    /* block /* nested; */ comment */ SELECT 1;
+    """
+    statements = rm.split_statements(sql)
+
+    assert len(statements) == 4
+    assert statements[0].startswith("-- leading comment")
+    assert "PERFORM 1; PERFORM 2;" in statements[1]
+    assert statements[2].endswith("$fn$ LANGUAGE sql")
+    assert rm.strip_comments(statements[3]) == "SELECT 1"
+
+
+def test_split_drops_comment_only_files():
+    assert rm.split_statements("-- placeholder\n/* nothing; here */\n") == []
+
+
+def test_every_repo_migration_splits_into_balanced_statements():
+    for path in glob.glob(MIGRATIONS):
+        with open(path) as fh:
+            for statement in rm.split_statements(fh.read()):
+                code = rm.strip_comments(statement)
+                assert code and not code.startswith(";"), path
+                # a terminator inside a body would leave an odd $$ count
+                assert code.count("$$") % 2 == 0, (path, code[:80])
+
+
+@pytest.mark.parametrize(
+    "statement, flagged",
+    [
+        ("CREATE INDEX idx ON t(a)", True),
+        ("create unique index if not exists idx on t(a)", True),
+        ("CREATE INDEX CONCURRENTLY idx ON t(a)", False),
+        ("ALTER TABLE t ADD CONSTRAINT fk FOREIGN KEY (a) REFERENCES u(id)", True),
+        (
+            "ALTER TABLE t ADD CONSTRAINT fk FOREIGN KEY (a) REFERENCES u(id) NOT VALID",
+            False,
+        ),
+        ("ALTER TABLE t ALTER COLUMN a TYPE bigint", True),
+        ("CREATE FUNCTION f() RETURNS void AS $$ CREATE INDEX i ON t(a) $$", False),
+        ("-- CREATE INDEX in a comment\nSELECT 1", False),
+    ],
+)
+def test_lock_warnings(statement, flagged):
+    assert bool(rm.lock_warnings(statement)) is flagged
+
+
+class _FakeCursor:
+    def __init__(self, log, fail_on, ledger=()):
+        self.log, self.fail_on, self.ledger = log, fail_on, ledger
+        self.validity = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.log.append(sql)
+        for needle, message in self.fail_on.items():
+            if needle in sql:
+                raise RuntimeError(message)
+
+    def fetchone(self):
+        return (self.validity.pop(0),) if self.validity else None
+
+    def fetchall(self):
+        return [(version,) for version in self.ledger]
+
+    def mogrify(self, sql, params):
+        return (sql % tuple(repr(p) for p in params)).encode()
+
+
+class _FakeConn:
+    def __init__(self, fail_on, ledger=()):
+        self.log, self.fail_on, self.ledger = [], fail_on, ledger
+        self.commits = 0
+        self.validity = []
+        self.autocommit = True
+        self.committed = self.rolled_back = self.closed = False
+
+    def cursor(self):
+        cur = _FakeCursor(self.log, self.fail_on, self.ledger)
+        cur.validity = self.validity
+        return cur
+
+    def commit(self):
+        self.committed = True
+        self.commits += 1
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+def _run(tmp_path, monkeypatch, sql, fail_on=None, single_transaction=True):
+    import psycopg2
+
+    conn = _FakeConn(fail_on or {})
+    monkeypatch.setattr(psycopg2, "connect", lambda _url: conn)
+    path = tmp_path / "migration.sql"
+    path.write_text(sql)
+    ok = rm.run_migration(str(path), "postgres://test", single_transaction)
+    return ok, conn
+
+
+def test_single_transaction_tolerates_already_exists(tmp_path, monkeypatch):
+    ok, conn = _run(
+        tmp_path,
+        monkeypatch,
+        "CREATE TABLE a (id int); CREATE TABLE b (id int);",
+        fail_on={"TABLE a": 'relation "a" already exists'},
+    )
+
+    assert ok and conn.committed and not conn.autocommit
+    assert "ROLLBACK TO SAVEPOINT run_migration_stmt" in conn.log
+    assert conn.log[-1] == "CREATE TABLE b (id int)"
+
+
+def test_single_transaction_rolls_back_on_error(tmp_path, monkeypatch):
+    ok, conn = _run(
+        tmp_path,
+        monkeypatch,
+        "CREATE TABLE a (id int); SELECT broken;",
+        fail_on={"broken": "syntax error"},
+    )
+
+    assert not ok
+    assert conn.rolled_back and not conn.committed and conn.closed
+
+
+def test_single_transaction_drops_the_files_own_begin_commit(tmp_path, monkeypatch):
+    ok, conn = _run(
+        tmp_path,
+        monkeypatch,
+        "BEGIN;\nCREATE TABLE a (id int);\nCOMMIT;\nCREATE TABLE b (id int);",
+    )
+
+    assert ok and conn.committed
+    assert not any(sql in ("BEGIN", "COMMIT") for sql in conn.log)
+    assert conn.log[-1] == "CREATE TABLE b (id int)"
+
+
+def test_supabase_single_transaction_wraps_once(tmp_path, monkeypatch):
+    scripts = []
+    client = types.SimpleNamespace(sql=scripts.append)
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.setenv("SUPABASE_URL", "http://x")
+    monkeypatch.setenv("SUPABASE_SERVICE_ROLE_KEY", "key")
+    monkeypatch.setattr(rm, "create_client", lambda *_a: client)
+    path = tmp_path / "migration.sql"
+    path.write_text("BEGIN;\nCREATE TABLE a (id int);\nCOMMIT;")
+
+    assert rm.run_migration(str(path), single_transaction=True)
+
+    (script,) = scripts
+    assert rm.split_statements(script) == ["BEGIN", "CREATE TABLE a (id int)", "COMMIT"]
+
+
+def test_single_transaction_refuses_concurrent_index(tmp_path, monkeypatch):
+    ok, conn = _run(tmp_path, monkeypatch, "CREATE INDEX CONCURRENTLY i ON t(a);")
+
+    assert not ok
+    assert conn.log == []
+
+
+def _write_migrations(directory):
+    directory.mkdir()
+    (directory / "20240101000000_first.sql").write_text("CREATE TABLE a (id int);")
+    (directory / "20240102000000_second.sql").write_text(
+        "BEGIN;\nCREATE TABLE b (id int);\nDO $$ BEGIN PERFORM 1; END $$;\nCOMMIT;"
+    )
+    (directory / "20240103000000_index.sql").write_text(
+        "CREATE INDEX CONCURRENTLY i ON b(id);"
+    )
+    (directory / "notes.txt").write_text("not a migration")
+
+
+def test_directory_mode_applies_only_pending_files(tmp_path, monkeypatch):
+    import psycopg2
+
+    migrations = tmp_path / "migrations"
+    _write_migrations(migrations)
+    conn = _FakeConn({}, ledger=["20240101000000"])
+    connects = []
+    monkeypatch.setattr(psycopg2, "connect", lambda url: connects.append(url) or conn)
+
+    assert rm.run_migrations(str(migrations), "postgres://test")
+
+    assert connects == ["postgres://test"] and conn.closed
+    assert not any("TABLE a" in sql for sql in conn.log)
+    # transactional file: statements + ledger row in one round trip
+    pipelined = [sql for sql in conn.log if "CREATE TABLE b" in sql]
+    assert len(pipelined) == 1
+    assert "PERFORM 1; END $$" in pipelined[0]
+    body = pipelined[0].split("INSERT INTO")[0]
+    assert not body.startswith("BEGIN") and "COMMIT" not in body
+    assert "'20240102000000'" in pipelined[0].split("INSERT INTO")[1]
+    # CONCURRENTLY must run on its own, outside a transaction block
+    assert "CREATE INDEX CONCURRENTLY i ON b(id)" in conn.log
+    assert any("'20240103000000'" in sql for sql in conn.log if "INSERT" in sql)
+
+
+def test_directory_mode_keeps_ledger_insert_after_trailing_comment(
+    tmp_path, monkeypatch
+):
+    import psycopg2
+
+    migrations = tmp_path / "migrations"
+    migrations.mkdir()
+    (migrations / "20240101000000_first.sql").write_text(
+        "CREATE TABLE a (id int) -- no trailing semicolon"
+    )
+    conn = _FakeConn({})
+    monkeypatch.setattr(psycopg2, "connect", lambda _url: conn)
+
+    assert rm.run_migrations(str(migrations), "postgres://test")
+
+    (pipelined,) = [sql for sql in conn.log if "CREATE TABLE a" in sql]
+    statements = rm.split_statements(pipelined)
+    assert len(statements) == 2
+    assert statements[1].startswith("INSERT INTO")
+
+
+def test_directory_mode_stops_on_failure(tmp_path, monkeypatch):
+    import psycopg2
+
+    migrations = tmp_path / "migrations"
+    _write_migrations(migrations)
+    conn = _FakeConn({"TABLE b": "boom"})
+    monkeypatch.setattr(psycopg2, "connect", lambda _url: conn)
+
+    assert not rm.run_migrations(str(migrations), "postgres://test")
+    assert conn.rolled_back
+    assert not any("CONCURRENTLY" in sql for sql in conn.log)
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        (
+            "CREATE INDEX IF NOT EXISTS idx_a ON daily_engagement_scores(user_id)",
+            (
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a "
+                "ON daily_engagement_scores(user_id)",
+                "idx_a",
+            ),
+        ),
+        (
+            "-- partial\ncreate unique index idx_b on public.t (a) where b",
+            (
+                "create unique index CONCURRENTLY idx_b on public.t (a) where b",
+                "public.idx_b",
+            ),
+        ),
+        ("CREATE INDEX CONCURRENTLY idx_c ON t(a)", None),
+        ("CREATE INDEX ON t(a)", None),  # unnamed: cannot be validated
+    ],
+)
+def test_online_index_rewrite(statement, expected):
+    assert rm.online_index_rewrite(statement) == expected
+
+
+def test_online_index_is_rebuilt_when_invalid():
+    conn = _FakeConn({})
+    conn.validity = [False, True]  # first build leaves an INVALID index
+
+    attempts = rm.build_index_online(
+        conn, "CREATE INDEX i ON t(a)", "CREATE INDEX CONCURRENTLY i ON t(a)", "i"
+    )
+
+    assert attempts == 2 and conn.autocommit
+    assert conn.log.count("CREATE INDEX CONCURRENTLY i ON t(a)") == 2
+    assert "DROP INDEX CONCURRENTLY IF EXISTS i" in conn.log
+
+
+def test_online_index_gives_up_after_retries():
+    conn = _FakeConn({"CONCURRENTLY i": "deadlock detected"})
+    conn.validity = [False] * 5
+
+    with pytest.raises(RuntimeError, match="still invalid"):
+        rm.build_index_online(
+            conn,
+            "CREATE INDEX i ON t(a)",
+            "CREATE INDEX CONCURRENTLY i ON t(a)",
+            "i",
+            retries=1,
+        )
+    assert conn.log.count("DROP INDEX CONCURRENTLY IF EXISTS i") == 2
+
+
+def test_directory_mode_builds_indexes_online_in_order(tmp_path, monkeypatch):
+    import psycopg2
+
+    migrations = tmp_path / "migrations"
+    migrations.mkdir()
+    (migrations / "20240101000000_perf.sql").write_text(
+        "CREATE TABLE t (a int);\n"
+        "CREATE INDEX IF NOT EXISTS idx_t_a ON t(a);\n"
+        "ANALYZE t;"
+    )
+    conn = _FakeConn({})
+    conn.validity = [True]
+    monkeypatch.setattr(psycopg2, "connect", lambda _url: conn)
+
+    assert rm.run_migrations(str(migrations), "postgres://test", online_indexes=True)
+
+    executed = [
+        sql for sql in conn.log if not sql.startswith(("CREATE SCHEMA", "SELECT"))
+    ]
+    executed = [sql for sql in executed if "schema_migrations (version text" not in sql]
+    assert executed[0] == "CREATE TABLE t (a int)"
+    assert executed[1] == "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_t_a ON t(a)"
+    assert executed[2].startswith("ANALYZE t;\nINSERT INTO")
@@ -0,0 +1,57 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import score_jitai_model as sjm
+from scripts import train_jitai_model as tjm
+
+
+def _ts_probability(model, rec):
+    """Emulation of predict-jitai ``probability()`` for one record."""
+    z = model["intercept"]
+    for name in tjm.FEATURES:
+        if name == "patient_hash":
+            value = tjm._hash_patient_id(rec.get("patient_id") or "")
+        else:
+            value = rec.get(name)
+        if value is not None and name in model["coeff"]:
+            z += model["coeff"][name] * float(value)
+    return 1 / (1 + math.exp(-z))
+
+
+def test_batch_scores_match_runtime_formula(tmp_path):
+    model = {
+        "intercept": -1.5,
+        "coeff": {"sleep_score": 0.03, "avg_hr": -0.01, "patient_hash": 0.4},
+        "threshold": 0.6,
+    }
+    records = [
+        {"patient_id": f"p-{i}", "sleep_score": 40 + i, "avg_hr": None if i % 4 else 70}
+        for i in range(25)
+    ]
+    model_path = tmp_path / "jitai_model.json"
+    model_path.write_text(json.dumps(model))
+    data_path = tmp_path / "history.ndjson"
+    data_path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+    out = tmp_path / "scores.csv"
+
+    stats = sjm.score_files(str(model_path), [str(data_path)], str(out), chunk_rows=6)
+
+    scored = pd.read_csv(out)
+    expected = [_ts_probability(model, r) for r in records]
+    np.testing.assert_allclose(scored["probability"], expected, rtol=1e-6)
+    assert (scored["decision"] == (np.array(expected) >= 0.6)).all()
+    assert scored["row"].tolist() == list(range(25))
+    assert stats["rows"] == 25
+    assert stats["positives"] == int(scored["decision"].sum())
+
+
+def test_parquet_without_feature_columns_is_rejected(tmp_path):
+    path = tmp_path / "unrelated.parquet"
+    pd.DataFrame({"outcome": ["engaged", None], "other": [1, 2]}).to_parquet(path)
+
+    with pytest.raises(ValueError, match="sleep_score"):
+        list(sjm.iter_feature_chunks(str(path)))
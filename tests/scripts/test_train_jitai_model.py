@@ -0,0 +1,203 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import train_jitai_model as tjm
+
+
+def _write_ndjson(path, records):
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+
+def _records(n: int = 40):
+    rng = np.random.default_rng(3)
+    return [
+        {
+            "patient_id": f"p-{i % 7}",
+            "outcome": "engaged" if i % 3 else "ignored",
+            "sleep_score": int(rng.integers(40, 100)),
+            "avg_hr": float(rng.uniform(55, 90)) if i % 5 else None,
+            "steps": str(int(rng.integers(0, 12_000))),
+            "heart_rate": int(rng.integers(60, 120)),
+            "trigger_type": "encourage_activity",  # not a model column
+        }
+        for i in range(n)
+    ]
+
+
+def test_streaming_loader_matches_eager_loader(tmp_path):
+    path = tmp_path / "export.ndjson"
+    _write_ndjson(path, _records())
+
+    eager = tjm.prepare_data(tjm.load_ndjson(str(path)))
+    streamed_raw = tjm.load_ndjson_streaming(str(path), chunk_rows=6)
+    streamed = tjm.prepare_data(streamed_raw)
+
+    assert "trigger_type" not in streamed_raw.columns
+    assert streamed_raw["sleep_score"].dtype == np.float32
+    assert isinstance(streamed_raw["patient_id"].dtype, pd.CategoricalDtype)
+    assert (eager["label"].to_numpy() == streamed["label"].to_numpy()).all()
+    for col in tjm.FEATURES:
+        np.testing.assert_allclose(
+            eager[col].to_numpy(float), streamed[col].to_numpy(float), rtol=1e-6
+        )
+
+
+def test_streaming_loader_unions_null_and_numeric_id_chunks(tmp_path):
+    path = tmp_path / "export.ndjson"
+    records = _records(18)
+    for rec in records[6:12]:
+        rec["patient_id"] = 100 + int(rec["patient_id"].split("-")[1])
+    for rec in records[12:]:
+        del rec["patient_id"]
+    _write_ndjson(path, records)
+
+    streamed = tjm.load_ndjson_streaming(str(path), chunk_rows=6)
+
+    ids = streamed["patient_id"]
+    assert isinstance(ids.dtype, pd.CategoricalDtype)
+    assert ids[:12].tolist() == [str(r["patient_id"]) for r in records[:12]]
+    assert ids[12:].isna().all()
+    eager = tjm.prepare_data(tjm.load_ndjson(str(path)))
+    np.testing.assert_allclose(
+        tjm.prepare_data(streamed)["patient_hash"][:12], eager["patient_hash"][:12]
+    )
+
+
+def _js_patient_hash(patient_id: str) -> float:
+    """Independent emulation of TS patientHash (charCodeAt + ``>>> 0``)."""
+    units = patient_id.encode("utf-16-le")
+    h = 0
+    for i in range(0, len(units), 2):
+        h = int(h * 31 + int.from_bytes(units[i : i + 2], "little")) % 2**32
+    return (h % 1000) / 1000
+
+
+def test_patient_hash_parity_over_random_uuids():
+    import uuid
+
+    rng = np.random.default_rng(11)
+    ids = [str(uuid.UUID(bytes=rng.bytes(16))) for _ in range(500)]
+    # heavy repetition, as in real exports, plus edge cases
+    series = pd.Series(ids * 3 + ["", "😀-patient", None, 12345])
+
+    vectorized = tjm._hash_patient_ids(series)
+    scalar = series.apply(tjm._hash_patient_id).to_numpy()
+
+    np.testing.assert_array_equal(vectorized, scalar)
+    expected = [_js_patient_hash(p) for p in ids]
+    np.testing.assert_array_equal(vectorized[: len(ids)], expected)
+    assert tjm._hash_patient_id("😀-patient") == _js_patient_hash("😀-patient")
+
+
+def test_patient_hash_accepts_categorical_ids():
+    ids = pd.Series(pd.Categorical(["a", "b", "a", None]))
+    expected = [tjm._hash_patient_id(p) for p in ["a", "b", "a", float("nan")]]
+    np.testing.assert_array_equal(tjm._hash_patient_ids(ids), expected)
+
+
+def test_running_stats_merge_matches_whole_frame():
+    rng = np.random.default_rng(5)
+    X = rng.normal(50, 10, size=(101, len(tjm.FEATURES)))
+    X[rng.random(X.shape) < 0.2] = np.nan
+
+    stats = tjm.RunningStats(len(tjm.FEATURES))
+    for start in range(0, len(X), 17):
+        stats.update(X[start : start + 17])
+
+    np.testing.assert_allclose(stats.mean, np.nanmean(X, axis=0))
+    np.testing.assert_allclose(stats.std, np.nanstd(X, axis=0, ddof=1))
+    roundtrip = tjm.RunningStats.from_dict(stats.to_dict())
+    np.testing.assert_allclose(roundtrip.mean, stats.mean)
+
+
+def test_incremental_training_warm_starts_from_artefact(tmp_path):
+    shards = []
+    for i in range(2):
+        path = tmp_path / f"shard-{i}.ndjson"
+        _write_ndjson(path, _records(60))
+        shards.append(str(path))
+    out = tmp_path / "jitai_model.json"
+
+    model, _, stats = tjm.train_incremental(shards[:1], chunk_rows=16)
+    tjm.export_model(model, str(out), {"feature_stats": stats.to_dict()})
+    first = json.loads(out.read_text())
+    assert set(first["coeff"]) == set(tjm.FEATURES)
+    assert "feature_stats" in first
+
+    # a warm start with a tiny learning rate barely moves the weights
+    warm, _, _ = tjm.train_incremental(
+        shards[1:], chunk_rows=16, warm_start=str(out), eta0=1e-6
+    )
+    np.testing.assert_allclose(
+        warm.coef_[0], [first["coeff"][f] for f in tjm.FEATURES], rtol=0.05, atol=1e-4
+    )
+
+
+def test_incremental_cold_start_scores_a_single_chunk(tmp_path):
+    path = tmp_path / "export.ndjson"
+    _write_ndjson(path, _records(60))
+
+    _, auc, _ = tjm.train_incremental([str(path)])
+
+    assert 0.0 <= auc <= 1.0
+
+
+def test_cross_validation_reports_each_grid_point(tmp_path):
+    path = tmp_path / "export.ndjson"
+    _write_ndjson(path, _records(90))
+    df = tjm.prepare_data(tjm.load_ndjson(str(path)))
+
+    model, auc, results = tjm.train_cv(df, folds=3, c_grid=[0.1, 1.0], n_jobs=2)
+
+    assert set(results) == {0.1, 1.0}
+    assert all(res["std_auc"] >= 0 for res in results.values())
+    assert auc == max(res["mean_auc"] for res in results.values())
+    assert model.C in results
+    assert model.coef_.shape == (1, len(tjm.FEATURES))
+
+
+def test_parquet_cache_round_trip_and_reuse(tmp_path):
+    path = tmp_path / "export.ndjson"
+    _write_ndjson(path, _records())
+    cache = tmp_path / "cache"
+
+    shard = tjm.ndjson_to_parquet(str(path), str(cache), chunk_rows=7)
+    mtime = os.path.getmtime(shard)
+    assert tjm.ndjson_to_parquet(str(path), str(cache)) == shard
+    assert os.path.getmtime(shard) == mtime
+
+    cached = tjm.load_cached(str(path), str(cache))
+    assert "trigger_type" not in cached.columns
+    assert "resting_heart_rate" not in cached.columns  # absent from the export
+    assert isinstance(cached["patient_id"].dtype, pd.CategoricalDtype)
+
+    eager = tjm.prepare_data(tjm.load_ndjson(str(path)))
+    via_cache = tjm.prepare_data(cached)
+    for col in tjm.FEATURES:
+        np.testing.assert_allclose(
+            eager[col].to_numpy(float), via_cache[col].to_numpy(float), rtol=1e-6
+        )
+
+
+def test_parquet_cache_key_tracks_the_feature_columns(tmp_path, monkeypatch):
+    path = tmp_path / "export.ndjson"
+    _write_ndjson(path, _records())
+    cache = tmp_path / "cache"
+
+    shard = tjm.ndjson_to_parquet(str(path), str(cache))
+    monkeypatch.setattr(tjm, "RAW_NUMERIC", tjm.RAW_NUMERIC + ["hrv"])
+    assert tjm.ndjson_to_parquet(str(path), str(cache)) != shard
+
+
+def test_failed_parquet_conversion_leaves_no_temp_file(tmp_path):
+    path = tmp_path / "export.ndjson"
+    _write_ndjson(path, [{"steps": 1}])
+    cache = tmp_path / "cache"
+
+    with pytest.raises(ValueError):
+        tjm.ndjson_to_parquet(str(path), str(cache))
+    assert os.listdir(cache) == []
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from scripts import wearable_aggregator as agg
+
+TS_FIXTURE = [
+    {"data_type": "steps", "value": 1000},
+    {"data_type": "steps", "value": 2500},
+    {"data_type": "hrv", "value": 60},
+    {"data_type": "hrv", "value": 80},
+    {"data_type": "sleep_minutes", "value": 480},
+    {"data_type": "heart_rate", "value": 70},
+    {"data_type": "heart_rate", "value": 90},
+]
+
+
+def test_reference_matches_deno_aggregator_fixture():
+    summary = agg.compute_daily_summary(TS_FIXTURE)
+    assert summary == {
+        "sleep_hours": 8,
+        "sleep_score": 100,
+        "avg_hr": 80,
+        "steps_total": 3500,
+        "hrv_avg": 70,
+    }
+
+
+def test_js_round_rounds_halves_up():
+    assert agg._js_round(70.5) == 71
+    assert agg._js_round(2.5) == 3
+    assert agg._js_round(-0.5) == 0
+
+
+def test_vectorized_path_matches_reference():
+    rng = random.Random(7)
+    types = ["steps", "hrv", "heart_rate", "sleep_minutes", "active_energy"]
+    records = [
+        {
+            "user_id": f"user-{rng.randrange(5)}",
+            "day": f"2024-01-0{rng.randrange(1, 4)}",
+            "data_type": rng.choice(types),
+            "value": rng.choice([rng.uniform(0, 200), rng.randrange(0, 120)]),
+        }
+        for _ in range(2_000)
+    ]
+
+    rows = agg.summarize_records(records)
+
+    assert len(rows) == len({(r["user_id"], r["day"]) for r in records})
+    for row in rows:
+        expected = agg.compute_daily_summary(
+            r
+            for r in records
+            if r["user_id"] == row["user_id"] and r["day"] == row["summary_date"]
+        )
+        for col, value in expected.items():
+            assert row[col] == pytest.approx(value), col
+
+
+def test_copy_line_uses_null_marker():
+    line = agg.summary_to_copy_line(
+        {
+            "user_id": "u",
+            "summary_date": "2024-01-01",
+            "sleep_score": 50,
+            "sleep_hours": 4.0,
+            "avg_hr": None,
+            "steps_total": 1200.0,
+            "hrv_avg": None,
+        }
+    )
+    assert line == "u\t2024-01-01\t50\t4\t\\N\t1200\t\\N\n"